@@ -11,5 +11,10 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 # Executar o módulo principal
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Subcomandos de linha de comando (ex.: python main.py lote ...)
+        from app.cli import main as cli_main
+        sys.exit(cli_main())
+    
     from app.app_streamlit import main
     main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+API HTTP/JSON (ASGI) da Calculadora de Banco de Horas
+Permite que outros sistemas consultem saldos sem a interface Streamlit
+
+Execução: uvicorn app.api:app --app-dir src --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+try:
+    from .banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+    from .consultas import chave_mes
+    from .limitador import CircuitoAberto
+    from .utils import normalize_intranet_url, format_time
+except ImportError:
+    from banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+    from consultas import chave_mes
+    from limitador import CircuitoAberto
+    from utils import normalize_intranet_url, format_time
+
+
+# Threads que executam login e scraping (compartilhadas por todas as requisições)
+MAX_WORKERS = int(os.environ.get('BANCO_HORAS_API_WORKERS', '8'))
+
+# Tempo (segundos) que uma sessão autenticada ociosa é mantida
+TTL_SESSAO = int(os.environ.get('BANCO_HORAS_API_TTL_SESSAO', '1800'))
+
+# Meses por requisição: cada mês é uma página da intranet ocupando um worker
+MAX_MESES = int(os.environ.get('BANCO_HORAS_API_MAX_MESES', '120'))
+
+# Primeiro ano aceito (o mesmo limite do seletor de datas da interface)
+ANO_MINIMO = 2000
+
+PADRAO_MES_ANO = r'^(0[1-9]|1[0-2])/\d{4}$'
+
+
+class Credenciais(BaseModel):
+    url: str = Field(..., description="URL da intranet")
+    usuario: str
+    senha: str
+
+
+class PedidoSaldo(Credenciais):
+    inicio: str = Field(..., pattern=PADRAO_MES_ANO, description="Mês inicial (MM/YYYY)")
+    fim: str = Field(..., pattern=PADRAO_MES_ANO, description="Mês final (MM/YYYY)")
+
+
+def _hash(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class SessaoAutenticada:
+    """Calculadora já autenticada e reutilizável entre requisições"""
+
+    def __init__(self, calc, hash_senha):
+        self.calc = calc
+        self.hash_senha = hash_senha
+        self.ultimo_uso = time.monotonic()
+        # requests.Session não é thread-safe: uma requisição por vez por usuário
+        self.lock = threading.Lock()
+
+
+class GerenciadorSessoes:
+    """Mantém sessões autenticadas por (intranet, usuário) e os meses já calculados"""
+
+    def __init__(self, ttl=TTL_SESSAO):
+        self.ttl = ttl
+        self._sessoes = {}
+        self._lock = threading.Lock()
+
+    def _chave(self, url, usuario):
+        return url, _hash(usuario)
+
+    def _remover_expiradas(self):
+        agora = time.monotonic()
+        for chave in [c for c, s in self._sessoes.items() if agora - s.ultimo_uso > self.ttl]:
+            del self._sessoes[chave]
+
+    def obter(self, url, usuario, senha):
+        """Retorna a sessão do usuário, fazendo login apenas se necessário"""
+        chave = self._chave(url, usuario)
+        hash_senha = _hash(senha)
+
+        with self._lock:
+            self._remover_expiradas()
+            sessao = self._sessoes.get(chave)
+
+        if sessao is not None and sessao.hash_senha == hash_senha:
+            sessao.ultimo_uso = time.monotonic()
+            return sessao
+
+        calc = BancoHorasAdvanced(url)
+        if not calc.fazer_login(usuario, senha):
+            return None
+
+        sessao = SessaoAutenticada(calc, hash_senha)
+        with self._lock:
+            self._sessoes[chave] = sessao
+        return sessao
+
+    def existente(self, url, usuario, senha):
+        """Retorna a sessão já autenticada sem fazer login (ou None)"""
+        with self._lock:
+            self._remover_expiradas()
+            sessao = self._sessoes.get(self._chave(url, usuario))
+        if sessao is None or sessao.hash_senha != _hash(senha):
+            return None
+        return sessao
+
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='banco-horas')
+sessoes = GerenciadorSessoes()
+
+app = FastAPI(title="Calculadora de Banco de Horas", version="1.1.1")
+
+
+def _validar_url(url):
+    url_normalizada, erro = normalize_intranet_url(url)
+    if erro:
+        raise HTTPException(status_code=400, detail=erro)
+    return url_normalizada
+
+
+def _periodo(pedido):
+    mes_inicio, ano_inicio = map(int, pedido.inicio.split('/'))
+    mes_fim, ano_fim = map(int, pedido.fim.split('/'))
+    ano_maximo = datetime.now().year
+    if not (ANO_MINIMO <= ano_inicio <= ano_maximo and ANO_MINIMO <= ano_fim <= ano_maximo):
+        raise HTTPException(status_code=400, detail=f"Ano deve estar entre {ANO_MINIMO} e {ano_maximo}")
+    if (ano_fim, mes_fim) < (ano_inicio, mes_inicio):
+        raise HTTPException(status_code=400, detail="Data de fim deve ser maior ou igual à data de início")
+    meses = (ano_fim - ano_inicio) * 12 + mes_fim - mes_inicio + 1
+    if meses > MAX_MESES:
+        raise HTTPException(status_code=400, detail=f"Período de {meses} meses excede o máximo de {MAX_MESES}")
+    return mes_inicio, ano_inicio, mes_fim, ano_fim
+
+
+def _detalhe(calc, mes_ano, saldo):
+    return {'mes_ano': mes_ano, 'saldo': saldo, 'saldo_formatado': calc.minutos_para_tempo(saldo)}
+
+
+def _iterar_meses(sessao, periodo, pedido):
+    """Processa os meses um a um, reaproveitando os já calculados na sessão
+
+    Se a sessão da intranet expirou desde o último uso, faz login de novo
+    uma única vez e continua a partir do mês em que a expiração apareceu.
+    """
+    mes_inicio, ano_inicio, mes_fim, ano_fim = periodo
+    relogado = False
+    with sessao.lock:
+        while True:
+            try:
+                for detalhe in sessao.calc.iterar_banco_horas(mes_inicio, ano_inicio, mes_fim, ano_fim):
+                    yield detalhe
+                    mes, ano = map(int, detalhe['mes_ano'].split('/'))
+                    mes_inicio, ano_inicio = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+                return
+            except SessaoExpirada:
+                if relogado or not sessao.calc.fazer_login(pedido.usuario, pedido.senha):
+                    raise
+                relogado = True
+
+
+def _meses_calculados(calc):
+    """Meses já calculados do usuário: armazenamento local e cache da sessão"""
+    saldos = {}
+    if calc.armazenamento is not None and calc.usuario_hash is not None:
+        saldos.update(calc.armazenamento.saldos_periodo(
+            calc.host, calc.usuario_hash, f"01/{ANO_MINIMO}", f"12/{datetime.now().year}"
+        ))
+    # Cópia atômica: o cache pode estar sendo atualizado por um worker
+    for mes_ano, entrada in dict(calc.cache_meses).items():
+        saldos[mes_ano] = entrada['saldo']
+    return [_detalhe(calc, mes_ano, saldos[mes_ano]) for mes_ano in sorted(saldos, key=chave_mes)]
+
+
+def _calcular(url, pedido, periodo):
+    """Tarefa executada no pool de workers"""
+    sessao = sessoes.obter(url, pedido.usuario, pedido.senha)
+    if sessao is None:
+        return None
+    detalhes = list(_iterar_meses(sessao, periodo, pedido))
+    return sum(d['saldo'] for d in detalhes), detalhes
+
+
+def _erro_login():
+    return HTTPException(status_code=401, detail="Erro no login. Verifique as credenciais e a URL da intranet.")
+
+
+@app.exception_handler(CircuitoAberto)
+async def circuito_aberto(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={'detail': str(exc)},
+        headers={'Retry-After': str(int(exc.segundos_restantes) + 1)}
+    )
+
+
+@app.exception_handler(MesIndisponivel)
+async def mes_indisponivel(request, exc):
+    return JSONResponse(status_code=502, content={'detail': str(exc)})
+
+
+@app.exception_handler(SessaoExpirada)
+async def sessao_expirada(request, exc):
+    return JSONResponse(status_code=401, content={'detail': str(exc)})
+
+
+@app.get("/healthz")
+async def healthz():
+    return {'status': 'ok'}
+
+
+@app.post("/saldo")
+async def calcular_saldo(pedido: PedidoSaldo):
+    """Calcula o banco de horas do período"""
+    url = _validar_url(pedido.url)
+    periodo = _periodo(pedido)
+
+    loop = asyncio.get_running_loop()
+    resultado = await loop.run_in_executor(executor, _calcular, url, pedido, periodo)
+    if resultado is None:
+        raise _erro_login()
+
+    total_minutos, detalhes = resultado
+    return {
+        'total_minutos': total_minutos,
+        'total_formatado': format_time(total_minutos),
+        'detalhes': detalhes
+    }
+
+
+@app.post("/saldo/stream")
+async def calcular_saldo_stream(pedido: PedidoSaldo):
+    """Calcula o período enviando cada mês assim que processado (Server-Sent Events)"""
+    url = _validar_url(pedido.url)
+    periodo = _periodo(pedido)
+
+    loop = asyncio.get_running_loop()
+    sessao = await loop.run_in_executor(executor, sessoes.obter, url, pedido.usuario, pedido.senha)
+    if sessao is None:
+        raise _erro_login()
+
+    fila = asyncio.Queue()
+    fim = object()
+
+    def produzir():
+        try:
+            for detalhe in _iterar_meses(sessao, periodo, pedido):
+                loop.call_soon_threadsafe(fila.put_nowait, detalhe)
+        finally:
+            loop.call_soon_threadsafe(fila.put_nowait, fim)
+
+    async def eventos():
+        tarefa = loop.run_in_executor(executor, produzir)
+        total_minutos = 0
+        while True:
+            item = await fila.get()
+            if item is fim:
+                break
+            total_minutos += item['saldo']
+            yield f"event: mes\ndata: {json.dumps(item)}\n\n"
+        try:
+            await tarefa
+        except (CircuitoAberto, MesIndisponivel, SessaoExpirada) as exc:
+            yield f"event: erro\ndata: {json.dumps({'detail': str(exc)})}\n\n"
+            return
+        total = {'total_minutos': total_minutos, 'total_formatado': format_time(total_minutos)}
+        yield f"event: total\ndata: {json.dumps(total)}\n\n"
+
+    return StreamingResponse(eventos(), media_type='text/event-stream')
+
+
+@app.post("/meses")
+async def meses_em_cache(credenciais: Credenciais):
+    """Lista os meses já calculados do usuário (armazenamento local e sessão), sem acessar a intranet"""
+    url = _validar_url(credenciais.url)
+    sessao = sessoes.existente(url, credenciais.usuario, credenciais.senha)
+    if sessao is None:
+        return {'meses': []}
+
+    loop = asyncio.get_running_loop()
+    meses = await loop.run_in_executor(executor, _meses_calculados, sessao.calc)
+    return {'meses': meses}
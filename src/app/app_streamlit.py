@@ -5,37 +5,67 @@ Versão web genérica para múltiplas intranets
 """
 
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
+import contextlib
+import os
 import time
 
 # Importar módulos locais
 try:
     # Tentativa com importação relativa (quando executado como módulo)
-    from .banco_horas import BancoHorasAdvanced
+    from .importacao import importacao_tardia
+    from .consultas import SerieSaldos
+    from .checkpoint import CheckpointJob, descricao_job, id_job
+    from . import perfil
+    from .resultados import armazem_resultados, serializar_resultado, desserializar_resultado
     from .utils import (
         init_session_state, 
         format_time, 
+        normalize_intranet_url,
         load_css,
+        prepare_chart_arrays,
         create_monthly_chart, 
         create_cumulative_chart,
+        create_streaming_charts,
+        append_month_to_charts,
         create_summary_metrics,
+        create_period_queries,
+        create_team_distribution_chart,
+        create_team_ranking_chart,
+        create_department_chart,
         download_report
     )
 except ImportError:
     # Fallback para importação absoluta (quando executado diretamente)
-    from banco_horas import BancoHorasAdvanced
+    from importacao import importacao_tardia
+    from consultas import SerieSaldos
+    from checkpoint import CheckpointJob, descricao_job, id_job
+    import perfil
+    from resultados import armazem_resultados, serializar_resultado, desserializar_resultado
     from utils import (
         init_session_state, 
         format_time, 
+        normalize_intranet_url,
         load_css,
+        prepare_chart_arrays,
         create_monthly_chart, 
         create_cumulative_chart,
+        create_streaming_charts,
+        append_month_to_charts,
         create_summary_metrics,
+        create_period_queries,
+        create_team_distribution_chart,
+        create_team_ranking_chart,
+        create_department_chart,
         download_report
     )
 
+# Módulos pesados (pandas, requests, BeautifulSoup) só são carregados
+# quando há resultados para exibir ou scraping a fazer
+pd = importacao_tardia('pandas')
+banco_horas = importacao_tardia('.banco_horas', __package__)
+equipe = importacao_tardia('.equipe', __package__)
+
 # Configuração da página
 st.set_page_config(
     page_title="Calculadora de Banco de Horas",
@@ -44,11 +74,74 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Carregar CSS externo
-import os
+# Carregar CSS externo (lido e sanitizado uma vez por processo)
 css_path = os.path.join(os.path.dirname(__file__), '..', 'styles', 'main.css')
 load_css(css_path)
 
+# Diretório padrão dos resultados em lote da equipe
+DIRETORIO_EQUIPE_PADRAO = os.environ.get(
+    'BANCO_HORAS_DIRETORIO_EQUIPE',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'temp', 'equipe')
+)
+
+
+@st.cache_data(show_spinner=False)
+def _carregar_painel_cache(diretorio, versao):
+    """Carrega os agregados da equipe; 'versao' invalida o cache quando o lote é regravado"""
+    return equipe.carregar_painel(diretorio)
+
+
+def render_team_dashboard():
+    """Painel agregado da equipe a partir dos resultados em lote"""
+    with st.sidebar:
+        st.header("⚙️ Configuração")
+        diretorio = st.text_input(
+            "Diretório dos resultados:",
+            value=DIRETORIO_EQUIPE_PADRAO,
+            help="Diretório gerado por `python main.py lote`"
+        )
+        limite_ranking = st.slider("Top devedores/credores:", 5, 50, 10)
+    
+    st.markdown("---")  # Separador visual
+    
+    versao = equipe.versao_painel(diretorio)
+    if versao is None:
+        st.info("""
+        👥 **Nenhum resultado em lote encontrado.**
+        
+        Gere os dados com `python main.py lote --url ... --funcionarios funcionarios.csv`
+        e informe o diretório de saída na barra lateral.
+        """)
+        return
+    
+    painel = _carregar_painel_cache(diretorio, versao)
+    funcionarios = painel['funcionarios']
+    departamentos = painel['departamentos']
+    
+    st.header("👥 Painel da Equipe")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("👥 Funcionários", len(funcionarios))
+    with col2:
+        st.metric("🏬 Departamentos", funcionarios['departamento'].nunique())
+    with col3:
+        st.metric("🟢 Com crédito", int((funcionarios['saldo_total'] > 0).sum()))
+    with col4:
+        st.metric("🔴 Com débito", int((funcionarios['saldo_total'] < 0).sum()))
+    
+    st.plotly_chart(create_team_distribution_chart(painel['distribuicao']), use_container_width=True)
+    st.plotly_chart(create_team_ranking_chart(funcionarios, limite_ranking), use_container_width=True)
+    st.plotly_chart(create_department_chart(departamentos), use_container_width=True)
+    
+    # Totais por departamento e mês
+    st.subheader("🏬 Totais por Departamento")
+    ordem_meses = departamentos.drop_duplicates('mes_chave')['mes_ano'].astype(str)
+    tabela = departamentos.assign(mes_ano=departamentos['mes_ano'].astype(str)).pivot_table(
+        index='mes_ano', columns='departamento', values='saldo_total', aggfunc='sum', observed=True
+    ).reindex(ordem_meses)
+    st.dataframe(tabela.map(lambda m: format_time(int(m)) if pd.notna(m) else ''), use_container_width=True)
+
 
 def main():
     init_session_state()
@@ -61,6 +154,12 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    modo = st.sidebar.radio("Modo:", ["👤 Individual", "👥 Painel da Equipe"], horizontal=True)
+    if modo == "👥 Painel da Equipe":
+        render_team_dashboard()
+        render_footer()
+        return
+    
     # Sidebar para configuração
     with st.sidebar:
         st.header("⚙️ Configuração")
@@ -75,31 +174,12 @@ def main():
         
         # Processar e limpar a URL
         if url_intranet:
-            # Remover espaços em branco
-            url_intranet = url_intranet.strip()
-            
-            # Adicionar https:// se não tiver protocolo
-            if not url_intranet.startswith(('http://', 'https://')):
-                url_intranet = 'https://' + url_intranet
-            
-            # Extrair apenas o domínio principal (remover paths e parâmetros)
-            try:
-                parsed = urlparse(url_intranet)
-                # Validação básica de segurança
-                if not parsed.netloc or parsed.netloc.lower() in ['localhost', '127.0.0.1']:
-                    st.warning("⚠️ URLs locais não são permitidas por segurança")
-                    url_intranet = ""
-                elif parsed.scheme not in ['http', 'https']:
-                    st.warning("⚠️ Apenas URLs HTTP/HTTPS são permitidas")
-                    url_intranet = ""
-                else:
-                    url_intranet = f"{parsed.scheme}://{parsed.netloc}"
-                    # Exibir URL limpa para o usuário
-                    if parsed.netloc:
-                        st.info(f"🔗 URL processada: `{url_intranet}`")
-            except Exception:
-                st.warning("⚠️ URL inválida")
-                url_intranet = ""
+            url_intranet, aviso_url = normalize_intranet_url(url_intranet)
+            if aviso_url:
+                st.warning(aviso_url)
+            else:
+                # Exibir URL limpa para o usuário
+                st.info(f"🔗 URL processada: `{url_intranet}`")
         
         # Credenciais
         st.subheader("🔐 Credenciais")
@@ -171,6 +251,15 @@ def main():
             st.error("❌ **Data de fim deve ser maior ou igual à data de início!**")
             tem_erro_validacao = True
         
+        # Perfil do cálculo: opção oculta (?perfil=1 na URL ou BANCO_HORAS_PERFIL)
+        if st.query_params.get('perfil') or perfil.MOTOR_PADRAO:
+            st.checkbox(
+                "🔬 Capturar perfil do cálculo",
+                value=bool(perfil.MOTOR_PADRAO),
+                key='capturar_perfil',
+                help="Grava o perfil e os tempos de parse por mês em temp/perfis"
+            )
+        
         # Botão de processar - desabilitado se houver erros
         botao_desabilitado = tem_erro_validacao
         if botao_desabilitado:
@@ -191,17 +280,18 @@ def main():
                 st.session_state.ano_inicio = ano_inicio
                 st.session_state.mes_fim = mes_fim
                 st.session_state.ano_fim = ano_fim
-                st.session_state.results = None  # Limpa resultados anteriores
+                armazem_resultados().descartar(st.session_state.results_id)  # Limpa resultados anteriores
+                st.session_state.results_id = None
+                st.session_state.perfil_artefatos = None
                 st.session_state.error_message = None  # Limpa erros anteriores
                 st.session_state.error_details = None
 
 
+    render_memory_gauge()
+
     # ÁREA PRINCIPAL - Controle de fluxo exclusivo
     if st.session_state.processing:
         # === MODO PROCESSAMENTO ===
-        # Limpar tudo primeiro
-        st.session_state.results = None
-        
         # Recuperar dados da sessão
         url_intranet = st.session_state.get('url_intranet', '')
         usuario = st.session_state.get('usuario', '')
@@ -227,7 +317,7 @@ def main():
             progress_bar.progress(10)
             progress_text.text("Progresso: 10% - Inicializando...")
             status_text.info("🔧 Inicializando calculadora...")
-            calc = BancoHorasAdvanced(url_intranet)
+            calc = banco_horas.BancoHorasAdvanced(url_intranet)
             time.sleep(1)
             
             # Etapa 2: fazer_login
@@ -247,6 +337,13 @@ def main():
                 progress_text.text("Progresso: 70% - Iniciando cálculos...")
                 status_text.info("📊 Calculando banco de horas... Isso pode levar alguns minutos...")
                 
+                # Checkpoint: um cálculo interrompido do mesmo período é retomado
+                job = (calc.host, calc.usuario_hash, mes_inicio, ano_inicio, mes_fim, ano_fim)
+                checkpoint = CheckpointJob(id_job(*job), descricao=descricao_job(*job))
+                meses_retomados = len(checkpoint.carregar())
+                if meses_retomados:
+                    st.info(f"♻️ Retomando cálculo interrompido: {meses_retomados} meses já processados")
+                
                 # Função de callback para atualizar progresso durante cálculo
                 def update_progress(mes_atual, total_meses, mes_ano):
                     # Progresso de 70% a 90% (20% de range)
@@ -263,9 +360,37 @@ def main():
                     progress_text.text(f"Progresso: {int(progresso_atual)}% - Calculando {mes_ano} ({mes_atual}/{total_meses})")
                     status_text.info(f"📊 Processando mês {mes_ano} ({mes_atual} de {total_meses})...")
                 
-                total_minutos, detalhes = calc.calcular_banco_horas(
-                    mes_inicio, ano_inicio, mes_fim, ano_fim, progress_callback=update_progress
+                # Resultados parciais exibidos assim que cada mês é processado
+                st.subheader("📊 Resultados parciais")
+                grafico_mensal = st.empty()
+                grafico_cumulativo = st.empty()
+                tabela_parcial = st.empty()
+                fig_monthly, fig_cumulative = create_streaming_charts()
+                
+                total_minutos = 0
+                detalhes = []
+                artefatos_perfil = []
+                captura = (
+                    perfil.capturar(calc, artefatos=artefatos_perfil)
+                    if st.session_state.get('capturar_perfil') else contextlib.nullcontext()
                 )
+                with captura:
+                    for detalhe in calc.iterar_banco_horas(
+                        mes_inicio, ano_inicio, mes_fim, ano_fim,
+                        progress_callback=update_progress, checkpoint=checkpoint
+                    ):
+                        detalhes.append(detalhe)
+                        total_minutos += detalhe['saldo']
+                        
+                        append_month_to_charts(fig_monthly, fig_cumulative, detalhe, total_minutos)
+                        grafico_mensal.plotly_chart(fig_monthly, use_container_width=True)
+                        grafico_cumulativo.plotly_chart(fig_cumulative, use_container_width=True)
+                        
+                        parcial_df = pd.DataFrame(detalhes)[['mes_ano', 'saldo_formatado']]
+                        parcial_df.columns = ['Mês/Ano', 'Saldo']
+                        parcial_df.index = parcial_df.index + 1
+                        tabela_parcial.dataframe(parcial_df, use_container_width=True)
+                st.session_state.perfil_artefatos = artefatos_perfil
                 
                 # Etapa 4: Finalizar
                 progress_bar.progress(90)
@@ -273,15 +398,13 @@ def main():
                 status_text.info("📋 Organizando resultados...")
                 time.sleep(0.5)
                 
-                # Salvar resultados
-                st.session_state.results = {
-                    'total_minutos': total_minutos,
-                    'detalhes': detalhes,
-                    'periodo': f"{mes_inicio:02d}/{ano_inicio} - {mes_fim:02d}/{ano_fim}"
-                }
+                # Salvar resultados no armazém compartilhado; a sessão guarda só o identificador
+                st.session_state.results_id = armazem_resultados().guardar(serializar_resultado(
+                    total_minutos, detalhes, f"{mes_inicio:02d}/{ano_inicio} - {mes_fim:02d}/{ano_fim}"
+                ))
                 
-                # Marcar que houve mudança nos resultados para recriar cache da tabela
-                st.session_state.results_changed = True
+                # Cálculo completo: o checkpoint não é mais necessário
+                checkpoint.remover()
                 
                 # Completar
                 progress_bar.progress(100)
@@ -303,6 +426,19 @@ def main():
                 ]
                 time.sleep(3)
                 
+        except banco_horas.MesIndisponivel as e:
+            progress_bar.progress(0)
+            progress_text.text("Erro durante o processamento")
+            status_text.error(f"❌ {str(e)}")
+            
+            # Os meses anteriores ficaram no checkpoint: o próximo cálculo retoma daqui
+            st.session_state.error_message = f"❌ {str(e)}"
+            st.session_state.error_details = [
+                "• Os meses já obtidos foram guardados; calcule novamente para retomar",
+                "• Teste se consegue acessar a intranet pelo navegador"
+            ]
+            time.sleep(3)
+            
         except Exception as e:
             progress_bar.progress(0)
             progress_text.text("Erro durante o processamento")
@@ -329,15 +465,27 @@ def main():
             time.sleep(1)
             st.rerun()
     
-    elif st.session_state.results:
+    elif st.session_state.results_id:
         # === MODO RESULTADOS ===
-        results = st.session_state.results
+        dados = armazem_resultados().obter(st.session_state.results_id)
+        if dados is None:
+            # Resultado despejado por inatividade ou limite de memória
+            st.session_state.results_id = None
+            st.markdown("---")  # Separador visual
+            st.info("⌛ Os resultados expiraram. Clique em \"Calcular Banco de Horas\" para consultar novamente.")
+            render_footer()
+            return
+        results = desserializar_resultado(dados, format_time)
         total_minutos = results['total_minutos']
         detalhes = results['detalhes']
         
         st.markdown("---")  # Separador visual
         st.header(f"📊 Resultados - Período: {results['periodo']}")
         
+        # Artefatos da captura de perfil, quando ativada
+        if st.session_state.get('perfil_artefatos'):
+            st.info("🔬 Perfil gravado em:\n" + "\n".join(f"- `{c}`" for c in st.session_state.perfil_artefatos))
+        
         # Métricas resumo
         create_summary_metrics(total_minutos, detalhes)
         
@@ -357,46 +505,46 @@ def main():
             for d in detalhes
         ])
         
+        # Índice de somas de prefixo para consultas e gráfico cumulativo
+        serie = SerieSaldos.de_detalhes(detalhes)
+        
         # Gráficos - Layout vertical (um em cima do outro)
         st.subheader("📊 Gráficos")
         
         # Gráfico mensal por mês
-        fig_monthly = create_monthly_chart(df)
+        chart_arrays = prepare_chart_arrays(df)
+        fig_monthly = create_monthly_chart(df, chart_arrays)
         st.plotly_chart(fig_monthly, use_container_width=True)
         
         # Gráfico cumulativo
-        fig_cumulative = create_cumulative_chart(df)
+        fig_cumulative = create_cumulative_chart(df, serie)
         st.plotly_chart(fig_cumulative, use_container_width=True)
         
+        # Consultas sobre o período
+        st.subheader("🔎 Consultas do Período")
+        create_period_queries(serie)
+        
         # Tabela detalhada
         st.subheader("📋 Detalhes por Mês")
         
-        # Preparar DataFrame para exibição com cores - usar cache para evitar recálculos
-        if 'display_df_cache' not in st.session_state or st.session_state.get('results_changed', False):
-            display_df = df[['mes_ano', 'saldo_formatado', 'saldo_minutos']].copy()
-            display_df['Status'] = display_df['saldo_minutos'].apply(
-                lambda x: '🟢 Crédito' if x > 0 else '🔴 Débito' if x < 0 else '⚪ Neutro'
-            )
-            
-            # Remover coluna auxiliar e renomear
-            display_df = display_df[['mes_ano', 'saldo_formatado', 'Status']]
-            display_df.columns = ['Mês/Ano', 'Saldo', 'Situação']
-            
-            # Resetar índice para começar com 1
-            display_df.reset_index(drop=True, inplace=True)
-            display_df.index = display_df.index + 1
-            
-            # Cache do DataFrame preparado
-            st.session_state.display_df_cache = display_df
-            st.session_state.results_changed = False
+        # Preparar DataFrame para exibição com cores (recriado a partir do resultado compacto)
+        display_df = df[['mes_ano', 'saldo_formatado', 'saldo_minutos']].copy()
+        display_df['Status'] = display_df['saldo_minutos'].apply(
+            lambda x: '🟢 Crédito' if x > 0 else '🔴 Débito' if x < 0 else '⚪ Neutro'
+        )
+        
+        # Remover coluna auxiliar e renomear
+        display_df = display_df[['mes_ano', 'saldo_formatado', 'Status']]
+        display_df.columns = ['Mês/Ano', 'Saldo', 'Situação']
         
-        # Usar DataFrame do cache para renderização estável
-        cached_df = st.session_state.display_df_cache
+        # Resetar índice para começar com 1
+        display_df.reset_index(drop=True, inplace=True)
+        display_df.index = display_df.index + 1
         
         # Container para tabela sem altura fixa para evitar linhas vazias
         with st.container():
             st.dataframe(
-                cached_df, 
+                display_df, 
                 use_container_width=True
             )
         
@@ -469,7 +617,25 @@ def main():
             - 🛡️ Login seguro com feedback visual
             """)
     
-    # Rodapé
+    render_footer()
+
+
+def render_memory_gauge():
+    """Medidor de memória do armazém de resultados compartilhado"""
+    estatisticas = armazem_resultados().estatisticas()
+    uso = estatisticas['bytes'] / estatisticas['limite_bytes'] if estatisticas['limite_bytes'] else 0
+    with st.sidebar.expander("🧠 Memória"):
+        st.progress(min(1.0, uso), text=(
+            f"Resultados: {estatisticas['bytes'] / 1024:.1f} KB de "
+            f"{estatisticas['limite_bytes'] / 1024 / 1024:.0f} MB"
+        ))
+        st.caption(f"{estatisticas['itens']} resultados em memória · {estatisticas['despejos']} despejados")
+        if estatisticas['rss_processo'] is not None:
+            st.caption(f"Processo: {estatisticas['rss_processo'] / 1024 / 1024:.0f} MB residentes")
+
+
+def render_footer():
+    """Rodapé da página"""
     st.markdown("---")
     st.markdown("""
     <div style="text-align: center; padding: 20px; color: #666; font-size: 14px;">
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Armazenamento local dos saldos mensais já calculados
+Consultado por calcular_banco_horas antes de acessar a intranet; o motor
+é SQLite por padrão ou DuckDB (colunar) para consultas analíticas
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from .consultas import chave_mes, mes_ano_da_chave
+except ImportError:
+    from consultas import chave_mes, mes_ano_da_chave
+
+
+# Caminho do banco local; vazio desativa o armazenamento
+CAMINHO_PADRAO = os.environ.get('BANCO_HORAS_ARMAZENAMENTO', '')
+
+# Motor do banco: 'sqlite', 'duckdb' ou vazio (pela extensão do arquivo)
+MOTOR_PADRAO = os.environ.get('BANCO_HORAS_ARMAZENAMENTO_MOTOR', '')
+
+_TABELA_MENSAL = """
+CREATE TABLE IF NOT EXISTS saldos_mensais (
+    host TEXT NOT NULL,
+    usuario_hash TEXT NOT NULL,
+    mes_chave INTEGER NOT NULL,
+    mes_ano TEXT NOT NULL,
+    saldo INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    hash TEXT,
+    tamanho_bruto TEXT,
+    atualizado_em DOUBLE NOT NULL,
+    PRIMARY KEY (host, usuario_hash, mes_chave)
+)
+"""
+
+_CAMPOS = ('saldo', 'etag', 'last_modified', 'hash', 'tamanho_bruto', 'atualizado_em')
+
+
+class _ArmazenamentoBase:
+    """Consultas comuns aos motores; as subclasses fornecem _conexao e o esquema
+
+    A chave primária (host, usuario_hash, mes_chave) atende às consultas de
+    intervalo por usuário; 'mes_chave' é um inteiro ordenável.
+    """
+
+    # Índices adicionais criados pelo motor (além das chaves primárias)
+    _INDICES = ()
+
+    def _criar_esquema(self):
+        with self._conexao() as conexao:
+            for comando in (_TABELA_MENSAL,) + self._INDICES:
+                conexao.execute(comando)
+
+    def _upsert(self, conexao, tabela, colunas, valores):
+        conexao.executemany(
+            f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) "
+            f"VALUES ({', '.join('?' for _ in colunas)})",
+            valores
+        )
+
+    # === Saldos mensais ===
+
+    def obter_meses(self, host, usuario_hash, meses):
+        """Retorna {mes_ano: dados} dos meses informados que estão armazenados"""
+        if not meses:
+            return {}
+        chaves = [chave_mes(m) for m in meses]
+        with self._conexao() as conexao:
+            linhas = conexao.execute(
+                f"SELECT mes_ano, {', '.join(_CAMPOS)} FROM saldos_mensais "
+                "WHERE host = ? AND usuario_hash = ? AND mes_chave BETWEEN ? AND ?",
+                (host, usuario_hash, min(chaves), max(chaves))
+            ).fetchall()
+
+        procurados = set(meses)
+        return {
+            linha[0]: dict(zip(_CAMPOS, linha[1:]))
+            for linha in linhas if linha[0] in procurados
+        }
+
+    def saldos_periodo(self, host, usuario_hash, mes_inicio, mes_fim):
+        """[(mes_ano, saldo)] do usuário entre dois meses 'MM/YYYY', em ordem"""
+        with self._conexao() as conexao:
+            return [tuple(linha) for linha in conexao.execute(
+                "SELECT mes_ano, saldo FROM saldos_mensais "
+                "WHERE host = ? AND usuario_hash = ? AND mes_chave BETWEEN ? AND ? ORDER BY mes_chave",
+                (host, usuario_hash, chave_mes(mes_inicio), chave_mes(mes_fim))
+            ).fetchall()]
+
+    def totais_por_mes(self, host, mes_inicio, mes_fim):
+        """[(mes_ano, saldo total, usuários)] de todos os usuários do host no período"""
+        with self._conexao() as conexao:
+            linhas = conexao.execute(
+                "SELECT mes_chave, SUM(saldo), COUNT(*) FROM saldos_mensais "
+                "WHERE host = ? AND mes_chave BETWEEN ? AND ? GROUP BY mes_chave ORDER BY mes_chave",
+                (host, chave_mes(mes_inicio), chave_mes(mes_fim))
+            ).fetchall()
+        return [(mes_ano_da_chave(chave), int(total), usuarios) for chave, total, usuarios in linhas]
+
+    def gravar_mes(self, host, usuario_hash, mes_ano, dados):
+        """Insere ou atualiza o saldo de um mês"""
+        self.gravar_lote([(host, usuario_hash, mes_ano, dados)])
+
+    def gravar_meses(self, host, usuario_hash, entradas):
+        """Insere ou atualiza vários meses de um usuário ({mes_ano: dados})"""
+        self.gravar_lote((host, usuario_hash, mes_ano, dados) for mes_ano, dados in entradas.items())
+
+    def gravar_lote(self, linhas):
+        """Upsert em lote de (host, usuario_hash, mes_ano, dados) em uma única transação"""
+        agora = time.time()
+        valores = []
+        for host, usuario_hash, mes_ano, dados in linhas:
+            campos = [dados.get(campo) for campo in _CAMPOS]
+            if campos[-1] is None:
+                campos[-1] = agora
+            valores.append([host, usuario_hash, chave_mes(mes_ano), mes_ano] + campos)
+        if not valores:
+            return
+
+        with self._lock, self._conexao() as conexao:
+            self._upsert(
+                conexao, 'saldos_mensais', ('host', 'usuario_hash', 'mes_chave', 'mes_ano') + _CAMPOS, valores
+            )
+
+
+class ArmazenamentoSaldos(_ArmazenamentoBase):
+    """Saldos por (host, hash do usuário, período) em um arquivo SQLite"""
+
+    # Consultas por período de todos os usuários (agregados do host)
+    _INDICES = (
+        "CREATE INDEX IF NOT EXISTS idx_saldos_mensais_periodo ON saldos_mensais (host, mes_chave)",
+    )
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._conexao() as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')
+        self._criar_esquema()
+
+    @contextmanager
+    def _conexao(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+
+class ArmazenamentoDuckDB(_ArmazenamentoBase):
+    """Saldos em um arquivo DuckDB (colunar), para agregações sobre milhões de linhas
+
+    O DuckDB permite um único processo gravando no arquivo: use com o app ou
+    a API em um processo só; workers distribuídos devem ficar no SQLite.
+    """
+
+    def __init__(self, caminho):
+        try:
+            import duckdb
+        except ImportError:
+            raise RuntimeError("O motor DuckDB requer o pacote 'duckdb' (pip install duckdb)")
+
+        self.caminho = caminho
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._banco = duckdb.connect(caminho)
+        self._criar_esquema()
+
+        # Arquivos criados com 'atualizado_em REAL' (FLOAT de 4 bytes no DuckDB)
+        with self._conexao() as conexao:
+            tipo = conexao.execute(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'saldos_mensais' AND column_name = 'atualizado_em'"
+            ).fetchone()
+            if tipo and tipo[0] != 'DOUBLE':
+                conexao.execute("ALTER TABLE saldos_mensais ALTER atualizado_em TYPE DOUBLE")
+
+    def _upsert(self, conexao, tabela, colunas, valores):
+        # executemany no DuckDB é linha a linha; o lote vai como um DataFrame
+        import pandas as pd
+
+        conexao.register('novas_linhas', pd.DataFrame(valores, columns=colunas))
+        try:
+            conexao.execute(
+                f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) "
+                f"SELECT {', '.join(colunas)} FROM novas_linhas"
+            )
+        finally:
+            conexao.unregister('novas_linhas')
+
+    @contextmanager
+    def _conexao(self):
+        # Um cursor por operação: a conexão do DuckDB não é compartilhável entre threads
+        cursor = self._banco.cursor()
+        try:
+            cursor.execute('BEGIN TRANSACTION')
+            try:
+                yield cursor
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+        finally:
+            cursor.close()
+
+
+MOTORES = {
+    'sqlite': ArmazenamentoSaldos,
+    'duckdb': ArmazenamentoDuckDB
+}
+
+
+def abrir_armazenamento(caminho, motor=MOTOR_PADRAO):
+    """Abre o armazenamento no motor indicado (ou pela extensão .duckdb do arquivo)"""
+    motor = (motor or ('duckdb' if caminho.endswith('.duckdb') else 'sqlite')).lower()
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de armazenamento desconhecido: {motor!r} (use sqlite ou duckdb)")
+    return MOTORES[motor](caminho)
+
+
+_armazenamento_padrao = None
+
+
+def armazenamento_padrao():
+    """Armazenamento configurado por BANCO_HORAS_ARMAZENAMENTO (ou None)"""
+    global _armazenamento_padrao
+    if not CAMINHO_PADRAO:
+        return None
+    if _armazenamento_padrao is None:
+        _armazenamento_padrao = abrir_armazenamento(CAMINHO_PADRAO)
+    return _armazenamento_padrao
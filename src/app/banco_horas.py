@@ -5,18 +5,70 @@ Contém toda a lógica de web scraping e processamento
 """
 
 import requests
-from bs4 import BeautifulSoup
 import re
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import time
 import random
+import hashlib
+import os
+from contextlib import contextmanager
+
+try:
+    from .importacao import importacao_tardia
+    from .limitador import CircuitoAberto, limitador_para_host
+    from .armazenamento import armazenamento_padrao
+    from .consultas import chave_mes
+    from . import perfil
+    from .transporte import CODIFICACOES_ACEITAS, criar_sessao, estatisticas_sessao
+except ImportError:
+    from importacao import importacao_tardia
+    from limitador import CircuitoAberto, limitador_para_host
+    from armazenamento import armazenamento_padrao
+    from consultas import chave_mes
+    import perfil
+    from transporte import CODIFICACOES_ACEITAS, criar_sessao, estatisticas_sessao
+
+# BeautifulSoup só é necessário quando uma página precisa ser analisada
+bs4 = importacao_tardia('bs4')
+
+# Por quanto tempo (segundos) um saldo armazenado dispensa a intranet:
+# os dois meses mais recentes ainda podem mudar, os anteriores raramente
+VALIDADE_MES_RECENTE = float(os.environ.get('BANCO_HORAS_VALIDADE_RECENTE_HORAS', '12')) * 3600
+VALIDADE_MES_ANTIGO = float(os.environ.get('BANCO_HORAS_VALIDADE_ANTIGO_HORAS', '168')) * 3600
+
+# Hora local em que termina o expediente: um mês recente obtido antes dela
+# (p.ex. no pré-aquecimento da madrugada) vale ao menos até lá
+FIM_EXPEDIENTE = int(os.environ.get('BANCO_HORAS_FIM_EXPEDIENTE', '19'))
+
+# HEAD comparando só o tamanho do corpo, para intranets sem ETag/Last-Modified:
+# opcional porque páginas com saldos diferentes podem ter o mesmo tamanho
+REVALIDAR_POR_TAMANHO = os.environ.get('BANCO_HORAS_REVALIDAR_TAMANHO', '') == '1'
+
+# Campo de senha: a intranet devolveu o formulário de login em vez do relatório
+_CAMPO_SENHA = re.compile(rb'type\s*=\s*["\']?password', re.I)
+
+
+class MesIndisponivel(Exception):
+    """Saldo do mês não obtido da intranet após todas as tentativas"""
+
+    def __init__(self, mes_ano):
+        self.mes_ano = mes_ano
+        super().__init__(f"Não foi possível obter o saldo de {mes_ano} na intranet")
+
+
+class SessaoExpirada(Exception):
+    """A intranet respondeu com a página de login: é preciso autenticar de novo"""
+
+    def __init__(self):
+        super().__init__("Sessão da intranet expirada; faça login novamente")
 
 
 class BancoHorasAdvanced:
-    def __init__(self, base_url):
-        self.session = requests.Session()
+    def __init__(self, base_url, armazenamento=None, revalidar_por_tamanho=None):
+        # Pool ajustado, novas tentativas de conexão e medição do reuso (transporte.py)
+        self.session = criar_sessao()
         
         # User-Agent mais realista e randomizado
         user_agents = [
@@ -30,7 +82,7 @@ class BancoHorasAdvanced:
             'User-Agent': random.choice(user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': CODIFICACOES_ACEITAS,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         })
@@ -39,12 +91,61 @@ class BancoHorasAdvanced:
         self.login_url = f"{self.base_url}/ControleAcesso/Seguranca/Login?ReturnUrl=%2fHoras%2fFolhaPonto%2fRelatorio"
         self.relatorio_url = f"{self.base_url}/Horas/FolhaPonto/Relatorio"
         
+        # Ritmo de requisições e disjuntor compartilhados por todos os
+        # usuários da mesma intranet (substitui a pausa fixa entre meses)
+        self.host = urlparse(base_url).netloc.lower()
+        self.limitador = limitador_para_host(self.host)
+        
+        # Saldos já calculados em disco (None = sem armazenamento local)
+        self.armazenamento = armazenamento if armazenamento is not None else armazenamento_padrao()
+        self.usuario_hash = None
+        
+        # Gravações adiadas para um upsert em lote (None = gravar cada mês)
+        self._gravacoes_pendentes = None
+        
+        # Medições por mês durante uma captura de perfil (perfil.capturar)
+        self.perfil = None
+        
+        # Cache de meses já processados com validadores HTTP
+        # (ETag, Last-Modified e hash do corpo como fallback)
+        self.cache_meses = {}
+        
+        # HEAD comparando apenas o tamanho do corpo (None = BANCO_HORAS_REVALIDAR_TAMANHO)
+        self.revalidar_por_tamanho = (
+            REVALIDAR_POR_TAMANHO if revalidar_por_tamanho is None else revalidar_por_tamanho
+        )
+        
+    def _requisitar(self, metodo, url, **kwargs):
+        """Executa uma requisição respeitando o limitador compartilhado da intranet"""
+        self.limitador.antes_da_requisicao()
+        try:
+            response = self.session.request(metodo, url, **kwargs)
+        except Exception:
+            self.limitador.registrar_falha()
+            raise
+        
+        # Sobrecarga do servidor conta como falha para o ritmo e o disjuntor
+        if response.status_code == 429 or response.status_code >= 500:
+            self.limitador.registrar_falha()
+        else:
+            self.limitador.registrar_sucesso()
+        return response
+    
+    def estatisticas_conexoes(self):
+        """Requisições, conexões abertas e taxa de reuso de conexões desta sessão"""
+        return estatisticas_sessao(self.session)
+    
+    def definir_usuario(self, usuario):
+        """Identifica o usuário no armazenamento local (apenas o hash é guardado)"""
+        self.usuario_hash = hashlib.sha256(f"{self.host}:{usuario}".encode('utf-8')).hexdigest()
+    
     def fazer_login(self, usuario, senha):
         """Faz login no sistema com verificações adicionais"""
+        self.definir_usuario(usuario)
         try:
             # Acessar página de login
-            login_page = self.session.get(self.login_url, timeout=10)
-            soup = BeautifulSoup(login_page.content, 'html.parser')
+            login_page = self._requisitar('GET', self.login_url, timeout=10)
+            soup = bs4.BeautifulSoup(login_page.content, 'html.parser')
             
             # Encontrar formulário de login
             form = soup.find('form')
@@ -80,11 +181,14 @@ class BancoHorasAdvanced:
                 })
             
             # Fazer login
-            response = self.session.post(self.login_url, data=login_data, timeout=10)
+            response = self._requisitar('POST', self.login_url, data=login_data, timeout=10)
             
             # Verificar sucesso
             return self._verificar_login_sucesso(response)
                 
+        except CircuitoAberto:
+            # Intranet instável: não confundir com credenciais inválidas
+            raise
         except requests.exceptions.Timeout:
             # Timeout específico
             return False
@@ -117,9 +221,25 @@ class BancoHorasAdvanced:
         sucesso = status_ok and url_ok and not tem_erro
         return sucesso
     
+    def _pagina_de_login(self, response):
+        """Indica se a intranet redirecionou para a página de login (sessão expirada)"""
+        return 'login' in urlparse(response.url).path.lower()
+    
+    def sessao_valida(self):
+        """Confere se os cookies atuais ainda abrem o relatório (sem redirecionar ao login)"""
+        try:
+            response = self._requisitar('GET', self.relatorio_url, timeout=10)
+        except requests.exceptions.RequestException:
+            return False
+        return response.status_code == 200 and not self._pagina_de_login(response)
+    
     def extrair_horas_avancado(self, html_content):
-        """Extração mais robusta dos dados de horas"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        """Extração mais robusta dos dados de horas
+        
+        Retorna None quando a página não tem a tabela de saldos (página de
+        erro ou de login), para não confundir com um saldo zerado.
+        """
+        soup = bs4.BeautifulSoup(html_content, 'html.parser')
         
         funcionario_deve_minutos = 0
         empresa_deve_minutos = 0
@@ -137,6 +257,10 @@ class BancoHorasAdvanced:
                 funcionario_deve_minutos = func_deve
                 empresa_deve_minutos = emp_deve
                 break
+        else:
+            # Saldo zerado só vale se as linhas da tabela existirem
+            if not soup.find(string=re.compile(r'funcionário deve|empresa deve', re.I)):
+                return None
         
         return empresa_deve_minutos - funcionario_deve_minutos
     
@@ -217,20 +341,106 @@ class BancoHorasAdvanced:
             
         return 0
     
+    def _cabecalhos_condicionais(self, cache):
+        """Monta os cabeçalhos If-None-Match/If-Modified-Since a partir do cache"""
+        headers = {}
+        if not cache:
+            return headers
+        
+        if cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        if cache.get('last_modified'):
+            headers['If-Modified-Since'] = cache['last_modified']
+        
+        return headers
+    
+    def _tamanho_inalterado(self, url_mes, cache, timeout):
+        """Verificação barata via HEAD para servidores sem validadores"""
+        if not self.revalidar_por_tamanho or not cache.get('tamanho_bruto'):
+            return False
+        
+        response = self._requisitar('HEAD', url_mes, timeout=timeout, allow_redirects=False)
+        if response.status_code != 200:
+            return False
+        
+        return response.headers.get('Content-Length') == cache['tamanho_bruto']
+    
+    def _atualizar_cache_mes(self, mes_ano, response, saldo, hash_corpo):
+        """Guarda o saldo do mês junto com os validadores da resposta"""
+        self.cache_meses[mes_ano] = {
+            'saldo': saldo,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash': hash_corpo,
+            'tamanho_bruto': response.headers.get('Content-Length'),
+            'atualizado_em': time.time()
+        }
+    
     def processar_mes_com_retry(self, mes_ano, max_tentativas=3):
-        """Processa um mês com tentativas múltiplas e backoff exponencial"""
+        """Processa um mês com tentativas múltiplas e backoff exponencial
+        
+        Levanta MesIndisponivel se nenhuma tentativa trouxer a tabela de
+        saldos e SessaoExpirada se a intranet pedir login novamente.
+        """
+        cache = self.cache_meses.get(mes_ano)
+        
         for tentativa in range(max_tentativas):
             try:
                 url_mes = f"{self.relatorio_url}?mesAno={quote(mes_ano)}"
                 
                 # Timeout progressivo
                 timeout = 10 + (tentativa * 5)
-                response = self.session.get(url_mes, timeout=timeout)
+                
+                # Requisição condicional quando o mês já está em cache
+                headers = self._cabecalhos_condicionais(cache)
+                if cache and not headers and self._tamanho_inalterado(url_mes, cache, timeout):
+                    cache['atualizado_em'] = time.time()
+                    return cache['saldo']
+                
+                inicio_requisicao = time.perf_counter()
+                response = self._requisitar('GET', url_mes, headers=headers, timeout=timeout)
+                tempo_requisicao = time.perf_counter() - inicio_requisicao
+                
+                # 304: nada mudou, reaproveitar o parse anterior
+                if response.status_code == 304 and cache:
+                    if self.perfil:
+                        self.perfil.registrar_mes(mes_ano, 304, 0, tempo_requisicao, None)
+                    cache['atualizado_em'] = time.time()
+                    return cache['saldo']
                 
                 if response.status_code == 200:
-                    saldo = self.extrair_horas_avancado(response.content)
-                    return saldo
+                    # Sessão expirada: repetir não adianta sem um novo login
+                    if self._pagina_de_login(response):
+                        raise SessaoExpirada()
+                    
+                    conteudo = response.content
+                    hash_corpo = hashlib.sha256(conteudo).hexdigest()
+                    
+                    # Corpo idêntico ao do cache dispensa um novo parse
+                    if cache and cache.get('hash') == hash_corpo:
+                        saldo = cache['saldo']
+                        tempo_parse = None
+                    else:
+                        inicio_parse = time.perf_counter()
+                        saldo = self.extrair_horas_avancado(conteudo)
+                        tempo_parse = time.perf_counter() - inicio_parse
                     
+                    if self.perfil:
+                        self.perfil.registrar_mes(mes_ano, 200, len(conteudo), tempo_requisicao, tempo_parse)
+                    if saldo is not None:
+                        self._atualizar_cache_mes(mes_ano, response, saldo, hash_corpo)
+                        return saldo
+                    # Sem tabela de saldos e com formulário de login no lugar
+                    if _CAMPO_SENHA.search(conteudo):
+                        raise SessaoExpirada()
+                
+                # Servidor sobrecarregado ou página sem saldos: esperar antes de tentar de novo
+                if tentativa < max_tentativas - 1:
+                    time.sleep(2 ** (tentativa + 1))
+                    
+            except (CircuitoAberto, SessaoExpirada):
+                # Falhar rápido: intranet instável ou sessão que exige novo login
+                raise
             except requests.exceptions.Timeout:
                 if tentativa < max_tentativas - 1:
                     # Backoff exponencial: 2, 4, 8 segundos
@@ -245,7 +455,81 @@ class BancoHorasAdvanced:
                     wait_time = 2 ** (tentativa + 1)
                     time.sleep(wait_time)
         
-        return 0
+        raise MesIndisponivel(mes_ano)
+    
+    def carregar_armazenados(self, meses):
+        """Lê de uma vez os meses do período já presentes no armazenamento local"""
+        if self.armazenamento is None or self.usuario_hash is None:
+            return {}
+        return self.armazenamento.obter_meses(self.host, self.usuario_hash, meses)
+    
+    def _entrada_recente(self, mes_ano, entrada):
+        """Indica se o saldo armazenado ainda pode ser usado sem acessar a intranet"""
+        hoje = datetime.now()
+        meses_atras = (hoje.year * 12 + hoje.month - 1) - chave_mes(mes_ano)
+        if meses_atras > 1:
+            return time.time() - entrada['atualizado_em'] < VALIDADE_MES_ANTIGO
+        
+        atualizado = datetime.fromtimestamp(entrada['atualizado_em'])
+        fim_expediente = atualizado.replace(hour=FIM_EXPEDIENTE, minute=0, second=0, microsecond=0)
+        return time.time() < max(entrada['atualizado_em'] + VALIDADE_MES_RECENTE, fim_expediente.timestamp())
+    
+    def atualizar_mes(self, mes_ano):
+        """Busca o mês na intranet e grava o resultado no armazenamento local
+        
+        Falhas (MesIndisponivel, SessaoExpirada) não gravam nada.
+        """
+        saldo = self.processar_mes_com_retry(mes_ano)
+        
+        entrada = self.cache_meses.get(mes_ano)
+        if self.armazenamento is not None and self.usuario_hash is not None and entrada:
+            if self._gravacoes_pendentes is not None:
+                self._gravacoes_pendentes[mes_ano] = entrada
+            else:
+                self.armazenamento.gravar_mes(self.host, self.usuario_hash, mes_ano, entrada)
+        return saldo
+    
+    def gravar_pendentes(self):
+        """Grava no armazenamento, em uma única transação, os meses adiados"""
+        pendentes, self._gravacoes_pendentes = self._gravacoes_pendentes, None
+        if pendentes:
+            self.armazenamento.gravar_meses(self.host, self.usuario_hash, pendentes)
+    
+    @contextmanager
+    def gravacao_em_lote(self):
+        """Adia as gravações de atualizar_mes para um único upsert na saída
+        
+        Reentrante: dentro de um lote já aberto não faz nada, e o lote mais
+        externo grava tudo ao terminar (inclusive por exceção).
+        """
+        if self._gravacoes_pendentes is not None:
+            yield
+            return
+        self._gravacoes_pendentes = {}
+        try:
+            yield
+        finally:
+            self.gravar_pendentes()
+    
+    def obter_saldo_mes(self, mes_ano, armazenados=None):
+        """Saldo do mês: armazenamento local se recente, senão intranet"""
+        if armazenados is None:
+            armazenados = self.carregar_armazenados([mes_ano])
+        
+        entrada = armazenados.get(mes_ano)
+        if entrada:
+            if self._entrada_recente(mes_ano, entrada):
+                return entrada['saldo']
+            # Entrada antiga ainda serve como validador para requisição condicional
+            self.cache_meses.setdefault(mes_ano, entrada)
+        
+        try:
+            return self.atualizar_mes(mes_ano)
+        except (MesIndisponivel, CircuitoAberto):
+            # Intranet fora do ar: o último saldo obtido vale mais que nenhum
+            if entrada:
+                return entrada['saldo']
+            raise
     
     def minutos_para_tempo(self, minutos):
         """Converte minutos para formato HH:MM ou em minutos se menor que 1 hora"""
@@ -276,33 +560,50 @@ class BancoHorasAdvanced:
         
         return meses
     
-    def calcular_banco_horas(self, mes_inicio, ano_inicio, mes_fim, ano_fim, progress_callback=None):
-        """Calcula o banco de horas total no período especificado"""
-        meses = self.gerar_lista_meses(mes_inicio, ano_inicio, mes_fim, ano_fim)
-        
-        # Proteção contra lista vazia de meses
-        if not meses:
-            return 0, []
-        
-        total_minutos = 0
-        detalhes = []
-        total_meses = len(meses)
-        
-        for i, mes_ano in enumerate(meses):
-            saldo_mes = self.processar_mes_com_retry(mes_ano)
-            total_minutos += saldo_mes
-            detalhes.append({
-                'mes_ano': mes_ano,
-                'saldo': saldo_mes,
-                'saldo_formatado': self.minutos_para_tempo(saldo_mes)
-            })
-            
-            # Callback de progresso se fornecido
-            if progress_callback:
-                mes_atual = i + 1
-                progress_callback(mes_atual, total_meses, mes_ano)
-            
-            # Pausa pequena entre requisições
-            time.sleep(0.5)
+    def iterar_banco_horas(self, mes_inicio, ano_inicio, mes_fim, ano_fim, progress_callback=None,
+                           checkpoint=None):
+        """Gera o resultado de cada mês do período assim que ele é processado
         
+        Com um CheckpointJob, meses já concluídos em uma execução anterior
+        são reaproveitados e cada novo mês é gravado assim que termina; um
+        mês que falha (MesIndisponivel) interrompe o cálculo sem ser gravado.
+        Os meses buscados na intranet vão para o armazenamento em um único
+        upsert quando a iteração termina ou é interrompida. Com
+        BANCO_HORAS_PERFIL definido, a iteração é perfilada
+        (perfil.capturar_do_ambiente), qualquer que seja o chamador.
+        """
+        with perfil.capturar_do_ambiente(self), self.gravacao_em_lote():
+            meses = self.gerar_lista_meses(mes_inicio, ano_inicio, mes_fim, ano_fim)
+            total_meses = len(meses)
+            concluidos = checkpoint.carregar() if checkpoint else {}
+            armazenados = self.carregar_armazenados([m for m in meses if m not in concluidos])
+            
+            for i, mes_ano in enumerate(meses):
+                if mes_ano in concluidos:
+                    detalhe = concluidos[mes_ano]
+                else:
+                    saldo_mes = self.obter_saldo_mes(mes_ano, armazenados)
+                    detalhe = {
+                        'mes_ano': mes_ano,
+                        'saldo': saldo_mes,
+                        'saldo_formatado': self.minutos_para_tempo(saldo_mes)
+                    }
+                    if checkpoint:
+                        checkpoint.registrar(detalhe)
+                
+                # Callback de progresso se fornecido
+                if progress_callback:
+                    mes_atual = i + 1
+                    progress_callback(mes_atual, total_meses, mes_ano)
+                
+                yield detalhe
+    
+    def calcular_banco_horas(self, mes_inicio, ano_inicio, mes_fim, ano_fim, progress_callback=None,
+                             checkpoint=None):
+        """Calcula o banco de horas total no período especificado"""
+        detalhes = list(self.iterar_banco_horas(
+            mes_inicio, ano_inicio, mes_fim, ano_fim,
+            progress_callback=progress_callback, checkpoint=checkpoint
+        ))
+        total_minutos = sum(d['saldo'] for d in detalhes)
         return total_minutos, detalhes
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: usuários virtuais simultâneos contra uma intranet simulada
+Cada usuário é um cliente headless do protocolo WebSocket do Streamlit que
+percorre login → cálculo → resultados em um servidor 'streamlit run'
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_streamlit.py')
+
+# Tempo máximo de um fluxo completo (inclui as pausas da interface)
+TIMEOUT_FLUXO = 600
+
+ROTULO_URL = 'URL da Intranet:'
+ROTULO_USUARIO = 'Usuário:'
+ROTULO_SENHA = 'Senha:'
+ROTULO_CALCULAR = '🚀 Calcular Banco de Horas'
+
+
+class _ManipuladorIntranet(BaseHTTPRequestHandler):
+    """Páginas mínimas de login e relatório no formato esperado pelo scraper"""
+
+    protocol_version = 'HTTP/1.1'
+    atraso = 0.0
+    # Definidos por IntranetSimulada (estado compartilhado entre requisições)
+    intranet = None
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo=b'', cabecalhos=None):
+        self.send_response(status)
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        # HEAD: mesmos cabeçalhos do GET, sem o corpo
+        if self.command != 'HEAD':
+            self.wfile.write(corpo)
+
+    def do_GET(self):
+        time.sleep(self.atraso)
+        url = urlparse(self.path)
+        if url.path.startswith('/ControleAcesso/Seguranca/Login'):
+            return self._responder(200, (
+                b'<form method="post"><input type="hidden" name="__RequestVerificationToken" value="t">'
+                b'<input type="text" name="Login"><input type="password" name="Senha"></form>'
+            ), {'Content-Type': 'text/html; charset=utf-8'})
+
+        if url.path == '/Horas/FolhaPonto/Relatorio':
+            # Sem cookie de sessão válido a intranet manda de volta ao login
+            if self.intranet.exigir_sessao and self._cookie_sessao() not in self.intranet.sessoes:
+                return self._responder(302, cabecalhos={
+                    'Location': '/ControleAcesso/Seguranca/Login?ReturnUrl=%2fHoras%2fFolhaPonto%2fRelatorio'
+                })
+            mes_ano = parse_qs(url.query).get('mesAno', ['01/2000'])[0]
+            self.intranet.requisicoes.append((self.command, mes_ano))
+            if mes_ano in self.intranet.meses_com_falha:
+                return self._responder(503)
+            # Saldo determinístico por mês para conferir o total esperado
+            semente = int(hashlib.md5(mes_ano.encode('utf-8')).hexdigest()[:4], 16)
+            corpo = (
+                '<table>'
+                f'<tr class="text-primary"><td>Funcionário deve</td> <td>{semente % 9:02d}:{semente % 60:02d}</td></tr>'
+                f'<tr class="text-danger"><td>Empresa deve</td> <td>{semente % 7:02d}:{semente % 45:02d}</td></tr>'
+                '</table>'
+            ).encode('utf-8')
+            if not self.intranet.validadores:
+                return self._responder(200, corpo, {'Content-Type': 'text/html; charset=utf-8'})
+            etag = '"' + hashlib.md5(corpo).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                return self._responder(304, cabecalhos={'ETag': etag})
+            return self._responder(200, corpo, {'ETag': etag, 'Content-Type': 'text/html; charset=utf-8'})
+
+        self._responder(404)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        time.sleep(self.atraso)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        sessao = hashlib.md5(os.urandom(16)).hexdigest()
+        self.intranet.sessoes.add(sessao)
+        self._responder(302, cabecalhos={
+            'Location': '/Horas/FolhaPonto/Relatorio', 'Set-Cookie': f'sessao={sessao}; Path=/'
+        })
+
+    def _cookie_sessao(self):
+        for par in (self.headers.get('Cookie') or '').split(';'):
+            nome, _, valor = par.strip().partition('=')
+            if nome == 'sessao':
+                return valor
+        return None
+
+
+class IntranetSimulada:
+    """Servidor HTTP local em segundo plano; use como gerenciador de contexto
+
+    Com 'exigir_sessao', o relatório só abre com o cookie emitido no login
+    (expirar_sessoes simula o fim das sessões); meses em 'meses_com_falha'
+    respondem 503. Sem 'validadores' o relatório não traz ETag (nem
+    responde 304). 'requisicoes' registra (método, mês) de cada relatório.
+    """
+
+    def __init__(self, atraso=0.0, porta=0, exigir_sessao=False, meses_com_falha=(), validadores=True):
+        self.exigir_sessao = exigir_sessao
+        self.meses_com_falha = set(meses_com_falha)
+        self.validadores = validadores
+        self.requisicoes = []
+        self.sessoes = set()
+        manipulador = type('Manipulador', (_ManipuladorIntranet,), {'atraso': atraso, 'intranet': self})
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', porta), manipulador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def expirar_sessoes(self):
+        self.sessoes.clear()
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class ServidorStreamlit:
+    """Sobe 'streamlit run' do app em segundo plano; use como gerenciador de contexto"""
+
+    def __init__(self, porta=8599, espera=60):
+        self.porta = porta
+        self.espera = espera
+        self.url = f"http://127.0.0.1:{porta}"
+        self.processo = None
+
+    def __enter__(self):
+        # A intranet simulada escuta em 127.0.0.1: o app precisa aceitar URLs locais
+        ambiente = dict(os.environ, BANCO_HORAS_PERMITIR_URL_LOCAL='1')
+        self.processo = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', CAMINHO_APP,
+             '--server.port', str(self.porta), '--server.headless', 'true',
+             '--browser.gatherUsageStats', 'false'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=ambiente
+        )
+        limite = time.monotonic() + self.espera
+        while time.monotonic() < limite:
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=2):
+                    return self
+            except OSError:
+                if self.processo.poll() is not None:
+                    break
+                time.sleep(0.5)
+        self.__exit__()
+        raise RuntimeError("servidor Streamlit não respondeu")
+
+    def __exit__(self, *exc):
+        self.processo.terminate()
+        try:
+            self.processo.wait(10)
+        except subprocess.TimeoutExpired:
+            self.processo.kill()
+
+
+def uso_processo(pid):
+    """(segundos de CPU, memória residente em bytes) de um processo pelo /proc
+
+    Retorna (None, None) fora do Linux ou se o processo não existe.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            campos = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None, None
+    # utime e stime são os campos 14 e 15 de /proc/<pid>/stat
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+    return cpu, paginas * os.sysconf('SC_PAGE_SIZE')
+
+
+class _SessaoHeadless:
+    """Uma aba do navegador: conexão WebSocket com o servidor Streamlit"""
+
+    def __init__(self, url_app):
+        self.url_ws = url_app.replace('http', 'ws', 1).rstrip('/') + '/_stcore/stream'
+        self.conexao = None
+        self.widgets = {}
+
+    async def conectar(self):
+        from tornado.websocket import websocket_connect
+        self.conexao = await websocket_connect(self.url_ws, subprotocols=['streamlit'])
+
+    async def executar(self, valores=None, gatilhos=()):
+        """Envia um rerun com o estado dos widgets e lê até o script terminar
+
+        Retorna os textos de cabeçalhos e alertas exibidos; erros levantam exceção.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        mensagem = BackMsg()
+        estado = mensagem.rerun_script
+        estado.query_string = ''
+        for rotulo, valor in (valores or {}).items():
+            widget = estado.widget_states.widgets.add()
+            widget.id = self.widgets[rotulo]
+            widget.string_value = valor
+        for rotulo in gatilhos:
+            widget = estado.widget_states.widgets.add()
+            widget.id = self.widgets[rotulo]
+            widget.trigger_value = True
+        await self.conexao.write_message(mensagem.SerializeToString(), binary=True)
+
+        textos = []
+        while True:
+            bruto = await self.conexao.read_message()
+            if bruto is None:
+                raise RuntimeError("conexão encerrada pelo servidor")
+            resposta = ForwardMsg()
+            resposta.ParseFromString(bruto)
+            tipo = resposta.WhichOneof('type')
+
+            if tipo == 'delta' and resposta.delta.WhichOneof('type') == 'new_element':
+                elemento = resposta.delta.new_element
+                tipo_elemento = elemento.WhichOneof('type')
+                if tipo_elemento in ('text_input', 'button'):
+                    self.widgets[getattr(elemento, tipo_elemento).label] = getattr(elemento, tipo_elemento).id
+                elif tipo_elemento == 'exception':
+                    raise RuntimeError(elemento.exception.message)
+                elif tipo_elemento == 'alert' and elemento.alert.format == elemento.alert.ERROR:
+                    raise RuntimeError(elemento.alert.body)
+                elif tipo_elemento in ('heading', 'alert'):
+                    textos.append(getattr(elemento, tipo_elemento).body)
+
+            # st.rerun() ao fim do processamento encerra a execução com FINISHED_EARLY_FOR_RERUN
+            elif tipo == 'script_finished' and resposta.script_finished == resposta.FINISHED_SUCCESSFULLY:
+                return textos
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+
+
+async def executar_fluxo(url_app, url_intranet, usuario, senha='carga'):
+    """Um usuário virtual: abre a página, preenche a barra lateral e calcula
+
+    Retorna a latência de ponta a ponta em segundos; falhas levantam exceção.
+    """
+    inicio = time.perf_counter()
+    sessao = _SessaoHeadless(url_app)
+    try:
+        await sessao.conectar()
+        await sessao.executar()
+        textos = await sessao.executar(
+            {ROTULO_URL: url_intranet, ROTULO_USUARIO: usuario, ROTULO_SENHA: senha},
+            gatilhos=(ROTULO_CALCULAR,)
+        )
+    finally:
+        sessao.fechar()
+
+    if not any(texto.startswith('📊 Resultados -') for texto in textos):
+        raise RuntimeError('resultados não exibidos')
+    return time.perf_counter() - inicio
+
+
+def _percentil(valores, p):
+    """Percentil por posição mais próxima (valores ordenados)"""
+    if not valores:
+        return float('nan')
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+async def medir_concorrencia(url_app, url_intranet, usuarios, fluxos_por_usuario=1, pid=None, log=print):
+    """Executa 'usuarios' sessões simultâneas e mede latência, vazão, CPU e memória do servidor"""
+    latencias = []
+    falhas = []
+    rss_pico = [0]
+
+    async def amostrar_memoria():
+        while True:
+            _, rss = uso_processo(pid)
+            rss_pico[0] = max(rss_pico[0], rss or 0)
+            await asyncio.sleep(0.2)
+
+    async def usuario_virtual(indice):
+        # Usuários distintos: checkpoints e caches não são compartilhados entre eles
+        for rodada in range(fluxos_por_usuario):
+            try:
+                latencias.append(await asyncio.wait_for(
+                    executar_fluxo(url_app, url_intranet, f"carga{usuarios}_{indice}_{rodada}"),
+                    TIMEOUT_FLUXO
+                ))
+            except Exception as e:
+                falhas.append(str(e))
+                log(f"❌ usuário {indice}: {e or type(e).__name__}")
+
+    amostrador = asyncio.create_task(amostrar_memoria()) if pid else None
+    cpu_inicio, _ = uso_processo(pid) if pid else (None, None)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario_virtual(i) for i in range(usuarios)))
+    duracao = time.perf_counter() - inicio
+    cpu_fim, _ = uso_processo(pid) if pid else (None, None)
+    if amostrador:
+        amostrador.cancel()
+
+    latencias.sort()
+    return {
+        'usuarios': usuarios,
+        'fluxos': len(latencias),
+        'falhas': len(falhas),
+        'p50': _percentil(latencias, 50),
+        'p95': _percentil(latencias, 95),
+        'p99': _percentil(latencias, 99),
+        'vazao_por_minuto': len(latencias) / duracao * 60 if duracao else 0.0,
+        'cpu_percentual': (cpu_fim - cpu_inicio) / duracao * 100 if cpu_inicio is not None and cpu_fim is not None else None,
+        'rss_pico_mb': rss_pico[0] / 1024 / 1024 if rss_pico[0] else None
+    }
+
+
+def executar_carga(niveis, fluxos_por_usuario=1, atraso=0.0, url_app=None, url_intranet=None,
+                   pid=None, porta=8599, log=print):
+    """Mede cada nível de concorrência em sequência
+
+    Sem 'url_app' sobe o próprio servidor Streamlit (e mede CPU/memória dele);
+    sem 'url_intranet' sobe a intranet simulada. Um app já em execução só
+    aceita a intranet simulada se iniciado com BANCO_HORAS_PERMITIR_URL_LOCAL=1.
+    """
+    async def medir_niveis(url_app, url_intranet, pid):
+        medicoes = []
+        for usuarios in niveis:
+            log(f"👥 {usuarios} usuários simultâneos...")
+            medicoes.append(await medir_concorrencia(url_app, url_intranet, usuarios, fluxos_por_usuario, pid, log))
+        return medicoes
+
+    intranet = None if url_intranet else IntranetSimulada(atraso)
+    servidor = None if url_app else ServidorStreamlit(porta)
+    try:
+        if intranet:
+            intranet.__enter__()
+            url_intranet = intranet.url
+            log(f"🧪 Intranet simulada em {url_intranet}")
+        if servidor:
+            servidor.__enter__()
+            url_app, pid = servidor.url, servidor.processo.pid
+            log(f"🚀 Streamlit em {url_app} (PID {pid})")
+        elif intranet:
+            log("ℹ️ O app em --url-app precisa ter sido iniciado com BANCO_HORAS_PERMITIR_URL_LOCAL=1")
+        return asyncio.run(medir_niveis(url_app, url_intranet, pid))
+    finally:
+        if servidor:
+            servidor.__exit__()
+        if intranet:
+            intranet.__exit__()
+
+
+def formatar_relatorio(medicoes):
+    """Tabela de texto com uma linha por nível de concorrência"""
+    def numero(valor, formato):
+        return 'n/d' if valor is None else format(valor, formato)
+
+    linhas = [
+        f"{'usuários':>8} {'fluxos':>6} {'falhas':>6} {'p50 (s)':>8} {'p95 (s)':>8} "
+        f"{'p99 (s)':>8} {'fluxos/min':>10} {'CPU %':>6} {'RSS pico (MB)':>13}"
+    ]
+    for m in medicoes:
+        linhas.append(
+            f"{m['usuarios']:>8} {m['fluxos']:>6} {m['falhas']:>6} {m['p50']:>8.2f} {m['p95']:>8.2f} "
+            f"{m['p99']:>8.2f} {m['vazao_por_minuto']:>10.1f} {numero(m['cpu_percentual'], '.0f'):>6} "
+            f"{numero(m['rss_pico_mb'], '.0f'):>13}"
+        )
+    return '\n'.join(linhas)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Checkpoint de cálculos longos
+Cada mês concluído é gravado assim que processado, permitindo retomar
+um cálculo interrompido buscando apenas os meses que faltam
+"""
+
+import hashlib
+import json
+import os
+import time
+
+
+DIRETORIO_PADRAO = os.environ.get(
+    'BANCO_HORAS_CHECKPOINTS',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'temp', 'checkpoints')
+)
+
+# Idade máxima (segundos) de um checkpoint retomável; depois disso os
+# meses gravados podem ter mudado na intranet e o cálculo recomeça
+VALIDADE_PADRAO = float(os.environ.get('BANCO_HORAS_CHECKPOINT_HORAS', '24')) * 3600
+
+
+class CheckpointIncompativel(Exception):
+    """O checkpoint pertence a outro cálculo (intranet, usuário ou período)"""
+
+
+def descricao_job(host, usuario_hash, mes_inicio, ano_inicio, mes_fim, ano_fim):
+    """Identifica o cálculo (intranet, hash do usuário e período) de um job"""
+    return f"{host}|{usuario_hash}|{mes_inicio:02d}/{ano_inicio}|{mes_fim:02d}/{ano_fim}"
+
+
+def id_job(host, usuario_hash, mes_inicio, ano_inicio, mes_fim, ano_fim):
+    """ID determinístico do cálculo: o mesmo pedido retoma o mesmo job"""
+    chave = descricao_job(host, usuario_hash, mes_inicio, ano_inicio, mes_fim, ano_fim)
+    return hashlib.sha256(chave.encode('utf-8')).hexdigest()[:16]
+
+
+class CheckpointJob:
+    """Meses já concluídos de um job, gravados em JSON Lines
+
+    A primeira linha guarda o instante de criação e a descrição do cálculo
+    ({"criado_em": ..., "job": descricao_job(...)}); as demais são os
+    detalhes dos meses obtidos da intranet.
+    """
+
+    def __init__(self, job_id, diretorio=None, validade=VALIDADE_PADRAO, descricao=None):
+        diretorio = diretorio or DIRETORIO_PADRAO
+        self.job_id = job_id
+        self.caminho = os.path.join(diretorio, f"{job_id}.jsonl")
+        self.validade = validade
+        self.descricao = descricao
+        os.makedirs(diretorio, exist_ok=True)
+
+    def carregar(self):
+        """Retorna {mes_ano: detalhe} dos meses já concluídos
+
+        Checkpoints mais antigos que a validade (ou sem data de criação)
+        são descartados e o cálculo recomeça do zero. Com 'descricao', um
+        checkpoint de outro cálculo levanta CheckpointIncompativel.
+        """
+        concluidos = {}
+        if not os.path.exists(self.caminho):
+            return concluidos
+
+        criado_em = None
+        descricao = None
+        tamanho_valido = 0
+        with open(self.caminho, 'rb') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    # Linha incompleta (processo interrompido durante a escrita)
+                    break
+                if 'criado_em' in registro:
+                    criado_em = registro['criado_em']
+                    descricao = registro.get('job')
+                else:
+                    concluidos[registro['mes_ano']] = registro
+                tamanho_valido += len(linha)
+
+        if criado_em is None or time.time() - criado_em > self.validade:
+            self.remover()
+            return {}
+
+        if self.descricao is not None and descricao != self.descricao:
+            if descricao is None:
+                # Checkpoint de uma versão anterior, sem descrição: recomeçar
+                self.remover()
+                return {}
+            raise CheckpointIncompativel(
+                f"O job {self.job_id} pertence a outro cálculo (intranet, usuário ou período)"
+            )
+
+        # Descartar o trecho corrompido para que novas linhas fiquem íntegras
+        if tamanho_valido < os.path.getsize(self.caminho):
+            with open(self.caminho, 'r+b') as f:
+                f.truncate(tamanho_valido)
+        return concluidos
+
+    def registrar(self, detalhe):
+        """Grava um mês concluído de forma durável"""
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            if f.tell() == 0:
+                f.write(json.dumps({'criado_em': time.time(), 'job': self.descricao}) + '\n')
+            f.write(json.dumps(detalhe, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remover(self):
+        """Apaga o checkpoint após o cálculo terminar"""
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Interface de linha de comando da Calculadora de Banco de Horas
+Execuções sem interface (lote da equipe e utilitários)
+"""
+
+import argparse
+import contextlib
+import sys
+from datetime import datetime
+
+
+# Primeiro ano aceito (o mesmo limite da API e do seletor de datas da interface)
+ANO_MINIMO = 2000
+
+
+def _periodo(texto):
+    """Converte 'MM/YYYY' em (mês, ano)"""
+    try:
+        mes, ano = texto.split('/')
+        mes, ano = int(mes), int(ano)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"período inválido: {texto!r} (use MM/YYYY)")
+    if not 1 <= mes <= 12:
+        raise argparse.ArgumentTypeError(f"mês inválido: {texto!r}")
+    ano_maximo = datetime.now().year
+    if not ANO_MINIMO <= ano <= ano_maximo:
+        raise argparse.ArgumentTypeError(f"ano deve estar entre {ANO_MINIMO} e {ano_maximo}: {texto!r}")
+    return mes, ano
+
+
+def _inteiro_positivo(texto):
+    """Converte o texto em um inteiro maior que zero"""
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"inteiro inválido: {texto!r}")
+    if valor < 1:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {texto!r}")
+    return valor
+
+
+def comando_calcular(args):
+    """Calcula o banco de horas de um usuário, retomando jobs interrompidos"""
+    import os
+
+    try:
+        from .banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+        from .checkpoint import CheckpointIncompativel, CheckpointJob, descricao_job, id_job
+        from .limitador import CircuitoAberto
+        from .utils import normalize_intranet_url, format_time
+        from . import perfil
+    except ImportError:
+        from banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+        from checkpoint import CheckpointIncompativel, CheckpointJob, descricao_job, id_job
+        from limitador import CircuitoAberto
+        from utils import normalize_intranet_url, format_time
+        import perfil
+
+    url, erro = normalize_intranet_url(args.url)
+    if erro:
+        print(f"❌ {erro}", file=sys.stderr)
+        return 1
+
+    (mes_inicio, ano_inicio), (mes_fim, ano_fim) = args.inicio, args.fim
+    calc = BancoHorasAdvanced(url)
+    try:
+        logado = calc.fazer_login(args.usuario, os.environ.get(args.senha_env, ''))
+    except CircuitoAberto as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    if not logado:
+        print("❌ Erro no login. Verifique as credenciais e a URL da intranet.", file=sys.stderr)
+        return 1
+
+    job_id = args.job_id or id_job(calc.host, calc.usuario_hash, mes_inicio, ano_inicio, mes_fim, ano_fim)
+    checkpoint = CheckpointJob(
+        job_id, descricao=descricao_job(calc.host, calc.usuario_hash, mes_inicio, ano_inicio, mes_fim, ano_fim)
+    )
+    try:
+        retomados = len(checkpoint.carregar())
+    except CheckpointIncompativel as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"🆔 Job {job_id}" + (f" (retomando: {retomados} meses já processados)" if retomados else ""),
+          file=sys.stderr)
+
+    total_minutos = 0
+    artefatos = []
+    try:
+        with (perfil.capturar(calc, args.perfil, artefatos=artefatos) if args.perfil else contextlib.nullcontext()):
+            for detalhe in calc.iterar_banco_horas(mes_inicio, ano_inicio, mes_fim, ano_fim, checkpoint=checkpoint):
+                total_minutos += detalhe['saldo']
+                print(f"{detalhe['mes_ano']}: {detalhe['saldo_formatado']}")
+    except (MesIndisponivel, SessaoExpirada, CircuitoAberto) as e:
+        print(f"❌ {e}. Execute novamente para retomar o job {job_id}.", file=sys.stderr)
+        return 1
+
+    checkpoint.remover()
+    conexoes = calc.estatisticas_conexoes()
+    if conexoes['requisicoes']:
+        print(f"🔌 {conexoes['conexoes']} conexões para {conexoes['requisicoes']} requisições "
+              f"(reuso de {conexoes['reuso']:.0%})", file=sys.stderr)
+    for caminho in artefatos:
+        print(f"🔬 Perfil gravado em {caminho}", file=sys.stderr)
+    print(f"TOTAL: {format_time(total_minutos)}")
+    return 0
+
+
+def comando_lote(args):
+    """Calcula o banco de horas de vários funcionários e grava o painel da equipe"""
+    try:
+        from . import equipe
+        from .utils import normalize_intranet_url
+    except ImportError:
+        import equipe
+        from utils import normalize_intranet_url
+
+    url, erro = normalize_intranet_url(args.url)
+    if erro:
+        print(f"❌ {erro}", file=sys.stderr)
+        return 1
+
+    funcionarios = equipe.ler_funcionarios_csv(args.funcionarios)
+    (mes_inicio, ano_inicio), (mes_fim, ano_fim) = args.inicio, args.fim
+
+    def progresso(atual, total, matricula):
+        print(f"[{atual}/{total}] {matricula}", file=sys.stderr)
+
+    saldos, falhas = equipe.executar_lote(
+        url, funcionarios, mes_inicio, ano_inicio, mes_fim, ano_fim,
+        progress_callback=progresso
+    )
+    equipe.gravar_resultados_equipe(saldos, args.saida)
+
+    print(f"✅ {len(saldos)} linhas gravadas em {args.saida}")
+    rotulos = {
+        equipe.FALHA_LOGIN: "Falha de login",
+        equipe.FALHA_MES_INDISPONIVEL: "Meses indisponíveis na intranet",
+        equipe.FALHA_INTRANET_INSTAVEL: "Intranet instável (disjuntor aberto)",
+    }
+    for motivo, rotulo in rotulos.items():
+        matriculas = [m for m, motivo_falha in falhas.items() if motivo_falha == motivo]
+        if matriculas:
+            print(f"❌ {rotulo}: {', '.join(matriculas)}", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+def comando_relatorio(args):
+    """Relatório em texto da equipe, regerando só os funcionários com saldos alterados"""
+    try:
+        from .exportacao import gerar_relatorio_diretorio
+    except ImportError:
+        from exportacao import gerar_relatorio_diretorio
+
+    estatisticas = gerar_relatorio_diretorio(args.dados, args.saida, args.fragmentos)
+    print(f"✅ Relatório de {estatisticas['funcionarios']} funcionários: "
+          f"{estatisticas['regerados']} regerados, {estatisticas['reaproveitados']} reaproveitados")
+    return 0
+
+
+def comando_perfil_importacao(args):
+    """Mostra o perfil de tempo de importação dos módulos informados"""
+    try:
+        from .importacao import perfil_importacao
+    except ImportError:
+        from importacao import perfil_importacao
+
+    for modulo in args.modulos:
+        registros = perfil_importacao(modulo)
+        total_us = max((r[2] for r in registros if r[3] == 0 and r[0] == modulo), default=0)
+
+        print(f"\n📦 {modulo}: {total_us / 1000:.1f} ms")
+        print(f"{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo")
+        for nome, self_us, cumulativo_us, _ in sorted(registros, key=lambda r: -r[2])[:args.top]:
+            print(f"{cumulativo_us / 1000:16.1f} {self_us / 1000:13.1f}  {nome}")
+    return 0
+
+
+def comando_preaquecer(args):
+    """Atualiza o mês anterior dos usuários cadastrados fora do horário de pico"""
+    try:
+        from . import preaquecimento
+        from .armazenamento import armazenamento_padrao
+    except ImportError:
+        import preaquecimento
+        from armazenamento import armazenamento_padrao
+
+    args.cadastro = args.cadastro or preaquecimento.CADASTRO_PADRAO
+    args.hora = preaquecimento.HORA_INICIO_PADRAO if args.hora is None else args.hora
+    args.minutos = preaquecimento.DURACAO_PADRAO if args.minutos is None else args.minutos
+
+    armazenamento = armazenamento_padrao()
+    if armazenamento is None:
+        print("❌ Defina BANCO_HORAS_ARMAZENAMENTO com o caminho do banco local", file=sys.stderr)
+        return 1
+
+    if args.agora:
+        usuarios = preaquecimento.carregar_cadastro(args.cadastro)
+        _, falhas = preaquecimento.executar_janela(usuarios, args.minutos * 60, armazenamento)
+        return 1 if falhas else 0
+
+    preaquecimento.executar_agendador(args.cadastro, args.hora, args.minutos, armazenamento)
+    return 0
+
+
+def comando_carga(args):
+    """Teste de carga com usuários virtuais simultâneos contra a intranet simulada"""
+    try:
+        from .carga import executar_carga, formatar_relatorio
+    except ImportError:
+        from carga import executar_carga, formatar_relatorio
+
+    niveis = [int(n) for n in args.usuarios.split(',') if n.strip()]
+    medicoes = executar_carga(
+        niveis, args.fluxos, args.atraso_ms / 1000, args.url_app, args.url_intranet,
+        args.pid, args.porta, log=lambda texto: print(texto, file=sys.stderr)
+    )
+    print(formatar_relatorio(medicoes))
+    return 1 if any(m['falhas'] for m in medicoes) else 0
+
+
+def comando_distribuido(args):
+    """Coordenador e workers do modo distribuído"""
+    try:
+        from . import distribuido
+    except ImportError:
+        import distribuido
+
+    fila = distribuido.FilaDistribuida(args.fila)
+
+    if args.acao == 'enfileirar':
+        try:
+            from .equipe import ler_funcionarios_csv
+            from .utils import normalize_intranet_url
+        except ImportError:
+            from equipe import ler_funcionarios_csv
+            from utils import normalize_intranet_url
+        url, erro = normalize_intranet_url(args.url)
+        if erro:
+            print(f"❌ {erro}", file=sys.stderr)
+            return 1
+        (mes_inicio, ano_inicio), (mes_fim, ano_fim) = args.inicio, args.fim
+        novas = fila.enfileirar(
+            url, ler_funcionarios_csv(args.funcionarios),
+            mes_inicio, ano_inicio, mes_fim, ano_fim, args.meses_por_unidade
+        )
+        print(f"✅ {novas} unidades novas na fila {args.fila}")
+
+    elif args.acao == 'worker':
+        distribuido.executar_worker(fila, args.id)
+
+    elif args.acao == 'status':
+        for estado, quantidade in sorted(fila.progresso().items()):
+            print(f"{estado:>15}: {quantidade}")
+
+    elif args.acao == 'exportar':
+        try:
+            from .equipe import gravar_resultados_equipe
+        except ImportError:
+            from equipe import gravar_resultados_equipe
+        saldos = fila.resultados()
+        gravar_resultados_equipe(saldos, args.saida)
+        print(f"✅ {len(saldos)} linhas gravadas em {args.saida}")
+
+    return 0
+
+
+def criar_parser():
+    """Monta o parser de argumentos com todos os subcomandos"""
+    parser = argparse.ArgumentParser(
+        prog='banco-horas',
+        description='Calculadora de Banco de Horas - linha de comando'
+    )
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    calcular = subcomandos.add_parser('calcular', help='calcula o banco de horas de um usuário')
+    calcular.add_argument('--url', required=True, help='URL da intranet')
+    calcular.add_argument('--usuario', required=True, help='usuário da intranet')
+    calcular.add_argument('--senha-env', default='BANCO_HORAS_SENHA',
+                          help='variável de ambiente com a senha (padrão: BANCO_HORAS_SENHA)')
+    calcular.add_argument('--inicio', required=True, type=_periodo, help='mês inicial (MM/YYYY)')
+    calcular.add_argument('--fim', required=True, type=_periodo, help='mês final (MM/YYYY)')
+    calcular.add_argument('--job-id', default=None,
+                          help='ID do job a retomar (padrão: derivado de intranet, usuário e período)')
+    calcular.add_argument('--perfil', nargs='?', const='cprofile', choices=('cprofile', 'pyinstrument'),
+                          help='grava um perfil do cálculo e os tempos de parse por mês em temp/perfis')
+    calcular.set_defaults(func=comando_calcular)
+
+    lote = subcomandos.add_parser('lote', help='calcula vários funcionários e grava o painel da equipe')
+    lote.add_argument('--url', required=True, help='URL da intranet')
+    lote.add_argument('--funcionarios', required=True,
+                      help='CSV com matricula, nome, departamento, usuario e senha_env')
+    lote.add_argument('--inicio', required=True, type=_periodo, help='mês inicial (MM/YYYY)')
+    lote.add_argument('--fim', required=True, type=_periodo, help='mês final (MM/YYYY)')
+    lote.add_argument('--saida', default='temp/equipe', help='diretório de saída (Parquet)')
+    lote.set_defaults(func=comando_lote)
+
+    relatorio = subcomandos.add_parser('relatorio', help='relatório em texto da equipe (incremental)')
+    relatorio.add_argument('--dados', default='temp/equipe', help='diretório gerado por lote ou exportar')
+    relatorio.add_argument('--saida', default=None,
+                           help='arquivo do relatório (padrão: <dados>/relatorio_equipe.txt)')
+    relatorio.add_argument('--fragmentos', default=None,
+                           help='cache de fragmentos por funcionário (padrão: <dados>/fragmentos)')
+    relatorio.set_defaults(func=comando_relatorio)
+
+    distribuido = subcomandos.add_parser('distribuido', help='lote distribuído entre vários workers')
+    acoes = distribuido.add_subparsers(dest='acao', required=True)
+
+    enfileirar = acoes.add_parser('enfileirar', help='divide funcionários × meses em unidades de trabalho')
+    enfileirar.add_argument('--url', required=True, help='URL da intranet')
+    enfileirar.add_argument('--funcionarios', required=True, help='CSV de funcionários (mesmo formato do lote)')
+    enfileirar.add_argument('--inicio', required=True, type=_periodo, help='mês inicial (MM/YYYY)')
+    enfileirar.add_argument('--fim', required=True, type=_periodo, help='mês final (MM/YYYY)')
+    enfileirar.add_argument('--meses-por-unidade', type=_inteiro_positivo, default=12, help='meses por unidade de trabalho')
+
+    worker = acoes.add_parser('worker', help='processa unidades até a fila esvaziar')
+    worker.add_argument('--id', default=None, help='identificador do worker (padrão: host:pid)')
+
+    acoes.add_parser('status', help='mostra o andamento da fila')
+
+    exportar = acoes.add_parser('exportar', help='consolida os resultados no formato do painel da equipe')
+    exportar.add_argument('--saida', default='temp/equipe', help='diretório de saída (Parquet)')
+
+    distribuido.add_argument('--fila', default='temp/fila.db', help='arquivo SQLite compartilhado da fila')
+    distribuido.set_defaults(func=comando_distribuido)
+
+    preaquecer = subcomandos.add_parser('preaquecer', help='agenda a atualização do mês anterior fora de pico')
+    preaquecer.add_argument('--cadastro', default=None, help='JSON com os usuários cadastrados')
+    preaquecer.add_argument('--hora', type=int, default=None, help='hora local de início da janela')
+    preaquecer.add_argument('--minutos', type=int, default=None, help='duração da janela em minutos')
+    preaquecer.add_argument('--agora', action='store_true', help='executa uma única janela imediatamente')
+    preaquecer.set_defaults(func=comando_preaquecer)
+
+    perfil = subcomandos.add_parser('perfil-importacao', help='mede o tempo de importação dos módulos')
+    perfil.add_argument('modulos', nargs='*', default=['app.app_streamlit', 'app.cli'],
+                        help='módulos a medir (padrão: app.app_streamlit app.cli)')
+    perfil.add_argument('--top', type=int, default=15, help='quantidade de módulos exibidos')
+    perfil.set_defaults(func=comando_perfil_importacao)
+
+    carga = subcomandos.add_parser('carga', help='teste de carga com usuários simultâneos simulados')
+    carga.add_argument('--usuarios', default='1,5,10,20',
+                       help='níveis de concorrência separados por vírgula (padrão: 1,5,10,20)')
+    carga.add_argument('--fluxos', type=int, default=1, help='fluxos completos por usuário em cada nível')
+    carga.add_argument('--atraso-ms', type=float, default=50, help='latência de cada página da intranet simulada')
+    carga.add_argument('--url-app', default=None,
+                       help='app já em execução (padrão: sobe streamlit run e mede CPU/memória dele)')
+    carga.add_argument('--pid', type=int, default=None, help='PID do servidor indicado em --url-app')
+    carga.add_argument('--url-intranet', default=None, help='intranet de teste (padrão: intranet simulada local)')
+    carga.add_argument('--porta', type=int, default=8599, help='porta do servidor Streamlit iniciado')
+    carga.set_defaults(func=comando_carga)
+
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
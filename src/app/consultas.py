@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Consultas de séries temporais sobre saldos de banco de horas
+Índice de somas de prefixo para intervalos, acumulado no ano,
+janelas móveis e agregados trimestrais sem refazer o scraping
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+def chave_mes(mes_ano):
+    """Converte 'MM/YYYY' em uma chave inteira ordenável (ano * 12 + mês - 1)"""
+    mes, ano = mes_ano.split('/')
+    return int(ano) * 12 + int(mes) - 1
+
+
+def mes_ano_da_chave(chave):
+    """Converte a chave inteira de volta para 'MM/YYYY'"""
+    ano, mes = divmod(chave, 12)
+    return f"{mes + 1:02d}/{ano}"
+
+
+class IndicePrefixo:
+    """Somas de prefixo sobre chaves inteiras ordenadas"""
+
+    def __init__(self, pares=()):
+        # Combinar chaves repetidas antes de montar o prefixo
+        valores_por_chave = {}
+        for chave, valor in pares:
+            valores_por_chave[chave] = valores_por_chave.get(chave, 0) + valor
+
+        self.chaves = sorted(valores_por_chave)
+        self.valores = [valores_por_chave[c] for c in self.chaves]
+
+        # prefixo[i] = soma dos i primeiros valores
+        self.prefixo = [0]
+        for valor in self.valores:
+            self.prefixo.append(self.prefixo[-1] + valor)
+
+    def __len__(self):
+        return len(self.chaves)
+
+    def soma_intervalo(self, inicio, fim):
+        """Soma dos valores com chave em [inicio, fim] em O(log n)"""
+        if fim < inicio:
+            return 0
+        i = bisect_left(self.chaves, inicio)
+        j = bisect_right(self.chaves, fim)
+        return self.prefixo[j] - self.prefixo[i]
+
+    def acumulado_ate(self, chave):
+        """Soma de todos os valores com chave <= chave"""
+        return self.prefixo[bisect_right(self.chaves, chave)]
+
+    def total(self):
+        """Soma de todos os valores"""
+        return self.prefixo[-1]
+
+    def acumulados(self):
+        """Saldo acumulado após cada chave, na ordem das chaves"""
+        return self.prefixo[1:]
+
+
+class SerieSaldos:
+    """Consultas sobre saldos mensais"""
+
+    def __init__(self, saldos_mensais=()):
+        """saldos_mensais: pares ('MM/YYYY', minutos)"""
+        self.mensal = IndicePrefixo((chave_mes(m), s) for m, s in saldos_mensais)
+
+    @classmethod
+    def de_detalhes(cls, detalhes):
+        """Cria a série a partir da lista 'detalhes' de calcular_banco_horas"""
+        return cls((d['mes_ano'], d['saldo']) for d in detalhes)
+
+    def meses(self):
+        """Meses da série em ordem cronológica"""
+        return [mes_ano_da_chave(c) for c in self.mensal.chaves]
+
+    def saldos(self):
+        """Saldos mensais em ordem cronológica"""
+        return list(self.mensal.valores)
+
+    def acumulados(self):
+        """Saldo acumulado mês a mês em ordem cronológica"""
+        return self.mensal.acumulados()
+
+    def total(self):
+        """Saldo total da série"""
+        return self.mensal.total()
+
+    def ultimo_mes(self):
+        """Último mês da série no formato 'MM/YYYY' (ou None se vazia)"""
+        if not self.mensal.chaves:
+            return None
+        return mes_ano_da_chave(self.mensal.chaves[-1])
+
+    def soma_periodo(self, mes_inicio, ano_inicio, mes_fim, ano_fim):
+        """Saldo de um intervalo arbitrário de meses (inclusivo)"""
+        inicio = ano_inicio * 12 + mes_inicio - 1
+        fim = ano_fim * 12 + mes_fim - 1
+        return self.mensal.soma_intervalo(inicio, fim)
+
+    def acumulado_no_ano(self, ano=None, mes=None):
+        """Saldo do ano até o mês informado (YTD); padrão: último mês da série"""
+        if ano is None or mes is None:
+            ultimo = self.ultimo_mes()
+            if ultimo is None:
+                return 0
+            mes_ultimo, ano_ultimo = map(int, ultimo.split('/'))
+            ano = ano if ano is not None else ano_ultimo
+            mes = mes if mes is not None else (mes_ultimo if ano == ano_ultimo else 12)
+        return self.soma_periodo(1, ano, mes, ano)
+
+    def janela_movel(self, meses, ate=None):
+        """Saldo dos últimos 'meses' meses terminando em 'ate' ('MM/YYYY')"""
+        ate = ate or self.ultimo_mes()
+        if ate is None or meses <= 0:
+            return 0
+        fim = chave_mes(ate)
+        return self.mensal.soma_intervalo(fim - meses + 1, fim)
+
+    def janelas_moveis(self, meses):
+        """Janela móvel de 'meses' meses para cada mês da série"""
+        return [
+            self.mensal.soma_intervalo(chave - meses + 1, chave)
+            for chave in self.mensal.chaves
+        ]
+
+    def trimestre(self, ano, trimestre):
+        """Saldo de um trimestre (1 a 4)"""
+        mes_inicio = (trimestre - 1) * 3 + 1
+        return self.soma_periodo(mes_inicio, ano, mes_inicio + 2, ano)
+
+    def trimestres(self):
+        """Saldo por trimestre para todos os trimestres cobertos pela série"""
+        if not self.mensal.chaves:
+            return []
+
+        primeiro = self.mensal.chaves[0] // 3
+        ultimo = self.mensal.chaves[-1] // 3
+        resultado = []
+        for indice in range(primeiro, ultimo + 1):
+            ano, trimestre = divmod(indice, 4)
+            resultado.append({
+                'ano': ano,
+                'trimestre': trimestre + 1,
+                'saldo': self.mensal.soma_intervalo(indice * 3, indice * 3 + 2)
+            })
+        return resultado
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Modo distribuído: coordenador e workers para auditorias em lote
+Unidades de trabalho (funcionário × faixa de meses) ficam em uma fila
+SQLite compartilhada; cada mês concluído é gravado como checkpoint
+"""
+
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+try:
+    from . import perfil
+    from .banco_horas import BancoHorasAdvanced
+    from .consultas import chave_mes, mes_ano_da_chave
+    from .limitador import CircuitoAberto
+except ImportError:
+    import perfil
+    from banco_horas import BancoHorasAdvanced
+    from consultas import chave_mes, mes_ano_da_chave
+    from limitador import CircuitoAberto
+
+
+# Tempo (segundos) que um worker mantém uma unidade sem dar sinal de vida
+LEASE_PADRAO = 300
+
+MAX_TENTATIVAS = 3
+
+# Incrementar ao mudar _ESQUEMA: filas antigas não são migradas
+VERSAO_ESQUEMA = 2
+
+PENDENTE = 'pendente'
+EM_EXECUCAO = 'em_execucao'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS unidades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    funcionario TEXT NOT NULL,
+    nome TEXT NOT NULL DEFAULT '',
+    departamento TEXT NOT NULL DEFAULT '',
+    usuario TEXT NOT NULL,
+    senha_env TEXT NOT NULL,
+    chave_inicio INTEGER NOT NULL,
+    chave_fim INTEGER NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    worker TEXT,
+    lease_ate REAL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    erro TEXT,
+    UNIQUE (url, funcionario, chave_inicio, chave_fim)
+);
+CREATE INDEX IF NOT EXISTS idx_unidades_estado ON unidades (estado, lease_ate);
+CREATE TABLE IF NOT EXISTS resultados (
+    url TEXT NOT NULL,
+    funcionario TEXT NOT NULL,
+    mes_chave INTEGER NOT NULL,
+    mes_ano TEXT NOT NULL,
+    saldo INTEGER NOT NULL,
+    unidade_id INTEGER NOT NULL,
+    PRIMARY KEY (url, funcionario, mes_chave)
+);
+"""
+
+
+class FilaDistribuida:
+    """Fila de unidades de trabalho e resultados em um arquivo SQLite compartilhado
+
+    Unidades e resultados são identificados pela intranet além da matrícula:
+    a mesma matrícula em duas intranets são funcionários diferentes.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=60)
+        try:
+            versao = conexao.execute('PRAGMA user_version').fetchone()[0]
+            existente = conexao.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'unidades'"
+            ).fetchone()
+            if existente and versao != VERSAO_ESQUEMA:
+                raise RuntimeError(f"Fila {caminho} criada por uma versão anterior; use um novo arquivo")
+            conexao.executescript(_ESQUEMA)
+            conexao.execute(f'PRAGMA user_version = {VERSAO_ESQUEMA}')
+        finally:
+            conexao.close()
+
+    @contextmanager
+    def _conexao(self, imediata=False):
+        conexao = sqlite3.connect(self.caminho, timeout=60, isolation_level=None)
+        try:
+            # BEGIN IMMEDIATE serializa quem reserva unidades entre processos
+            conexao.execute('BEGIN IMMEDIATE' if imediata else 'BEGIN')
+            try:
+                yield conexao
+                conexao.execute('COMMIT')
+            except BaseException:
+                conexao.execute('ROLLBACK')
+                raise
+        finally:
+            conexao.close()
+
+    # === Coordenador ===
+
+    def enfileirar(self, url, funcionarios, mes_inicio, ano_inicio, mes_fim, ano_fim, meses_por_unidade=12):
+        """Divide o período de cada funcionário em unidades; repetir não duplica trabalho"""
+        inicio = ano_inicio * 12 + mes_inicio - 1
+        fim = ano_fim * 12 + mes_fim - 1
+        linhas = []
+        for funcionario in funcionarios:
+            for chave_inicio in range(inicio, fim + 1, meses_por_unidade):
+                linhas.append((
+                    url, funcionario['matricula'], funcionario.get('nome', ''),
+                    funcionario.get('departamento', ''), funcionario['usuario'],
+                    funcionario['senha_env'], chave_inicio,
+                    min(fim, chave_inicio + meses_por_unidade - 1)
+                ))
+
+        with self._conexao(imediata=True) as conexao:
+            antes = conexao.total_changes
+            conexao.executemany(
+                "INSERT OR IGNORE INTO unidades (url, funcionario, nome, departamento, usuario, "
+                "senha_env, chave_inicio, chave_fim) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas
+            )
+            return conexao.total_changes - antes
+
+    def progresso(self):
+        """Quantidade de unidades por estado"""
+        with self._conexao() as conexao:
+            contagens = dict(conexao.execute(
+                "SELECT estado, COUNT(*) FROM unidades GROUP BY estado"
+            ).fetchall())
+            contagens['meses_gravados'] = conexao.execute(
+                "SELECT COUNT(*) FROM resultados"
+            ).fetchone()[0]
+        return contagens
+
+    def resultados(self):
+        """Resultados consolidados no formato de equipe.gravar_resultados_equipe"""
+        import pandas as pd
+
+        with self._conexao() as conexao:
+            linhas = conexao.execute(
+                "SELECT r.funcionario, u.nome, u.departamento, r.mes_ano, r.saldo "
+                "FROM resultados r JOIN unidades u ON u.id = r.unidade_id "
+                "ORDER BY r.url, r.funcionario, r.mes_chave"
+            ).fetchall()
+        return pd.DataFrame(linhas, columns=['funcionario', 'nome', 'departamento', 'mes_ano', 'saldo'])
+
+    # === Worker ===
+
+    def reservar(self, worker, lease=LEASE_PADRAO):
+        """Reserva a próxima unidade pendente (ou abandonada por um worker)"""
+        agora = time.time()
+        with self._conexao(imediata=True) as conexao:
+            # Leases vencidos sem tentativas restantes não voltam mais à fila
+            conexao.execute(
+                "UPDATE unidades SET estado = ?, erro = 'lease expirado' "
+                "WHERE estado = ? AND lease_ate < ? AND tentativas >= ?",
+                (FALHOU, EM_EXECUCAO, agora, MAX_TENTATIVAS)
+            )
+            linha = conexao.execute(
+                "SELECT id, url, funcionario, usuario, senha_env, chave_inicio, chave_fim "
+                "FROM unidades WHERE (estado = ? OR (estado = ? AND lease_ate < ?)) "
+                "AND tentativas < ? ORDER BY id LIMIT 1",
+                (PENDENTE, EM_EXECUCAO, agora, MAX_TENTATIVAS)
+            ).fetchone()
+            if linha is None:
+                return None
+            conexao.execute(
+                "UPDATE unidades SET estado = ?, worker = ?, lease_ate = ?, "
+                "tentativas = tentativas + 1 WHERE id = ?",
+                (EM_EXECUCAO, worker, agora + lease, linha[0])
+            )
+        campos = ('id', 'url', 'funcionario', 'usuario', 'senha_env', 'chave_inicio', 'chave_fim')
+        return dict(zip(campos, linha))
+
+    def meses_concluidos(self, unidade):
+        """Meses da faixa da unidade que já têm resultado gravado"""
+        with self._conexao() as conexao:
+            linhas = conexao.execute(
+                "SELECT mes_ano FROM resultados WHERE url = ? AND funcionario = ? AND mes_chave BETWEEN ? AND ?",
+                (unidade['url'], unidade['funcionario'], unidade['chave_inicio'], unidade['chave_fim'])
+            ).fetchall()
+        return {linha[0] for linha in linhas}
+
+    def gravar_mes(self, unidade, worker, mes_ano, saldo, lease=LEASE_PADRAO):
+        """Checkpoint de um mês obtido da intranet (idempotente) e renovação do lease"""
+        with self._conexao(imediata=True) as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO resultados (url, funcionario, mes_chave, mes_ano, saldo, unidade_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (unidade['url'], unidade['funcionario'], chave_mes(mes_ano), mes_ano, saldo, unidade['id'])
+            )
+            conexao.execute(
+                "UPDATE unidades SET lease_ate = ? WHERE id = ? AND worker = ?",
+                (time.time() + lease, unidade['id'], worker)
+            )
+
+    def concluir(self, unidade):
+        with self._conexao(imediata=True) as conexao:
+            conexao.execute(
+                "UPDATE unidades SET estado = ?, lease_ate = NULL, erro = NULL WHERE id = ?",
+                (CONCLUIDA, unidade['id'])
+            )
+
+    def devolver(self, unidade, worker):
+        """Devolve a unidade à fila sem gastar a tentativa (intranet indisponível)"""
+        with self._conexao(imediata=True) as conexao:
+            conexao.execute(
+                "UPDATE unidades SET estado = ?, worker = NULL, lease_ate = NULL, "
+                "tentativas = MAX(tentativas - 1, 0) WHERE id = ? AND worker = ?",
+                (PENDENTE, unidade['id'], worker)
+            )
+
+    def falhar(self, unidade, erro):
+        """Devolve a unidade à fila ou marca como falha após MAX_TENTATIVAS"""
+        with self._conexao(imediata=True) as conexao:
+            conexao.execute(
+                "UPDATE unidades SET estado = CASE WHEN tentativas >= ? THEN ? ELSE ? END, "
+                "lease_ate = NULL, erro = ? WHERE id = ?",
+                (MAX_TENTATIVAS, FALHOU, PENDENTE, str(erro), unidade['id'])
+            )
+
+
+def processar_unidade(fila, unidade, worker):
+    """Calcula os meses ainda sem resultado de uma unidade
+
+    Um mês indisponível (MesIndisponivel) interrompe a unidade sem gravar
+    nada para ele; os meses anteriores ficam gravados para a nova tentativa.
+    """
+    meses = [mes_ano_da_chave(c) for c in range(unidade['chave_inicio'], unidade['chave_fim'] + 1)]
+    concluidos = fila.meses_concluidos(unidade)
+    faltando = [m for m in meses if m not in concluidos]
+    if not faltando:
+        return 0
+
+    calc = BancoHorasAdvanced(unidade['url'])
+    if not calc.fazer_login(unidade['usuario'], os.environ.get(unidade['senha_env'], '')):
+        raise RuntimeError("erro no login")
+
+    armazenados = calc.carregar_armazenados(faltando)
+    # A fila recebe cada mês na hora; o armazenamento local, um upsert no fim
+    with perfil.capturar_do_ambiente(calc), calc.gravacao_em_lote():
+        for mes_ano in faltando:
+            saldo = calc.obter_saldo_mes(mes_ano, armazenados)
+            fila.gravar_mes(unidade, worker, mes_ano, saldo)
+    return len(faltando)
+
+
+def executar_worker(fila, worker=None, espera_ociosa=10, log=print):
+    """Processa unidades até a fila esvaziar"""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        unidade = fila.reservar(worker)
+        if unidade is None:
+            estados = fila.progresso()
+            if not estados.get(PENDENTE) and not estados.get(EM_EXECUCAO):
+                log(f"✅ {worker}: fila concluída")
+                return
+            # Outras unidades em execução podem voltar à fila se o lease expirar
+            time.sleep(espera_ociosa)
+            continue
+
+        try:
+            novos = processar_unidade(fila, unidade, worker)
+        except CircuitoAberto as e:
+            # A unidade não tem culpa: sem esperar o disjuntor, a fila inteira
+            # seria marcada como falha em segundos
+            fila.devolver(unidade, worker)
+            log(f"⏸️ {worker}: {e}")
+            time.sleep(e.segundos_restantes)
+        except Exception as e:
+            fila.falhar(unidade, e)
+            log(f"❌ {worker}: unidade {unidade['id']} ({unidade['funcionario']}): {e}")
+        else:
+            fila.concluir(unidade)
+            log(f"📊 {worker}: unidade {unidade['id']} ({unidade['funcionario']}): {novos} meses")
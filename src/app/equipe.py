@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Execução em lote para vários funcionários e painel agregado da equipe
+Resultados ficam em arquivos colunares (Parquet) com agregados
+pré-calculados no momento da gravação
+"""
+
+import csv
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+    from .limitador import CircuitoAberto
+except ImportError:
+    from banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+    from limitador import CircuitoAberto
+
+
+ARQUIVO_SALDOS = 'saldos.parquet'
+ARQUIVO_DEPARTAMENTOS = 'departamentos.parquet'
+ARQUIVO_FUNCIONARIOS = 'funcionarios.parquet'
+ARQUIVO_DISTRIBUICAO = 'distribuicao.parquet'
+
+# Variável de ambiente padrão com a senha quando o CSV não indica outra
+SENHA_ENV_PADRAO = 'BANCO_HORAS_SENHA'
+
+MAX_FAIXAS_DISTRIBUICAO = 50
+
+# Motivos de falha de um funcionário no lote
+FALHA_LOGIN = 'login'
+FALHA_MES_INDISPONIVEL = 'mes_indisponivel'
+FALHA_INTRANET_INSTAVEL = 'intranet_instavel'
+
+# Vezes que o lote aguarda o disjuntor da intranet antes de desistir do restante
+ESPERAS_CIRCUITO = 3
+
+
+def ler_funcionarios_csv(caminho):
+    """Lê o CSV de funcionários (matricula, nome, departamento, usuario, senha_env)
+
+    As senhas nunca ficam no arquivo: a coluna opcional 'senha_env' indica
+    a variável de ambiente que contém a senha de cada usuário.
+    """
+    funcionarios = []
+    with open(caminho, 'r', encoding='utf-8', newline='') as f:
+        for linha in csv.DictReader(f):
+            senha_env = (linha.get('senha_env') or SENHA_ENV_PADRAO).strip()
+            funcionarios.append({
+                'matricula': linha['matricula'].strip(),
+                'nome': (linha.get('nome') or '').strip(),
+                'departamento': (linha.get('departamento') or 'Sem departamento').strip(),
+                'usuario': linha['usuario'].strip(),
+                'senha_env': senha_env,
+                'senha': os.environ.get(senha_env, '')
+            })
+    return funcionarios
+
+
+def executar_lote(url_intranet, funcionarios, mes_inicio, ano_inicio, mes_fim, ano_fim,
+                  progress_callback=None):
+    """Calcula o banco de horas de cada funcionário sem interface
+
+    Retorna (DataFrame com uma linha por funcionário e mês, {matrícula: motivo}
+    das falhas); funcionários com algum mês indisponível entram nas falhas
+    (FALHA_MES_INDISPONIVEL), sem linhas.
+
+    Com o disjuntor da intranet aberto, o lote aguarda e tenta o mesmo
+    funcionário de novo; após ESPERAS_CIRCUITO esperas seguidas, ele e os restantes
+    entram nas falhas (FALHA_INTRANET_INSTAVEL) e as linhas já calculadas
+    são retornadas normalmente.
+    """
+    colunas = {'funcionario': [], 'nome': [], 'departamento': [], 'mes_ano': [], 'saldo': []}
+    falhas = {}
+    total = len(funcionarios)
+    esperas = 0
+
+    for i, funcionario in enumerate(funcionarios):
+        detalhes = None
+        while esperas <= ESPERAS_CIRCUITO:
+            try:
+                calc = BancoHorasAdvanced(url_intranet)
+                if not calc.fazer_login(funcionario['usuario'], funcionario['senha']):
+                    falhas[funcionario['matricula']] = FALHA_LOGIN
+                else:
+                    _, detalhes = calc.calcular_banco_horas(mes_inicio, ano_inicio, mes_fim, ano_fim)
+                esperas = 0
+                break
+            except (MesIndisponivel, SessaoExpirada):
+                falhas[funcionario['matricula']] = FALHA_MES_INDISPONIVEL
+                break
+            except CircuitoAberto as e:
+                esperas += 1
+                if esperas <= ESPERAS_CIRCUITO:
+                    time.sleep(e.segundos_restantes)
+        else:
+            falhas[funcionario['matricula']] = FALHA_INTRANET_INSTAVEL
+
+        if detalhes is not None:
+            for d in detalhes:
+                colunas['funcionario'].append(funcionario['matricula'])
+                colunas['nome'].append(funcionario['nome'])
+                colunas['departamento'].append(funcionario['departamento'])
+                colunas['mes_ano'].append(d['mes_ano'])
+                colunas['saldo'].append(d['saldo'])
+
+        if progress_callback:
+            progress_callback(i + 1, total, funcionario['matricula'])
+
+    return pd.DataFrame(colunas), falhas
+
+
+def _adicionar_chave_mes(df):
+    """Adiciona a coluna inteira 'mes_chave' (ano * 12 + mês - 1) de forma vetorizada"""
+    if df.empty:
+        # Categoria vazia não tem o acessor .str
+        df['mes_chave'] = pd.Series(index=df.index, dtype='int32')
+        return df
+    mes = df['mes_ano'].str.slice(0, 2).astype('int32')
+    ano = df['mes_ano'].str.slice(3, 7).astype('int32')
+    df['mes_chave'] = ano * 12 + mes - 1
+    return df
+
+
+def calcular_agregados(saldos):
+    """Pré-calcula os agregados do painel com groupby sobre a tabela colunar"""
+    departamentos = (
+        saldos.groupby(['departamento', 'mes_chave', 'mes_ano'], as_index=False, observed=True)
+        .agg(
+            saldo_total=('saldo', 'sum'),
+            saldo_medio=('saldo', 'mean'),
+            funcionarios=('funcionario', 'nunique')
+        )
+        .sort_values(['mes_chave', 'departamento'])
+    )
+
+    funcionarios = (
+        saldos.groupby(['funcionario', 'nome', 'departamento'], as_index=False, observed=True)
+        .agg(saldo_total=('saldo', 'sum'), meses=('mes_chave', 'count'))
+        .sort_values('saldo_total')
+        .reset_index(drop=True)
+    )
+
+    # Distribuição em faixas (horas) para não enviar um ponto por funcionário
+    horas = funcionarios['saldo_total'].to_numpy(dtype='float64') / 60
+    faixas = max(1, min(MAX_FAIXAS_DISTRIBUICAO, len(horas)))
+    contagens, bordas = np.histogram(horas, bins=faixas) if len(horas) else (np.array([], dtype='int64'), np.array([0.0]))
+    distribuicao = pd.DataFrame({
+        'inicio_horas': bordas[:-1],
+        'fim_horas': bordas[1:],
+        'funcionarios': contagens
+    })
+
+    return departamentos, funcionarios, distribuicao
+
+
+def gravar_resultados_equipe(saldos, diretorio):
+    """Grava saldos e agregados em Parquet no diretório informado"""
+    os.makedirs(diretorio, exist_ok=True)
+
+    saldos = saldos.copy()
+    saldos['saldo'] = saldos['saldo'].astype('int32')
+    for coluna in ('funcionario', 'nome', 'departamento', 'mes_ano'):
+        saldos[coluna] = saldos[coluna].astype('category')
+    _adicionar_chave_mes(saldos)
+
+    departamentos, funcionarios, distribuicao = calcular_agregados(saldos)
+
+    saldos.to_parquet(os.path.join(diretorio, ARQUIVO_SALDOS), index=False)
+    departamentos.to_parquet(os.path.join(diretorio, ARQUIVO_DEPARTAMENTOS), index=False)
+    funcionarios.to_parquet(os.path.join(diretorio, ARQUIVO_FUNCIONARIOS), index=False)
+    distribuicao.to_parquet(os.path.join(diretorio, ARQUIVO_DISTRIBUICAO), index=False)
+
+
+def carregar_painel(diretorio):
+    """Carrega os agregados pré-calculados (sem ler a tabela completa de saldos)"""
+    return {
+        'departamentos': pd.read_parquet(os.path.join(diretorio, ARQUIVO_DEPARTAMENTOS)),
+        'funcionarios': pd.read_parquet(os.path.join(diretorio, ARQUIVO_FUNCIONARIOS)),
+        'distribuicao': pd.read_parquet(os.path.join(diretorio, ARQUIVO_DISTRIBUICAO))
+    }
+
+
+def versao_painel(diretorio):
+    """Data de modificação dos agregados, usada como chave de cache"""
+    caminho = os.path.join(diretorio, ARQUIVO_FUNCIONARIOS)
+    return os.path.getmtime(caminho) if os.path.exists(caminho) else None
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Relatório em texto da equipe com regeneração incremental
+Cada funcionário vira um fragmento identificado pelo hash dos seus saldos;
+só fragmentos novos são gerados e o arquivo final é montado por cópia
+sequencial dos fragmentos, sem manter o relatório inteiro em memória
+"""
+
+import hashlib
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .equipe import ARQUIVO_SALDOS, _adicionar_chave_mes
+    from .utils import format_time
+except ImportError:
+    from equipe import ARQUIVO_SALDOS, _adicionar_chave_mes
+    from utils import format_time
+
+
+# Alterar sempre que o texto dos fragmentos mudar, para invalidar os antigos
+VERSAO_FORMATO = '1'
+
+EXTENSAO_FRAGMENTO = '.txt'
+
+
+def _situacao(minutos):
+    return "CRÉDITO" if minutos > 0 else "DÉBITO" if minutos < 0 else "NEUTRO"
+
+
+def hash_fragmento(matricula, nome, departamento, meses, saldos):
+    """Hash do conteúdo que determina o texto do fragmento de um funcionário"""
+    h = hashlib.sha256()
+    h.update(f"{VERSAO_FORMATO}\0{matricula}\0{nome}\0{departamento}\0".encode('utf-8'))
+    h.update('\0'.join(meses).encode('utf-8'))
+    h.update(np.asarray(saldos, dtype='<i8').tobytes())
+    return h.hexdigest()
+
+
+def renderizar_fragmento(matricula, nome, departamento, meses, saldos):
+    """Texto do relatório de um funcionário (mesmo formato de download_report)"""
+    total = int(sum(saldos))
+    linhas = [
+        f"FUNCIONÁRIO: {matricula} - {nome}" if nome else f"FUNCIONÁRIO: {matricula}",
+        f"Departamento: {departamento}",
+        "-" * 30
+    ]
+    linhas.extend(
+        f"{mes}: {format_time(int(saldo))} ({_situacao(saldo)})" for mes, saldo in zip(meses, saldos)
+    )
+    linhas.append(f"SALDO FINAL: {format_time(total)} ({_situacao(total)})")
+    return '\n'.join(linhas) + '\n\n'
+
+
+def _gravar_fragmento(caminho, texto):
+    # Escrita atômica: um fragmento interrompido nunca é reaproveitado
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
+
+
+def gerar_relatorio_equipe(saldos, destino, diretorio_fragmentos):
+    """Gera o relatório de todos os funcionários regerando só os fragmentos alterados
+
+    'saldos' tem uma linha por funcionário e mês (formato de gravar_resultados_equipe).
+    Retorna {'funcionarios', 'regerados', 'reaproveitados'}.
+    """
+    os.makedirs(diretorio_fragmentos, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+
+    if 'mes_chave' not in saldos.columns:
+        saldos = _adicionar_chave_mes(saldos.copy())
+
+    saldos = saldos.sort_values(['departamento', 'funcionario', 'mes_chave'], kind='stable')
+    funcionarios = saldos['funcionario'].astype(str).to_numpy()
+    nomes = saldos['nome'].astype(str).to_numpy()
+    departamentos = saldos['departamento'].astype(str).to_numpy()
+    meses = saldos['mes_ano'].astype(str).to_numpy()
+    valores = saldos['saldo'].to_numpy(dtype='int64')
+
+    # Fronteiras de cada funcionário nas colunas já ordenadas
+    mudancas = np.flatnonzero(funcionarios[1:] != funcionarios[:-1]) + 1
+    inicios = np.r_[0, mudancas] if len(funcionarios) else mudancas
+    fins = np.r_[mudancas, len(funcionarios)] if len(funcionarios) else mudancas
+
+    existentes = {
+        entrada.name for entrada in os.scandir(diretorio_fragmentos)
+        if entrada.name.endswith(EXTENSAO_FRAGMENTO)
+    }
+    usados = []
+    totais = []
+    regerados = 0
+
+    for inicio, fim in zip(inicios, fins):
+        args = (
+            funcionarios[inicio], nomes[inicio], departamentos[inicio],
+            meses[inicio:fim], valores[inicio:fim]
+        )
+        nome_arquivo = hash_fragmento(*args) + EXTENSAO_FRAGMENTO
+        if nome_arquivo not in existentes:
+            _gravar_fragmento(os.path.join(diretorio_fragmentos, nome_arquivo), renderizar_fragmento(*args))
+            existentes.add(nome_arquivo)
+            regerados += 1
+        usados.append(nome_arquivo)
+        totais.append(int(valores[inicio:fim].sum()))
+
+    # Montagem por cópia sequencial dos fragmentos para um arquivo temporário
+    temporario = destino + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as saida:
+        saida.write("RELATÓRIO DE BANCO DE HORAS - EQUIPE\n")
+        saida.write("=" * 50 + "\n\n")
+        saida.write(f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
+        saida.write(f"Funcionários: {len(usados)}\n\n")
+        for nome_arquivo in usados:
+            with open(os.path.join(diretorio_fragmentos, nome_arquivo), 'r', encoding='utf-8') as fragmento:
+                shutil.copyfileobj(fragmento, saida)
+
+        saida.write("RESUMO DA EQUIPE:\n")
+        saida.write("-" * 20 + "\n")
+        saida.write(f"Com crédito: {sum(1 for t in totais if t > 0)}\n")
+        saida.write(f"Com débito: {sum(1 for t in totais if t < 0)}\n")
+        saida.write(f"Saldo total: {format_time(sum(totais))}\n")
+    os.replace(temporario, destino)
+
+    # Fragmentos que nenhum funcionário usa mais (saldos antigos)
+    for nome_arquivo in existentes.difference(usados):
+        os.remove(os.path.join(diretorio_fragmentos, nome_arquivo))
+
+    return {'funcionarios': len(usados), 'regerados': regerados, 'reaproveitados': len(usados) - regerados}
+
+
+def gerar_relatorio_diretorio(diretorio, destino=None, diretorio_fragmentos=None):
+    """Relatório a partir dos resultados em lote gravados em 'diretorio'"""
+    saldos = pd.read_parquet(
+        os.path.join(diretorio, ARQUIVO_SALDOS),
+        columns=['funcionario', 'nome', 'departamento', 'mes_ano', 'saldo', 'mes_chave']
+    )
+    return gerar_relatorio_equipe(
+        saldos,
+        destino or os.path.join(diretorio, 'relatorio_equipe.txt'),
+        diretorio_fragmentos or os.path.join(diretorio, 'fragmentos')
+    )
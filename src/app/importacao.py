@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Importação tardia de módulos pesados e perfil do tempo de importação
+Reduz o custo de inicialização do app Streamlit e da linha de comando
+"""
+
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+
+
+# Primeira carga serializada entre threads (cada sessão do Streamlit roda em
+# uma thread); reentrante porque importar um módulo pode acionar outro proxy
+_LOCK_CARGA = threading.RLock()
+
+
+class ModuloTardio:
+    """Proxy que só importa o módulo no primeiro acesso a um atributo"""
+
+    def __init__(self, nome, pacote=None, dependencias=()):
+        # Nomes relativos ('.banco_horas') funcionam também quando o
+        # arquivo é executado diretamente, sem pacote
+        if nome.startswith('.') and not pacote:
+            nome = nome.lstrip('.')
+            pacote = None
+        self._nome = nome
+        self._pacote = pacote
+        self._dependencias = tuple(dependencias)
+        self._modulo = None
+
+    def _carregar(self):
+        if self._modulo is None:
+            with _LOCK_CARGA:
+                if self._modulo is None:
+                    for dependencia in self._dependencias:
+                        importlib.import_module(dependencia)
+                    self._modulo = importlib.import_module(self._nome, self._pacote)
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+    def __repr__(self):
+        estado = 'carregado' if self._modulo is not None else 'não carregado'
+        return f"<ModuloTardio {self._nome!r} ({estado})>"
+
+
+def importacao_tardia(nome, pacote=None, dependencias=()):
+    """Retorna um proxy que importa 'nome' apenas quando for usado
+
+    'dependencias' são importadas por completo antes, para módulos que
+    consultam sys.modules em vez de importar (o plotly faz isso com
+    numpy e pandas e, entre threads, pode ver um módulo pela metade).
+    """
+    return ModuloTardio(nome, pacote, dependencias)
+
+
+# Linha do -X importtime: "import time:   self |  cumulative | módulo"
+_LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$')
+
+
+def perfil_importacao(modulo, caminho_src=None):
+    """Mede o tempo de importação de um módulo em um processo novo
+
+    Retorna a lista de (módulo, self_us, cumulativo_us, nível), na ordem
+    em que o Python reportou as importações.
+    """
+    caminho_src = caminho_src or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ambiente = dict(os.environ)
+    ambiente['PYTHONPATH'] = os.pathsep.join(filter(None, [caminho_src, ambiente.get('PYTHONPATH')]))
+
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True, text=True, env=ambiente
+    )
+
+    registros = []
+    for linha in processo.stderr.splitlines():
+        encontrado = _LINHA_IMPORTTIME.match(linha)
+        if encontrado:
+            self_us, cumulativo_us, recuo, nome = encontrado.groups()
+            registros.append((nome.strip(), int(self_us), int(cumulativo_us), max(0, (len(recuo) - 1) // 2)))
+
+    if processo.returncode != 0 and not registros:
+        raise RuntimeError(processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else
+                           f"falha ao importar {modulo}")
+
+    return registros
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Limitador de requisições por intranet e disjuntor (circuit breaker)
+Compartilhados por todos os usuários e workers do processo, com opção
+de estado em arquivo para vários processos no mesmo container
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# Taxas em requisições por segundo, por host
+TAXA_INICIAL = float(os.environ.get('BANCO_HORAS_TAXA_INICIAL', '5'))
+TAXA_MINIMA = float(os.environ.get('BANCO_HORAS_TAXA_MINIMA', '0.5'))
+TAXA_MAXIMA = float(os.environ.get('BANCO_HORAS_TAXA_MAXIMA', '20'))
+
+# Diretório para compartilhar o balde entre processos (vazio = só no processo)
+DIRETORIO_ESTADO = os.environ.get('BANCO_HORAS_LIMITADOR_DIR', '')
+
+
+class CircuitoAberto(Exception):
+    """Intranet com taxa de erros alta: requisições recusadas sem tentar"""
+
+    def __init__(self, host, segundos_restantes):
+        self.host = host
+        self.segundos_restantes = segundos_restantes
+        super().__init__(
+            f"Intranet {host} instável: novas tentativas em {segundos_restantes:.0f}s"
+        )
+
+
+class BaldeTokens:
+    """Balde de tokens com taxa adaptativa (aumento aditivo, redução multiplicativa)
+
+    Cada sucesso aumenta a taxa em 'incremento' até 'taxa_maxima'; cada falha
+    a reduz pela metade até 'taxa_minima'. Assim a taxa converge para o
+    máximo que a intranet sustenta em vez de alternar entre sobrecarga e espera.
+    """
+
+    def __init__(self, taxa=TAXA_INICIAL, taxa_minima=TAXA_MINIMA, taxa_maxima=TAXA_MAXIMA,
+                 capacidade=None, incremento=0.1, fator_reducao=0.5):
+        self.taxa_minima = taxa_minima
+        self.taxa_maxima = taxa_maxima
+        self.capacidade = capacidade if capacidade is not None else max(1.0, taxa)
+        self.incremento = incremento
+        self.fator_reducao = fator_reducao
+        self._taxa_inicial = taxa
+        self._lock = threading.Lock()
+        self._estado = self._estado_inicial()
+
+    def _estado_inicial(self):
+        return {'tokens': self.capacidade, 'instante': time.time(), 'taxa': self._taxa_inicial}
+
+    @contextmanager
+    def _transacao(self):
+        """Acesso exclusivo ao estado do balde"""
+        with self._lock:
+            yield self._estado
+
+    def _reabastecer(self, estado, agora):
+        decorrido = max(0.0, agora - estado['instante'])
+        estado['tokens'] = min(self.capacidade, estado['tokens'] + decorrido * estado['taxa'])
+        estado['instante'] = agora
+
+    def tentar_adquirir(self):
+        """Consome um token; retorna 0 ou os segundos até haver um token"""
+        with self._transacao() as estado:
+            self._reabastecer(estado, time.time())
+            if estado['tokens'] >= 1:
+                estado['tokens'] -= 1
+                return 0.0
+            return (1 - estado['tokens']) / estado['taxa']
+
+    def adquirir(self):
+        """Bloqueia até conseguir um token"""
+        while True:
+            espera = self.tentar_adquirir()
+            if espera <= 0:
+                return
+            time.sleep(espera)
+
+    def registrar_sucesso(self):
+        with self._transacao() as estado:
+            estado['taxa'] = min(self.taxa_maxima, estado['taxa'] + self.incremento)
+
+    def registrar_falha(self):
+        with self._transacao() as estado:
+            estado['taxa'] = max(self.taxa_minima, estado['taxa'] * self.fator_reducao)
+            # Descartar rajada acumulada para aliviar a intranet imediatamente
+            estado['tokens'] = min(estado['tokens'], 1.0)
+
+    @property
+    def taxa(self):
+        with self._transacao() as estado:
+            return estado['taxa']
+
+
+class BaldeTokensArquivo(BaldeTokens):
+    """Balde de tokens com estado em arquivo protegido por flock (vários processos)"""
+
+    def __init__(self, caminho, **kwargs):
+        self.caminho = caminho
+        super().__init__(**kwargs)
+
+    @contextmanager
+    def _transacao(self):
+        import fcntl
+
+        with self._lock, open(self.caminho, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                conteudo = f.read()
+                estado = json.loads(conteudo) if conteudo else self._estado_inicial()
+                yield estado
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(estado))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Disjuntor:
+    """Circuit breaker por taxa de erros em uma janela de requisições recentes"""
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    SEMI_ABERTO = 'semi_aberto'
+
+    def __init__(self, host, limiar_erros=0.5, janela=20, minimo_amostras=5, tempo_aberto=30.0):
+        self.host = host
+        self.limiar_erros = limiar_erros
+        self.minimo_amostras = minimo_amostras
+        self.tempo_aberto = tempo_aberto
+        self._resultados = deque(maxlen=janela)
+        self._estado = self.FECHADO
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        return self._estado
+
+    def permitir(self):
+        """Levanta CircuitoAberto se a intranet deve ser poupada agora"""
+        with self._lock:
+            if self._estado == self.FECHADO:
+                return
+
+            restante = self.tempo_aberto - (time.monotonic() - self._aberto_em)
+            if self._estado == self.ABERTO and restante > 0:
+                raise CircuitoAberto(self.host, restante)
+
+            # Tempo de espera encerrado: deixar passar uma única requisição de teste
+            if self._teste_em_andamento:
+                raise CircuitoAberto(self.host, max(restante, 1.0))
+            self._estado = self.SEMI_ABERTO
+            self._teste_em_andamento = True
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._resultados.append(True)
+            if self._estado == self.SEMI_ABERTO:
+                self._estado = self.FECHADO
+                self._teste_em_andamento = False
+                self._resultados.clear()
+
+    def registrar_falha(self):
+        with self._lock:
+            self._resultados.append(False)
+            if self._estado == self.SEMI_ABERTO:
+                self._abrir()
+                return
+
+            falhas = self._resultados.count(False)
+            if (len(self._resultados) >= self.minimo_amostras
+                    and falhas / len(self._resultados) >= self.limiar_erros):
+                self._abrir()
+
+    def _abrir(self):
+        self._estado = self.ABERTO
+        self._aberto_em = time.monotonic()
+        self._teste_em_andamento = False
+
+
+class LimitadorHost:
+    """Balde de tokens e disjuntor de uma intranet"""
+
+    def __init__(self, host, balde, disjuntor):
+        self.host = host
+        self.balde = balde
+        self.disjuntor = disjuntor
+
+    def antes_da_requisicao(self):
+        """Falha rápido se o circuito estiver aberto; senão aguarda um token"""
+        self.disjuntor.permitir()
+        self.balde.adquirir()
+
+    def registrar_sucesso(self):
+        self.balde.registrar_sucesso()
+        self.disjuntor.registrar_sucesso()
+
+    def registrar_falha(self):
+        self.balde.registrar_falha()
+        self.disjuntor.registrar_falha()
+
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+
+def _criar_balde(host):
+    if not DIRETORIO_ESTADO:
+        return BaldeTokens()
+    os.makedirs(DIRETORIO_ESTADO, exist_ok=True)
+    nome_arquivo = ''.join(c if c.isalnum() or c in '.-' else '_' for c in host)
+    return BaldeTokensArquivo(os.path.join(DIRETORIO_ESTADO, f"{nome_arquivo}.json"))
+
+
+def limitador_para_host(host):
+    """Retorna o limitador compartilhado da intranet (um por host no processo)"""
+    host = host.lower()
+    with _limitadores_lock:
+        limitador = _limitadores.get(host)
+        if limitador is None:
+            limitador = LimitadorHost(host, _criar_balde(host), Disjuntor(host))
+            _limitadores[host] = limitador
+        return limitador
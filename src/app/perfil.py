@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Perfil sob demanda de um cálculo (cProfile ou pyinstrument)
+Cada captura grava o perfil e, ao lado, o tempo de parse e o tamanho da
+página de cada mês, para anexar evidências de intranets lentas a chamados
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from datetime import datetime
+
+
+MOTORES = ('cprofile', 'pyinstrument')
+
+
+def _motor_do_ambiente():
+    motor = os.environ.get('BANCO_HORAS_PERFIL', '').strip().lower()
+    if motor and motor not in MOTORES:
+        warnings.warn(
+            f"BANCO_HORAS_PERFIL={motor!r} ignorado: use cprofile ou pyinstrument; perfil desligado",
+            RuntimeWarning
+        )
+        return ''
+    return motor
+
+
+# Motor ativado por ambiente: 'cprofile', 'pyinstrument' ou vazio (desligado)
+MOTOR_PADRAO = _motor_do_ambiente()
+
+DIRETORIO_PADRAO = os.environ.get(
+    'BANCO_HORAS_PERFIS',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'temp', 'perfis')
+)
+
+# Uma captura por ambiente de cada vez: perfiladores simultâneos em threads
+# diferentes (API, workers) se misturam ou são recusados pelo interpretador
+_LOCK_AMBIENTE = threading.Lock()
+
+
+class _PerfiladorCProfile:
+    """Perfil determinístico da biblioteca padrão, gravado em formato pstats"""
+
+    extensao = '.pstats'
+
+    def __init__(self):
+        import cProfile
+        self._perfil = cProfile.Profile()
+
+    def iniciar(self):
+        self._perfil.enable()
+
+    def parar(self):
+        self._perfil.disable()
+
+    def gravar(self, caminho):
+        self._perfil.dump_stats(caminho)
+
+
+class _PerfiladorPyinstrument:
+    """Perfil por amostragem (pyinstrument), gravado no formato do speedscope"""
+
+    extensao = '.speedscope.json'
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError("O perfil por amostragem requer o pacote 'pyinstrument' (pip install pyinstrument)")
+        self._perfil = Profiler()
+
+    def iniciar(self):
+        self._perfil.start()
+
+    def parar(self):
+        self._perfil.stop()
+
+    def gravar(self, caminho):
+        from pyinstrument.renderers import SpeedscopeRenderer
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(self._perfil.output(SpeedscopeRenderer()))
+
+
+class PerfilCalculo:
+    """Medições por mês de uma captura (preenchidas por BancoHorasAdvanced)"""
+
+    def __init__(self):
+        self.meses = []
+
+    def registrar_mes(self, mes_ano, status, tamanho_bytes, tempo_requisicao, tempo_parse):
+        """Anota uma resposta da intranet; tempo_parse é None quando o parse foi dispensado"""
+        self.meses.append({
+            'mes_ano': mes_ano,
+            'status': status,
+            'tamanho_bytes': tamanho_bytes,
+            'tempo_requisicao_ms': round(tempo_requisicao * 1000, 3),
+            'tempo_parse_ms': None if tempo_parse is None else round(tempo_parse * 1000, 3)
+        })
+
+
+def _criar_perfilador(motor):
+    if motor == 'pyinstrument':
+        return _PerfiladorPyinstrument()
+    if motor == 'cprofile':
+        return _PerfiladorCProfile()
+    raise ValueError(f"Motor de perfil desconhecido: {motor!r} (use cprofile ou pyinstrument)")
+
+
+@contextmanager
+def capturar(calc, motor=None, diretorio=None, artefatos=None):
+    """Perfila o cálculo executado no bloco e grava os artefatos no diretório
+
+    'artefatos', se informado, recebe os caminhos gravados (perfil e meses).
+    """
+    motor = (motor or MOTOR_PADRAO or 'cprofile').lower()
+    diretorio = diretorio or DIRETORIO_PADRAO
+    perfilador = _criar_perfilador(motor)
+    registro = PerfilCalculo()
+
+    anterior, calc.perfil = calc.perfil, registro
+    inicio = time.perf_counter()
+    perfilador.iniciar()
+    try:
+        yield registro
+    finally:
+        perfilador.parar()
+        duracao = time.perf_counter() - inicio
+        calc.perfil = anterior
+
+        os.makedirs(diretorio, exist_ok=True)
+        host = re.sub(r'[^A-Za-z0-9.-]', '_', calc.host)
+        base = os.path.join(diretorio, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{host}_{motor}")
+        perfilador.gravar(base + perfilador.extensao)
+
+        parses = [m['tempo_parse_ms'] for m in registro.meses if m['tempo_parse_ms'] is not None]
+        with open(base + '.meses.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'host': calc.host,
+                'motor': motor,
+                'duracao_s': round(duracao, 3),
+                'paginas': len(registro.meses),
+                'bytes_total': sum(m['tamanho_bytes'] for m in registro.meses),
+                'parse_total_ms': round(sum(parses), 3),
+                'parse_max_ms': max(parses, default=None),
+                'conexoes': calc.estatisticas_conexoes(),
+                'meses': registro.meses
+            }, f, ensure_ascii=False, indent=2)
+
+        if artefatos is not None:
+            artefatos.extend([base + perfilador.extensao, base + '.meses.json'])
+
+
+@contextmanager
+def capturar_do_ambiente(calc):
+    """Perfila o bloco quando BANCO_HORAS_PERFIL está definido
+
+    Não faz nada se o cálculo já está sendo capturado (--perfil, interface)
+    ou se outro cálculo do processo está sendo perfilado pelo ambiente.
+    """
+    if not MOTOR_PADRAO or calc.perfil is not None or not _LOCK_AMBIENTE.acquire(blocking=False):
+        yield None
+        return
+    try:
+        with capturar(calc) as registro:
+            yield registro
+    finally:
+        _LOCK_AMBIENTE.release()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Pré-aquecimento do armazenamento local fora do horário de pico
+Atualiza o saldo do mês anterior dos usuários cadastrados para que as
+consultas do início do mês sejam servidas sem scraping ao vivo
+"""
+
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+try:
+    from .banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+    from .armazenamento import armazenamento_padrao
+    from .utils import normalize_intranet_url
+except ImportError:
+    from banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+    from armazenamento import armazenamento_padrao
+    from utils import normalize_intranet_url
+
+
+# Cadastro dos usuários: lista JSON de {url, usuario, senha_env | cookies_env}
+CADASTRO_PADRAO = os.environ.get('BANCO_HORAS_PREAQUECIMENTO_USUARIOS', 'temp/preaquecimento.json')
+
+# Janela fora de pico (hora local de início e duração em minutos)
+HORA_INICIO_PADRAO = int(os.environ.get('BANCO_HORAS_PREAQUECIMENTO_HORA', '2'))
+DURACAO_PADRAO = int(os.environ.get('BANCO_HORAS_PREAQUECIMENTO_MINUTOS', '180'))
+
+
+def carregar_cadastro(caminho=CADASTRO_PADRAO):
+    """Lê o cadastro de usuários do pré-aquecimento"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def mes_anterior(referencia=None):
+    """Mês anterior à data de referência no formato MM/YYYY"""
+    referencia = referencia or datetime.now()
+    return (referencia.replace(day=1) - timedelta(days=1)).strftime("%m/%Y")
+
+
+def planejar_execucoes(usuarios, inicio, duracao_segundos, rng=None):
+    """Distribui os usuários uniformemente pela janela, com deslocamento aleatório
+
+    Retorna [(instante_unix, usuario)] em ordem cronológica.
+    """
+    rng = rng or random.Random()
+    if not usuarios:
+        return []
+
+    fatia = duracao_segundos / len(usuarios)
+    ordem = list(usuarios)
+    rng.shuffle(ordem)
+    return [
+        (inicio + i * fatia + rng.uniform(0, fatia), usuario)
+        for i, usuario in enumerate(ordem)
+    ]
+
+
+def _autenticar(calc, usuario):
+    """Autentica com cookies de sessão guardados ou com credenciais de serviço"""
+    cookies_env = usuario.get('cookies_env')
+    if cookies_env and os.environ.get(cookies_env):
+        calc.definir_usuario(usuario['usuario'])
+        for par in os.environ[cookies_env].split(';'):
+            nome, _, valor = par.strip().partition('=')
+            if nome:
+                calc.session.cookies.set(nome, valor)
+        # Cookies expirados levariam à página de login em vez do relatório
+        return calc.sessao_valida()
+
+    senha = os.environ.get(usuario.get('senha_env', 'BANCO_HORAS_SENHA'), '')
+    return calc.fazer_login(usuario['usuario'], senha)
+
+
+def preaquecer_usuario(usuario, mes_ano, armazenamento):
+    """Atualiza um mês de um usuário no armazenamento
+
+    Retorna True apenas se a intranet devolveu o saldo e ele foi gravado.
+    A URL é normalizada como no app, para gravar sob o mesmo host que as
+    consultas procuram; URL inválida levanta ValueError.
+    """
+    url, erro = normalize_intranet_url(usuario['url'])
+    if erro:
+        raise ValueError(f"{erro}: {usuario['url']!r}")
+    calc = BancoHorasAdvanced(url, armazenamento=armazenamento)
+    if not _autenticar(calc, usuario):
+        return False
+
+    # Sempre vai à intranet (com requisição condicional) e grava o resultado
+    armazenados = calc.carregar_armazenados([mes_ano])
+    if mes_ano in armazenados:
+        calc.cache_meses[mes_ano] = armazenados[mes_ano]
+    try:
+        calc.atualizar_mes(mes_ano)
+    except (MesIndisponivel, SessaoExpirada):
+        return False
+    return True
+
+
+def executar_janela(usuarios, duracao_segundos, armazenamento, mes_ano=None, log=print):
+    """Executa uma rodada de pré-aquecimento espalhada pela janela informada"""
+    mes_ano = mes_ano or mes_anterior()
+    plano = planejar_execucoes(usuarios, time.time(), duracao_segundos)
+    falhas = 0
+
+    for instante, usuario in plano:
+        espera = instante - time.time()
+        if espera > 0:
+            time.sleep(espera)
+        try:
+            ok = preaquecer_usuario(usuario, mes_ano, armazenamento)
+        except Exception as e:
+            ok = False
+            log(f"❌ {usuario['usuario']}: {e}")
+        if not ok:
+            falhas += 1
+        else:
+            log(f"✅ {usuario['usuario']}: {mes_ano} atualizado")
+
+    return len(plano) - falhas, falhas
+
+
+def proximo_inicio(hora_inicio, agora=None):
+    """Próximo instante em que a janela fora de pico começa"""
+    agora = agora or datetime.now()
+    inicio = agora.replace(hour=hora_inicio, minute=0, second=0, microsecond=0)
+    if inicio <= agora:
+        inicio += timedelta(days=1)
+    return inicio
+
+
+def executar_agendador(caminho_cadastro=CADASTRO_PADRAO, hora_inicio=HORA_INICIO_PADRAO,
+                       duracao_minutos=DURACAO_PADRAO, armazenamento=None, log=print):
+    """Laço diário: aguarda a janela fora de pico e executa o pré-aquecimento"""
+    armazenamento = armazenamento or armazenamento_padrao()
+    if armazenamento is None:
+        raise RuntimeError("Defina BANCO_HORAS_ARMAZENAMENTO para usar o pré-aquecimento")
+
+    while True:
+        inicio = proximo_inicio(hora_inicio)
+        log(f"⏳ Próxima janela: {inicio.strftime('%d/%m/%Y %H:%M')}")
+        time.sleep(max(0, (inicio - datetime.now()).total_seconds()))
+
+        # Cadastro relido a cada janela para refletir novos usuários
+        usuarios = carregar_cadastro(caminho_cadastro)
+        ok, falhas = executar_janela(usuarios, duracao_minutos * 60, armazenamento, log=log)
+        log(f"📋 Janela concluída: {ok} atualizados, {falhas} falhas")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Armazém de resultados compartilhado entre as sessões do Streamlit
+Os resultados ficam serializados em forma compacta, com limite de memória
+e expiração (LRU/TTL); a sessão guarda apenas um identificador
+"""
+
+import os
+import secrets
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .consultas import chave_mes, mes_ano_da_chave
+except ImportError:
+    from consultas import chave_mes, mes_ano_da_chave
+
+
+# Limite de memória dos resultados serializados e tempo de vida sem acesso
+LIMITE_MB_PADRAO = float(os.environ.get('BANCO_HORAS_RESULTADOS_MB', '64'))
+TTL_PADRAO = int(os.environ.get('BANCO_HORAS_RESULTADOS_TTL', '3600'))
+
+# Cabeçalho: chave do primeiro mês, quantidade de meses, total em minutos
+_CABECALHO = struct.Struct('<iiq')
+
+
+def serializar_resultado(total_minutos, detalhes, periodo):
+    """Serializa o resultado: os meses são consecutivos, então basta o primeiro
+    mês e um array int32 de saldos (o texto formatado é recalculado na leitura)"""
+    inicio = chave_mes(detalhes[0]['mes_ano']) if detalhes else 0
+    saldos = [d['saldo'] for d in detalhes]
+    return (
+        _CABECALHO.pack(inicio, len(saldos), total_minutos)
+        + struct.pack(f'<{len(saldos)}i', *saldos)
+        + periodo.encode('utf-8')
+    )
+
+
+def desserializar_resultado(dados, formatar):
+    """Reconstrói {'total_minutos', 'detalhes', 'periodo'} a partir dos bytes"""
+    inicio, quantidade, total_minutos = _CABECALHO.unpack_from(dados)
+    fim_saldos = _CABECALHO.size + quantidade * 4
+    saldos = struct.unpack_from(f'<{quantidade}i', dados, _CABECALHO.size)
+    detalhes = [
+        {'mes_ano': mes_ano_da_chave(inicio + i), 'saldo': saldo, 'saldo_formatado': formatar(saldo)}
+        for i, saldo in enumerate(saldos)
+    ]
+    return {
+        'total_minutos': total_minutos,
+        'detalhes': detalhes,
+        'periodo': dados[fim_saldos:].decode('utf-8')
+    }
+
+
+def rss_processo():
+    """Memória residente atual do processo em bytes (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ArmazemResultados:
+    """Resultados serializados por identificador, com despejo LRU por memória e TTL"""
+
+    def __init__(self, limite_bytes=int(LIMITE_MB_PADRAO * 1024 * 1024), ttl=TTL_PADRAO):
+        self.limite_bytes = limite_bytes
+        self.ttl = ttl
+        self._itens = OrderedDict()  # id -> (bytes, último acesso)
+        self._bytes = 0
+        self._despejos = 0
+        self._lock = threading.Lock()
+
+    def guardar(self, dados):
+        """Guarda os bytes serializados e retorna o identificador para a sessão"""
+        identificador = secrets.token_hex(8)
+        with self._lock:
+            self._itens[identificador] = (dados, time.monotonic())
+            self._bytes += len(dados)
+            self._despejar()
+        return identificador
+
+    def obter(self, identificador):
+        """Bytes do resultado (None se expirou ou foi despejado)"""
+        if not identificador:
+            return None
+        with self._lock:
+            item = self._itens.get(identificador)
+            if item is None:
+                return None
+            dados, acesso = item
+            agora = time.monotonic()
+            if agora - acesso > self.ttl:
+                self._remover(identificador)
+                self._despejos += 1
+                return None
+            self._itens[identificador] = (dados, agora)
+            self._itens.move_to_end(identificador)
+            return dados
+
+    def descartar(self, identificador):
+        """Remove um resultado que a sessão não usa mais"""
+        with self._lock:
+            if identificador in self._itens:
+                self._remover(identificador)
+
+    def _remover(self, identificador):
+        dados, _ = self._itens.pop(identificador)
+        self._bytes -= len(dados)
+
+    def _despejar(self):
+        # Itens mais antigos primeiro: expirados e, depois, o excesso de memória
+        limite_acesso = time.monotonic() - self.ttl
+        while self._itens:
+            identificador, (_, acesso) = next(iter(self._itens.items()))
+            if acesso >= limite_acesso and self._bytes <= self.limite_bytes:
+                break
+            self._remover(identificador)
+            self._despejos += 1
+
+    def estatisticas(self):
+        """Medidor de memória: itens, bytes em uso, limite, despejos e RSS do processo"""
+        with self._lock:
+            self._despejar()
+            return {
+                'itens': len(self._itens),
+                'bytes': self._bytes,
+                'limite_bytes': self.limite_bytes,
+                'despejos': self._despejos,
+                'rss_processo': rss_processo()
+            }
+
+
+_armazem_padrao = None
+_armazem_lock = threading.Lock()
+
+
+def armazem_resultados():
+    """Armazém único do processo, compartilhado por todas as sessões"""
+    global _armazem_padrao
+    with _armazem_lock:
+        if _armazem_padrao is None:
+            _armazem_padrao = ArmazemResultados()
+        return _armazem_padrao
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Transporte HTTP ajustado para o scraping da intranet
+Pool de conexões do tamanho da concorrência de cada sessão, novas
+tentativas apenas para falhas de conexão, Accept-Encoding limitado ao
+que o urllib3 consegue decodificar e medição do reuso de conexões
+"""
+
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+
+# Requisições simultâneas de uma mesma sessão (cada usuário busca os meses em sequência)
+CONEXOES_POR_SESSAO = int(os.environ.get('BANCO_HORAS_CONEXOES', '1'))
+
+# Novas tentativas do adaptador quando a conexão nem chega a ser estabelecida
+TENTATIVAS_CONEXAO = int(os.environ.get('BANCO_HORAS_TENTATIVAS_CONEXAO', '2'))
+
+# 'gzip,deflate' e, se os pacotes estiverem instalados, 'br' (brotli) e 'zstd':
+# anunciar uma codificação sem o decodificador devolveria bytes comprimidos
+CODIFICACOES_ACEITAS = ', '.join(c.strip() for c in ACCEPT_ENCODING.split(','))
+
+
+class AdaptadorIntranet(HTTPAdapter):
+    """HTTPAdapter que registra os pools usados para medir o reuso de conexões"""
+
+    def __init__(self, conexoes=CONEXOES_POR_SESSAO, tentativas_conexao=TENTATIVAS_CONEXAO):
+        # Só falhas de conexão são repetidas aqui: erros de leitura e status
+        # (429/5xx) ficam com o backoff e o limitador de BancoHorasAdvanced
+        retry = Retry(
+            total=None, connect=tentativas_conexao, read=0, status=0, other=0,
+            backoff_factor=0.5, raise_on_status=False
+        )
+        self._pools = []
+        super().__init__(pool_connections=1, pool_maxsize=max(1, conexoes), max_retries=retry)
+
+    def get_connection(self, url, proxies=None):
+        pool = super().get_connection(url, proxies)
+        if not any(p is pool for p in self._pools):
+            self._pools.append(pool)
+        return pool
+
+    def estatisticas(self):
+        """Requisições enviadas e conexões TCP (e TLS) abertas pelos pools"""
+        requisicoes = sum(p.num_requests for p in self._pools)
+        conexoes = sum(p.num_connections for p in self._pools)
+        return {
+            'requisicoes': requisicoes,
+            'conexoes': conexoes,
+            # Fração das requisições que aproveitaram uma conexão já aberta
+            'reuso': (requisicoes - conexoes) / requisicoes if requisicoes else None
+        }
+
+
+def criar_sessao():
+    """requests.Session com o adaptador ajustado para http e https"""
+    sessao = requests.Session()
+    adaptador = AdaptadorIntranet()
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    return sessao
+
+
+def estatisticas_sessao(sessao):
+    """Estatísticas de conexões de uma sessão criada por criar_sessao"""
+    return sessao.get_adapter('https://').estatisticas()
@@ -4,13 +4,36 @@ Utilitários para a Calculadora de Banco de Horas
 Funções auxiliares para formatação e manipulação de dados
 """
 
-import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
 from datetime import datetime
+from urllib.parse import urlparse
+from functools import lru_cache
 import io
+import os
 import re
 
+try:
+    from .importacao import importacao_tardia
+    from .consultas import chave_mes
+except ImportError:
+    from importacao import importacao_tardia
+    from consultas import chave_mes
+
+# Módulos pesados carregados apenas quando um gráfico ou componente é usado
+st = importacao_tardia('streamlit')
+go = importacao_tardia('plotly.graph_objects', dependencias=('numpy', 'pandas'))
+pd = importacao_tardia('pandas')
+np = importacao_tardia('numpy')
+
+# Intranets na própria máquina só com opt-in explícito
+# (intranet simulada do teste de carga e testes automatizados)
+PERMITIR_URL_LOCAL = os.environ.get('BANCO_HORAS_PERMITIR_URL_LOCAL', '') == '1'
+
+_HOSTS_LOCAIS = ('localhost', '127.0.0.1', '::1')
+
+# Escala de cores por sinal do saldo (-1 débito, 0 neutro, +1 crédito):
+# a cor vai como array numérico em vez de uma lista de strings por barra
+ESCALA_SALDO = [[0.0, '#dc3545'], [0.5, '#6c757d'], [1.0, '#28a745']]
+
 
 def init_session_state():
     """Inicializa o estado da sessão"""
@@ -18,8 +41,8 @@ def init_session_state():
         st.session_state.logged_in = False
     if 'calculator' not in st.session_state:
         st.session_state.calculator = None
-    if 'results' not in st.session_state:
-        st.session_state.results = None
+    if 'results_id' not in st.session_state:
+        st.session_state.results_id = None
     if 'processing' not in st.session_state:
         st.session_state.processing = False
     if 'error_message' not in st.session_state:
@@ -28,6 +51,36 @@ def init_session_state():
         st.session_state.error_details = None
 
 
+def normalize_intranet_url(url_intranet):
+    """Normaliza a URL da intranet para 'esquema://domínio[:porta]'
+    
+    Retorna (url_normalizada, mensagem_de_erro); em caso de erro a URL é vazia.
+    A própria máquina é recusada salvo com BANCO_HORAS_PERMITIR_URL_LOCAL=1.
+    """
+    # Remover espaços em branco
+    url_intranet = url_intranet.strip()
+    
+    # Adicionar https:// se não tiver protocolo
+    if not url_intranet.startswith(('http://', 'https://')):
+        url_intranet = 'https://' + url_intranet
+    
+    # Extrair apenas o domínio principal (remover paths e parâmetros)
+    try:
+        parsed = urlparse(url_intranet)
+        # Validação básica de segurança (pelo host, sem porta nem usuário)
+        host = parsed.hostname
+        if not host or (not PERMITIR_URL_LOCAL and host.rstrip('.') in _HOSTS_LOCAIS):
+            return "", "⚠️ URLs locais não são permitidas por segurança"
+        if parsed.scheme not in ['http', 'https']:
+            return "", "⚠️ Apenas URLs HTTP/HTTPS são permitidas"
+        netloc = f"[{host}]" if ':' in host else host
+        if parsed.port:
+            netloc += f":{parsed.port}"
+        return f"{parsed.scheme}://{netloc}", None
+    except Exception:
+        return "", "⚠️ URL inválida"
+
+
 def format_time(minutes):
     """Formata minutos em HH:MM ou em minutos se menor que 1 hora"""
     if minutes == 0:
@@ -45,16 +98,23 @@ def format_time(minutes):
     return f"{sign}{hours:02d}:{mins:02d}"
 
 
+@lru_cache(maxsize=None)
+def _read_sanitized_css(css_file):
+    """Lê e sanitiza o CSS uma única vez por processo"""
+    with open(css_file, 'r', encoding='utf-8') as f:
+        css_content = f.read()
+    
+    # Sanitização básica: remover conteúdo potencialmente perigoso
+    # Remove possíveis scripts ou imports externos
+    css_content = re.sub(r'@import\s+url\([^)]*\);?', '', css_content)
+    css_content = re.sub(r'javascript:', '', css_content, flags=re.IGNORECASE)
+    return css_content
+
+
 def load_css(css_file):
     """Carrega arquivo CSS e aplica no Streamlit de forma segura"""
     try:
-        with open(css_file, 'r', encoding='utf-8') as f:
-            css_content = f.read()
-        
-        # Sanitização básica: remover conteúdo potencialmente perigoso
-        # Remove possíveis scripts ou imports externos
-        css_content = re.sub(r'@import\s+url\([^)]*\);?', '', css_content)
-        css_content = re.sub(r'javascript:', '', css_content, flags=re.IGNORECASE)
+        css_content = _read_sanitized_css(os.path.abspath(css_file))
         
         st.markdown(f"""
         <style>
@@ -68,12 +128,47 @@ def load_css(css_file):
         st.warning(f"⚠️ Erro ao carregar CSS: {str(e)}")
 
 
-def create_monthly_chart(df):
-    """Cria gráfico mensal de banco de horas"""
-    fig = go.Figure()
+def prepare_chart_arrays(df):
+    """Pré-calcula uma única vez os arrays NumPy usados pelos gráficos
+    
+    Arrays numéricos são serializados pelo plotly como typed arrays
+    (base64), bem menores que listas JSON.
+    """
+    meses = df['mes_ano'].to_numpy()
+    saldos = df['saldo_minutos'].to_numpy(dtype='int64')
     
+    # Chave inteira por mês: comparar inteiros dispensa converter datas
+    try:
+        chaves = np.fromiter((chave_mes(m) for m in meses), dtype='int64', count=len(meses))
+    except (ValueError, AttributeError):
+        chaves = None
+    
+    if chaves is not None and np.all(chaves[1:] > chaves[:-1]):
+        # Meses já em ordem cronológica: nada a ordenar
+        ordem = None
+    elif chaves is not None:
+        ordem = np.argsort(chaves, kind='stable')
+    else:
+        # Fallback: formato diferente do esperado, usar ordenação simples
+        ordem = np.argsort(meses.astype(str), kind='stable')
+    
+    saldos_ordenados = saldos if ordem is None else saldos[ordem]
+    
+    return {
+        'meses': meses,
+        'horas': saldos / 60.0,
+        'sinais': np.sign(saldos).astype('int8'),
+        'textos': df['saldo_formatado'].to_numpy(),
+        'meses_ordenados': meses if ordem is None else meses[ordem],
+        'acumulado_horas': np.cumsum(saldos_ordenados) / 60.0
+    }
+
+
+def create_monthly_chart(df, arrays=None):
+    """Cria gráfico mensal de banco de horas"""
     # Proteção contra DataFrame vazio
     if df.empty:
+        fig = go.Figure()
         fig.add_annotation(
             text="Nenhum dado disponível",
             xref="paper", yref="paper",
@@ -85,15 +180,20 @@ def create_monthly_chart(df):
         )
         return fig
     
-    # Cores baseadas no saldo
-    colors = ['#28a745' if x > 0 else '#dc3545' if x < 0 else '#6c757d' for x in df['saldo_minutos']]
+    arrays = arrays if arrays is not None else prepare_chart_arrays(df)
+    return _build_monthly_figure(arrays['meses'], arrays['horas'], arrays['textos'], arrays['sinais'])
+
+
+def _build_monthly_figure(meses, saldo_horas, textos, sinais):
+    """Monta a figura de barras mensais (cor pelo sinal do saldo)"""
+    fig = go.Figure()
     
     fig.add_trace(go.Bar(
-        x=df['mes_ano'],
-        y=df['saldo_horas'],
-        text=df['saldo_formatado'],
+        x=meses,
+        y=saldo_horas,
+        text=textos,
         textposition='outside',
-        marker_color=colors,
+        marker=dict(color=sinais, colorscale=ESCALA_SALDO, cmin=-1, cmax=1),
         hovertemplate='<b>%{x}</b><br>Saldo: %{text}<br><extra></extra>'
     ))
     
@@ -112,8 +212,33 @@ def create_monthly_chart(df):
     return fig
 
 
-def create_cumulative_chart(df):
-    """Cria gráfico cumulativo de banco de horas"""
+def create_streaming_charts():
+    """Cria os gráficos mensal e cumulativo vazios para preenchimento mês a mês"""
+    return _build_monthly_figure([], [], [], []), _build_cumulative_figure([], [])
+
+
+def append_month_to_charts(fig_monthly, fig_cumulative, detalhe, acumulado_minutos):
+    """Acrescenta um mês aos gráficos criados por create_streaming_charts"""
+    saldo = detalhe['saldo']
+    sinal = (saldo > 0) - (saldo < 0)
+    
+    barras = fig_monthly.data[0]
+    barras.x = tuple(barras.x or ()) + (detalhe['mes_ano'],)
+    barras.y = tuple(barras.y or ()) + (saldo / 60,)
+    barras.text = tuple(barras.text or ()) + (format_time(saldo),)
+    barras.marker.color = tuple(barras.marker.color or ()) + (sinal,)
+    
+    linha = fig_cumulative.data[0]
+    linha.x = tuple(linha.x or ()) + (detalhe['mes_ano'],)
+    linha.y = tuple(linha.y or ()) + (acumulado_minutos / 60,)
+
+
+def create_cumulative_chart(df, serie=None, arrays=None):
+    """Cria gráfico cumulativo de banco de horas
+    
+    Se uma SerieSaldos for informada, usa o índice de prefixo dela
+    em vez de ordenar e recalcular o cumsum a cada renderização.
+    """
     # Proteção contra DataFrame vazio
     if df.empty:
         fig = go.Figure()
@@ -128,31 +253,23 @@ def create_cumulative_chart(df):
         )
         return fig
     
-    # Criar uma cópia do DataFrame para não alterar o original
-    df_work = df.copy()
-    
-    try:
-        # Converter mes_ano para datetime para ordenação correta
-        df_work['data_ordenacao'] = pd.to_datetime(df_work['mes_ano'], format='%m/%Y')
-        
-        # Ordenar por data cronológica
-        df_sorted = df_work.sort_values('data_ordenacao')
-        
-    except Exception:
-        # Fallback: se der erro na conversão, usar ordenação simples
-        # Isso pode acontecer se o formato for diferente do esperado
-        df_sorted = df_work.sort_values('mes_ano')
-    
-    # Calcular valores cumulativos
-    df_sorted['saldo_cumulativo'] = df_sorted['saldo_minutos'].cumsum()
-    df_sorted['saldo_cum_horas'] = df_sorted['saldo_cumulativo'] / 60
+    if serie is not None:
+        meses = serie.meses()
+        acumulado_horas = np.asarray(serie.acumulados(), dtype='float64') / 60.0
+        return _build_cumulative_figure(meses, acumulado_horas)
     
+    arrays = arrays if arrays is not None else prepare_chart_arrays(df)
+    return _build_cumulative_figure(arrays['meses_ordenados'], arrays['acumulado_horas'])
+
+
+def _build_cumulative_figure(meses, acumulado_horas):
+    """Monta a figura cumulativa a partir de meses ordenados e acumulados"""
     fig = go.Figure()
     
     # Linha cumulativa
     fig.add_trace(go.Scatter(
-        x=df_sorted['mes_ano'],
-        y=df_sorted['saldo_cum_horas'],
+        x=meses,
+        y=acumulado_horas,
         mode='lines+markers',
         name='Saldo Cumulativo',
         line=dict(width=3),
@@ -174,6 +291,99 @@ def create_cumulative_chart(df):
     return fig
 
 
+# Acima deste número de pontos os gráficos da equipe usam WebGL
+MAX_PONTOS_SVG = 2000
+
+
+def create_team_distribution_chart(distribuicao):
+    """Cria histograma (já agrupado em faixas) dos saldos da equipe"""
+    fig = go.Figure()
+    
+    centros = (distribuicao['inicio_horas'] + distribuicao['fim_horas']) / 2
+    larguras = distribuicao['fim_horas'] - distribuicao['inicio_horas']
+    
+    fig.add_trace(go.Bar(
+        x=centros,
+        y=distribuicao['funcionarios'],
+        width=larguras,
+        marker_color='#4A90E2',
+        hovertemplate='%{x:.1f}h<br>Funcionários: %{y}<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title='Distribuição dos Saldos',
+        xaxis_title='Saldo (horas)',
+        yaxis_title='Funcionários',
+        showlegend=False,
+        height=400
+    )
+    
+    return fig
+
+
+def create_team_ranking_chart(funcionarios, limite=10):
+    """Cria gráfico com os maiores devedores e credores"""
+    devedores = funcionarios.nsmallest(limite, 'saldo_total')
+    credores = funcionarios.nlargest(limite, 'saldo_total')
+    ranking = pd.concat([devedores, credores.iloc[::-1]]).drop_duplicates('funcionario')
+    
+    rotulos = ranking['nome'].astype(str).where(ranking['nome'].astype(str) != '', ranking['funcionario'].astype(str))
+    
+    saldos = ranking['saldo_total'].to_numpy(dtype='int64')
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=saldos / 60.0,
+        y=rotulos,
+        orientation='h',
+        text=[format_time(int(m)) for m in saldos],
+        marker=dict(color=np.sign(saldos).astype('int8'), colorscale=ESCALA_SALDO, cmin=-1, cmax=1),
+        hovertemplate='<b>%{y}</b><br>Saldo: %{text}<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title=f'Top {limite} Devedores e Credores',
+        xaxis_title='Horas',
+        showlegend=False,
+        height=max(400, 25 * len(ranking))
+    )
+    
+    return fig
+
+
+def create_department_chart(departamentos):
+    """Cria gráfico do saldo total por departamento e mês"""
+    fig = go.Figure()
+    
+    # Muitos pontos: WebGL mantém o navegador responsivo
+    scatter = go.Scattergl if len(departamentos) > MAX_PONTOS_SVG else go.Scatter
+    
+    for departamento, grupo in departamentos.groupby('departamento', observed=True):
+        fig.add_trace(scatter(
+            x=grupo['mes_ano'].astype(str),
+            y=grupo['saldo_total'].to_numpy(dtype='float64') / 60.0,
+            mode='lines+markers' if len(grupo) <= 60 else 'lines',
+            name=str(departamento),
+            hovertemplate='<b>%{x}</b><br>%{y:.1f}h<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title='Saldo por Departamento e Mês',
+        xaxis_title='Mês/Ano',
+        yaxis_title='Horas',
+        height=450,
+        xaxis_tickangle=-45
+    )
+    
+    # Manter ordem cronológica mesmo quando departamentos têm meses diferentes
+    meses = departamentos.drop_duplicates('mes_chave')['mes_ano'].astype(str)
+    fig.update_xaxes(categoryorder='array', categoryarray=list(meses))
+    
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5)
+    
+    return fig
+
+
 def create_summary_metrics(total_minutes, details):
     """Cria métricas resumo"""
     # Proteção contra lista vazia
@@ -214,6 +424,35 @@ def create_summary_metrics(total_minutes, details):
         st.metric("⚪ Meses Neutros", neutral_months)
 
 
+def create_period_queries(serie):
+    """Exibe consultas do período: acumulado no ano, janelas móveis e trimestres"""
+    ultimo_mes = serie.ultimo_mes()
+    if ultimo_mes is None:
+        return
+    
+    ano_ultimo = ultimo_mes.split('/')[1]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(f"📆 Acumulado {ano_ultimo}", format_time(serie.acumulado_no_ano()))
+    with col2:
+        st.metric("🕒 Últimos 3 meses", format_time(serie.janela_movel(3)))
+    with col3:
+        st.metric("🕕 Últimos 6 meses", format_time(serie.janela_movel(6)))
+    with col4:
+        st.metric("🕛 Últimos 12 meses", format_time(serie.janela_movel(12)))
+    
+    trimestres_df = pd.DataFrame([
+        {
+            'Trimestre': f"{t['trimestre']}º/{t['ano']}",
+            'Saldo': format_time(t['saldo'])
+        }
+        for t in serie.trimestres()
+    ])
+    trimestres_df.index = trimestres_df.index + 1
+    st.dataframe(trimestres_df, use_container_width=True)
+
+
 def download_report(df, total_minutes):
     """Gera relatório para download"""
     buffer = io.StringIO()
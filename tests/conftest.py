@@ -0,0 +1,15 @@
+"""Configuração dos testes: módulos importados a partir de src/ (como em main.py)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import pytest
+
+
+@pytest.fixture
+def sem_espera(monkeypatch):
+    """Dispensa as pausas de backoff entre tentativas"""
+    import time
+    monkeypatch.setattr(time, 'sleep', lambda segundos: None)
@@ -0,0 +1,78 @@
+"""Validação do período dos pedidos da API"""
+
+import pytest
+from fastapi import HTTPException
+
+from app import api
+
+
+def _pedido(inicio, fim):
+    return api.PedidoSaldo(url='intranet.exemplo.com', usuario='fulano', senha='x', inicio=inicio, fim=fim)
+
+
+@pytest.mark.parametrize('inicio, fim', [('01/0000', '02/0000'), ('01/1999', '12/2000'), ('01/2024', '12/9999')])
+def test_ano_fora_do_intervalo(inicio, fim):
+    with pytest.raises(HTTPException) as erro:
+        api._periodo(_pedido(inicio, fim))
+    assert erro.value.status_code == 400
+    assert 'Ano deve estar entre' in erro.value.detail
+
+
+def test_periodo_acima_do_maximo(monkeypatch):
+    monkeypatch.setattr(api, 'MAX_MESES', 12)
+    assert api._periodo(_pedido('01/2023', '12/2023')) == (1, 2023, 12, 2023)
+    with pytest.raises(HTTPException) as erro:
+        api._periodo(_pedido('01/2023', '01/2024'))
+    assert '13 meses' in erro.value.detail
+
+
+def test_fim_antes_do_inicio():
+    with pytest.raises(HTTPException) as erro:
+        api._periodo(_pedido('05/2024', '04/2024'))
+    assert erro.value.status_code == 400
+
+
+def test_sessao_expirada_faz_novo_login_e_continua(sem_espera):
+    from app.banco_horas import BancoHorasAdvanced
+    from app.carga import IntranetSimulada
+
+    with IntranetSimulada(exigir_sessao=True) as intranet:
+        calc = BancoHorasAdvanced(intranet.url)
+        assert calc.fazer_login('fulano', 'x')
+        sessao = api.SessaoAutenticada(calc, api._hash('x'))
+
+        meses = api._iterar_meses(sessao, (11, 2023, 2, 2024), _pedido('11/2023', '02/2024'))
+        primeiro = next(meses)
+        intranet.expirar_sessoes()
+        restantes = list(meses)
+    assert [d['mes_ano'] for d in [primeiro] + restantes] == ['11/2023', '12/2023', '01/2024', '02/2024']
+
+
+def test_meses_inclui_os_servidos_pelo_armazenamento(tmp_path, monkeypatch, sem_espera):
+    import asyncio
+    import time
+
+    from app import utils
+    from app.armazenamento import ArmazenamentoSaldos
+    from app.banco_horas import BancoHorasAdvanced
+    from app.carga import IntranetSimulada
+
+    monkeypatch.setattr(utils, 'PERMITIR_URL_LOCAL', True)
+    monkeypatch.setattr(api, 'sessoes', api.GerenciadorSessoes())
+    armazenamento = ArmazenamentoSaldos(str(tmp_path / 'saldos.sqlite'))
+
+    with IntranetSimulada() as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=armazenamento)
+        assert calc.fazer_login('fulano', 'x')
+        api.sessoes._sessoes[api.sessoes._chave(intranet.url, 'fulano')] = api.SessaoAutenticada(calc, api._hash('x'))
+        # Meses antigos já gravados: /saldo responde sem acessar a intranet
+        for mes_ano, saldo in (('01/2023', 30), ('02/2023', -15)):
+            armazenamento.gravar_mes(calc.host, calc.usuario_hash, mes_ano, {'saldo': saldo, 'atualizado_em': time.time()})
+
+        pedido = api.PedidoSaldo(url=intranet.url, usuario='fulano', senha='x', inicio='01/2023', fim='03/2023')
+        total, _ = api._calcular(intranet.url, pedido, api._periodo(pedido))
+        credenciais = api.Credenciais(url=intranet.url, usuario='fulano', senha='x')
+        meses = asyncio.run(api.meses_em_cache(credenciais))['meses']
+
+    assert [m['mes_ano'] for m in meses] == ['01/2023', '02/2023', '03/2023']
+    assert sum(m['saldo'] for m in meses) == total
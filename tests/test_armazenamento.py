@@ -0,0 +1,51 @@
+"""Armazenamento local: precisão do instante de gravação e upsert em lote"""
+
+import time
+
+import pytest
+
+from app.armazenamento import ArmazenamentoSaldos
+from app.banco_horas import BancoHorasAdvanced, MesIndisponivel
+from app.carga import IntranetSimulada
+
+
+def test_duckdb_preserva_instante_de_atualizacao(tmp_path):
+    duckdb = pytest.importorskip('duckdb')
+    from app.armazenamento import ArmazenamentoDuckDB
+
+    caminho = str(tmp_path / 'saldos.duckdb')
+    # Arquivo de uma versão anterior, com 'atualizado_em' em FLOAT de 4 bytes
+    antigo = duckdb.connect(caminho)
+    antigo.execute(
+        "CREATE TABLE saldos_mensais (host TEXT NOT NULL, usuario_hash TEXT NOT NULL, "
+        "mes_chave INTEGER NOT NULL, mes_ano TEXT NOT NULL, saldo INTEGER NOT NULL, etag TEXT, "
+        "last_modified TEXT, hash TEXT, tamanho_bruto TEXT, atualizado_em REAL NOT NULL, "
+        "PRIMARY KEY (host, usuario_hash, mes_chave))"
+    )
+    antigo.close()
+
+    armazenamento = ArmazenamentoDuckDB(caminho)
+    instante = 1760000000.25
+    armazenamento.gravar_mes('h', 'u', '01/2024', {'saldo': 10, 'atualizado_em': instante})
+    assert armazenamento.obter_meses('h', 'u', ['01/2024'])['01/2024']['atualizado_em'] == instante
+
+
+def test_iteracao_grava_em_um_unico_upsert(tmp_path, monkeypatch, sem_espera):
+    armazenamento = ArmazenamentoSaldos(str(tmp_path / 'saldos.sqlite'))
+    lotes = []
+    gravar_meses = armazenamento.gravar_meses
+    monkeypatch.setattr(armazenamento, 'gravar_meses', lambda *a: lotes.append(a[2]) or gravar_meses(*a))
+    monkeypatch.setattr(armazenamento, 'gravar_mes', lambda *a: pytest.fail('gravação mês a mês'))
+
+    with IntranetSimulada(meses_com_falha={'04/2024'}) as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=armazenamento)
+        assert calc.fazer_login('fulano', 'x')
+        with pytest.raises(MesIndisponivel):
+            for _ in calc.iterar_banco_horas(1, 2024, 4, 2024):
+                pass
+
+    # Os meses obtidos antes da falha são gravados juntos, e o que falhou não
+    assert [sorted(lote) for lote in lotes] == [['01/2024', '02/2024', '03/2024']]
+    assert calc._gravacoes_pendentes is None
+    entradas = armazenamento.obter_meses(calc.host, calc.usuario_hash, ['01/2024', '04/2024'])
+    assert set(entradas) == {'01/2024'} and entradas['01/2024']['atualizado_em'] <= time.time()
@@ -0,0 +1,184 @@
+"""Falhas da intranet não podem virar saldo zerado"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import banco_horas, utils
+from app.armazenamento import ArmazenamentoSaldos
+from app.banco_horas import BancoHorasAdvanced, MesIndisponivel, SessaoExpirada
+from app.carga import IntranetSimulada
+from app.preaquecimento import executar_janela, mes_anterior, preaquecer_usuario
+
+PAGINA_LOGIN = b'<form><input type="text" name="Login"><input type="password" name="Senha"></form>'
+PAGINA_ZERADA = (
+    '<table><tr class="text-primary"><td>Funcionário deve</td><td>00:00</td></tr>'
+    '<tr class="text-danger"><td>Empresa deve</td><td>00:00</td></tr></table>'
+).encode('utf-8')
+
+
+@pytest.fixture
+def armazenamento(tmp_path):
+    return ArmazenamentoSaldos(str(tmp_path / 'saldos.sqlite'))
+
+
+@pytest.fixture
+def url_local(monkeypatch):
+    """Cadastro do pré-aquecimento apontando para a intranet simulada"""
+    monkeypatch.setattr(utils, 'PERMITIR_URL_LOCAL', True)
+
+
+def test_pagina_sem_tabela_nao_e_saldo_zero():
+    calc = BancoHorasAdvanced('https://intranet.exemplo.com')
+    assert calc.extrair_horas_avancado(PAGINA_LOGIN) is None
+    assert calc.extrair_horas_avancado(PAGINA_ZERADA) == 0
+
+
+def test_sessao_expirada_nao_e_gravada(armazenamento, sem_espera):
+    with IntranetSimulada(exigir_sessao=True) as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=armazenamento)
+        assert calc.fazer_login('fulano', 'x')
+        assert isinstance(calc.obter_saldo_mes('01/2024'), int)
+
+        intranet.expirar_sessoes()
+        with pytest.raises(SessaoExpirada):
+            calc.obter_saldo_mes('02/2024')
+    assert set(armazenamento.obter_meses(calc.host, calc.usuario_hash, ['01/2024', '02/2024'])) == {'01/2024'}
+
+
+def test_falha_usa_saldo_armazenado_antigo(armazenamento, sem_espera):
+    with IntranetSimulada(meses_com_falha={'03/2024'}) as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=armazenamento)
+        assert calc.fazer_login('fulano', 'x')
+        with pytest.raises(MesIndisponivel):
+            calc.obter_saldo_mes('03/2024')
+
+        armazenamento.gravar_mes(calc.host, calc.usuario_hash, '03/2024', {'saldo': 123, 'atualizado_em': 0.0})
+        assert calc.obter_saldo_mes('03/2024') == 123
+    # O saldo antigo não é regravado como se fosse recente
+    assert armazenamento.obter_meses(calc.host, calc.usuario_hash, ['03/2024'])['03/2024']['atualizado_em'] == 0.0
+
+
+def test_preaquecimento_com_cookies_expirados(armazenamento, monkeypatch, url_local, sem_espera):
+    monkeypatch.setenv('COOKIES_FULANO', 'sessao=expirada')
+    with IntranetSimulada(exigir_sessao=True) as intranet:
+        usuario = {'url': intranet.url, 'usuario': 'fulano', 'cookies_env': 'COOKIES_FULANO'}
+        assert preaquecer_usuario(usuario, '01/2024', armazenamento) is False
+
+        calc = BancoHorasAdvanced(intranet.url)
+        calc.definir_usuario('fulano')
+        assert armazenamento.obter_meses(calc.host, calc.usuario_hash, ['01/2024']) == {}
+
+
+def test_preaquecimento_grava_mes_recente(armazenamento, monkeypatch, url_local, sem_espera):
+    monkeypatch.setenv('SENHA_FULANO', 'x')
+    with IntranetSimulada(exigir_sessao=True) as intranet:
+        usuario = {'url': intranet.url, 'usuario': 'fulano', 'senha_env': 'SENHA_FULANO'}
+        inicio = time.time()
+        assert preaquecer_usuario(usuario, '01/2024', armazenamento) is True
+
+        calc = BancoHorasAdvanced(intranet.url)
+        calc.definir_usuario('fulano')
+        entrada = armazenamento.obter_meses(calc.host, calc.usuario_hash, ['01/2024'])['01/2024']
+        assert entrada['atualizado_em'] >= inicio
+
+
+def test_preaquecimento_normaliza_url_do_cadastro(armazenamento, monkeypatch, url_local, sem_espera):
+    monkeypatch.setenv('SENHA_FULANO', 'x')
+    with IntranetSimulada() as intranet:
+        # Caminho e barra final como copiados do navegador
+        usuario = {'url': f' {intranet.url}/Horas/FolhaPonto/ ', 'usuario': 'fulano', 'senha_env': 'SENHA_FULANO'}
+        assert preaquecer_usuario(usuario, '01/2024', armazenamento) is True
+
+        # Gravado sob o mesmo host que o app usa ao consultar
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=armazenamento)
+        calc.definir_usuario('fulano')
+        assert set(calc.carregar_armazenados(['01/2024'])) == {'01/2024'}
+
+
+def test_preaquecimento_url_invalida_conta_como_falha(armazenamento):
+    usuario = {'url': 'localhost:8080', 'usuario': 'fulano'}
+    with pytest.raises(ValueError, match='localhost'):
+        preaquecer_usuario(usuario, '01/2024', armazenamento)
+
+    mensagens = []
+    assert executar_janela([usuario], 0, armazenamento, mes_ano='01/2024', log=mensagens.append) == (0, 1)
+    assert mensagens[0].startswith('❌ fulano:')
+
+
+def test_mes_recente_preaquecido_vale_ate_o_fim_do_expediente(monkeypatch):
+    calc = BancoHorasAdvanced('https://intranet.exemplo.com', armazenamento=None)
+    hoje = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    def recente_as(hora_gravacao, hora_consulta, dias_depois=0):
+        gravado = hoje.replace(hour=hora_gravacao)
+        consulta = gravado.replace(hour=hora_consulta) + timedelta(days=dias_depois)
+        monkeypatch.setattr(time, 'time', lambda: consulta.timestamp())
+        return calc._entrada_recente(mes_anterior(), {'saldo': 0, 'atualizado_em': gravado.timestamp()})
+
+    # Pré-aquecido às 2h: vale durante o horário de pico, além das 12h
+    assert recente_as(2, 16) is True
+    assert recente_as(2, 18) is True
+    assert recente_as(2, 20) is False
+    # Obtido à noite: continuam valendo as 12h
+    assert recente_as(20, 7, dias_depois=1) is True
+    assert recente_as(20, 9, dias_depois=1) is False
+
+
+def _sem_parse(calc, monkeypatch):
+    monkeypatch.setattr(calc, 'extrair_horas_avancado', lambda conteudo: pytest.fail('página analisada de novo'))
+
+
+def test_revalidacao_com_etag_reaproveita_o_parse(monkeypatch):
+    with IntranetSimulada() as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=None)
+        assert calc.fazer_login('fulano', 'x')
+        intranet.requisicoes.clear()
+        saldo = calc.processar_mes_com_retry('01/2024')
+        assert calc.cache_meses['01/2024']['etag']
+
+        _sem_parse(calc, monkeypatch)
+        status = []
+        requisitar = calc._requisitar
+
+        def registrar(*args, **kwargs):
+            response = requisitar(*args, **kwargs)
+            status.append(response.status_code)
+            return response
+        monkeypatch.setattr(calc, '_requisitar', registrar)
+
+        assert calc.processar_mes_com_retry('01/2024') == saldo
+    assert status == [304]
+    assert intranet.requisicoes == [('GET', '01/2024'), ('GET', '01/2024')]
+
+
+def test_corpo_identico_dispensa_novo_parse(monkeypatch):
+    with IntranetSimulada(validadores=False) as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=None)
+        assert calc.fazer_login('fulano', 'x')
+        intranet.requisicoes.clear()
+        saldo = calc.processar_mes_com_retry('01/2024')
+        assert calc.cache_meses['01/2024']['etag'] is None
+
+        _sem_parse(calc, monkeypatch)
+        assert calc.processar_mes_com_retry('01/2024') == saldo
+    # Sem validadores e sem HEAD: a página é baixada, mas não analisada
+    assert intranet.requisicoes == [('GET', '01/2024'), ('GET', '01/2024')]
+
+
+def test_revalidacao_por_tamanho_usa_head(monkeypatch):
+    monkeypatch.setattr(banco_horas, 'REVALIDAR_POR_TAMANHO', True)
+    with IntranetSimulada(validadores=False) as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=None)
+        assert calc.revalidar_por_tamanho
+        assert calc.fazer_login('fulano', 'x')
+        intranet.requisicoes.clear()
+        saldo = calc.processar_mes_com_retry('01/2024')
+
+        _sem_parse(calc, monkeypatch)
+        assert calc.processar_mes_com_retry('01/2024') == saldo
+    assert intranet.requisicoes == [('GET', '01/2024'), ('HEAD', '01/2024')]
+
+    # O parâmetro do construtor prevalece sobre a variável de ambiente
+    assert BancoHorasAdvanced('https://intranet.exemplo.com', revalidar_por_tamanho=False).revalidar_por_tamanho is False
@@ -0,0 +1,19 @@
+"""Percentis do relatório do teste de carga"""
+
+import pytest
+
+from app.carga import _percentil
+
+
+@pytest.mark.parametrize('n, p, esperado', [
+    (10, 50, 5), (10, 90, 9), (10, 100, 10), (10, 1, 1),
+    (20, 95, 19), (20, 50, 10),
+    (100, 99, 99), (100, 95, 95), (100, 50, 50),
+    (1, 99, 1),
+])
+def test_percentil_por_posicao_mais_proxima(n, p, esperado):
+    assert _percentil(list(range(1, n + 1)), p) == esperado
+
+
+def test_percentil_sem_amostras():
+    assert _percentil([], 95) != _percentil([], 95)
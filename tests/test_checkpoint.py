@@ -0,0 +1,116 @@
+"""Checkpoint e retomada de cálculos interrompidos"""
+
+import json
+import os
+import time
+
+import pytest
+
+from app import checkpoint as modulo_checkpoint
+from app import cli, limitador, utils
+from app.banco_horas import BancoHorasAdvanced, MesIndisponivel
+from app.carga import IntranetSimulada
+from app.checkpoint import CheckpointIncompativel, CheckpointJob, descricao_job
+
+
+def _calcular(url, checkpoint=None):
+    calc = BancoHorasAdvanced(url)
+    assert calc.fazer_login('fulano', 'x')
+    detalhes = list(calc.iterar_banco_horas(1, 2024, 6, 2024, checkpoint=checkpoint))
+    return sum(d['saldo'] for d in detalhes), detalhes
+
+
+def test_retomada_apos_mes_indisponivel_da_o_mesmo_resultado(tmp_path, monkeypatch, sem_espera):
+    with IntranetSimulada() as intranet:
+        esperado = _calcular(intranet.url)
+
+    with IntranetSimulada(meses_com_falha={'03/2024'}) as intranet:
+        job = CheckpointJob('job', diretorio=str(tmp_path))
+        with pytest.raises(MesIndisponivel):
+            _calcular(intranet.url, job)
+        assert set(job.carregar()) == {'01/2024', '02/2024'}
+
+        # Intranet de volta (e um disjuntor novo): só os meses que faltam são buscados
+        intranet.meses_com_falha.clear()
+        monkeypatch.setattr(limitador, '_limitadores', {})
+        assert _calcular(intranet.url, CheckpointJob('job', diretorio=str(tmp_path))) == esperado
+
+
+def test_linha_incompleta_e_descartada(tmp_path):
+    job = CheckpointJob('job', diretorio=str(tmp_path))
+    job.registrar({'mes_ano': '01/2024', 'saldo': 10, 'saldo_formatado': '+10min'})
+    with open(job.caminho, 'a', encoding='utf-8') as f:
+        f.write('{"mes_ano": "02/20')
+
+    assert list(job.carregar()) == ['01/2024']
+    job.registrar({'mes_ano': '02/2024', 'saldo': -5, 'saldo_formatado': '-5min'})
+    assert list(job.carregar()) == ['01/2024', '02/2024']
+
+
+def test_checkpoint_antigo_e_ignorado(tmp_path):
+    job = CheckpointJob('job', diretorio=str(tmp_path), validade=3600)
+    with open(job.caminho, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'criado_em': time.time() - 7200}) + '\n')
+        f.write(json.dumps({'mes_ano': '01/2024', 'saldo': 10}) + '\n')
+
+    assert job.carregar() == {}
+    assert not os.path.exists(job.caminho)
+
+
+def test_checkpoint_sem_data_de_criacao_e_ignorado(tmp_path):
+    job = CheckpointJob('job', diretorio=str(tmp_path))
+    with open(job.caminho, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'mes_ano': '01/2024', 'saldo': 10}) + '\n')
+    assert job.carregar() == {}
+
+
+def test_diretorio_padrao_na_raiz_do_projeto():
+    if os.environ.get('BANCO_HORAS_CHECKPOINTS'):
+        pytest.skip('diretório definido pelo ambiente')
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert os.path.normpath(modulo_checkpoint.DIRETORIO_PADRAO) == os.path.join(raiz, 'temp', 'checkpoints')
+
+
+def test_checkpoint_de_outro_calculo_e_recusado(tmp_path):
+    descricao = descricao_job('intranet.exemplo.com', 'hash-a', 1, 2024, 6, 2024)
+    job = CheckpointJob('job', diretorio=str(tmp_path), descricao=descricao)
+    job.registrar({'mes_ano': '01/2024', 'saldo': 10})
+    assert list(CheckpointJob('job', diretorio=str(tmp_path), descricao=descricao).carregar()) == ['01/2024']
+
+    outro = descricao_job('intranet.exemplo.com', 'hash-b', 1, 2024, 6, 2024)
+    with pytest.raises(CheckpointIncompativel):
+        CheckpointJob('job', diretorio=str(tmp_path), descricao=outro).carregar()
+    # O checkpoint do dono continua intacto
+    assert os.path.exists(job.caminho)
+
+
+def test_checkpoint_sem_descricao_e_descartado(tmp_path):
+    job = CheckpointJob('job', diretorio=str(tmp_path))
+    job.registrar({'mes_ano': '01/2024', 'saldo': 10})
+    descricao = descricao_job('intranet.exemplo.com', 'hash-a', 1, 2024, 6, 2024)
+    assert CheckpointJob('job', diretorio=str(tmp_path), descricao=descricao).carregar() == {}
+
+
+def test_cli_recusa_job_id_de_outro_calculo(tmp_path, monkeypatch, capsys, sem_espera):
+    monkeypatch.setattr(modulo_checkpoint, 'DIRETORIO_PADRAO', str(tmp_path))
+    monkeypatch.setenv('SENHA_TESTE', 'x')
+    monkeypatch.setattr(utils, 'PERMITIR_URL_LOCAL', True)
+
+    monkeypatch.setattr(limitador, '_limitadores', {})
+    monkeypatch.setattr(limitador, '_criar_balde', lambda host: limitador.BaldeTokens(1000, 1000, 1000))
+
+    # O primeiro cálculo para no último mês e deixa o checkpoint do job
+    with IntranetSimulada(meses_com_falha={'06/2024'}) as intranet:
+        argumentos = ['calcular', '--url', intranet.url, '--senha-env', 'SENHA_TESTE',
+                      '--inicio', '01/2024', '--fim', '06/2024', '--job-id', 'compartilhado']
+        assert cli.main(argumentos + ['--usuario', 'fulano']) == 1
+        capsys.readouterr()
+        assert cli.main(argumentos + ['--usuario', 'ciclano']) == 1
+    assert 'pertence a outro cálculo' in capsys.readouterr().err
+
+
+def test_cli_recusa_ano_fora_do_intervalo(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(['calcular', '--url', 'intranet.empresa.com', '--usuario', 'fulano',
+                  '--inicio', '01/0000', '--fim', '12/2024'])
+    assert 'ano deve estar entre' in capsys.readouterr().err
@@ -0,0 +1,46 @@
+"""Validação dos argumentos da linha de comando"""
+
+import sqlite3
+from urllib.parse import urlparse
+
+import pytest
+
+from app import cli, limitador, utils
+from app.carga import IntranetSimulada
+
+
+def _enfileirar(tmp_path, url, *extras):
+    csv = tmp_path / 'funcionarios.csv'
+    csv.write_text('matricula,usuario\n1,fulano\n', encoding='utf-8')
+    return cli.main([
+        'distribuido', '--fila', str(tmp_path / 'fila.db'), 'enfileirar', '--url', url,
+        '--funcionarios', str(csv), '--inicio', '01/2024', '--fim', '03/2024', *extras
+    ])
+
+
+@pytest.mark.parametrize('valor', ['0', '-3', 'x'])
+def test_meses_por_unidade_deve_ser_positivo(tmp_path, valor, capsys):
+    with pytest.raises(SystemExit):
+        _enfileirar(tmp_path, 'intranet.empresa.com', '--meses-por-unidade', valor)
+    assert '--meses-por-unidade' in capsys.readouterr().err
+
+
+def test_enfileirar_normaliza_url(tmp_path, capsys):
+    assert _enfileirar(tmp_path, ' Intranet.Empresa.com/Horas ', '--meses-por-unidade', '2') == 0
+    with sqlite3.connect(tmp_path / 'fila.db') as conexao:
+        assert conexao.execute("SELECT DISTINCT url FROM unidades").fetchall() == [('https://intranet.empresa.com',)]
+
+    assert _enfileirar(tmp_path, 'localhost:8501') == 1
+    assert 'URLs locais' in capsys.readouterr().err
+
+
+def test_calcular_com_disjuntor_aberto_nao_gera_traceback(monkeypatch, capsys):
+    monkeypatch.setattr(limitador, '_limitadores', {})
+    monkeypatch.setattr(utils, 'PERMITIR_URL_LOCAL', True)
+    with IntranetSimulada() as intranet:
+        disjuntor = limitador.limitador_para_host(urlparse(intranet.url).netloc).disjuntor
+        for _ in range(disjuntor.minimo_amostras):
+            disjuntor.registrar_falha()
+        assert cli.main(['calcular', '--url', intranet.url, '--usuario', 'fulano',
+                         '--inicio', '01/2024', '--fim', '01/2024']) == 1
+    assert 'instável' in capsys.readouterr().err
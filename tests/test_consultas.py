@@ -0,0 +1,87 @@
+"""Somas de prefixo e consultas de período sobre saldos mensais"""
+
+import pytest
+
+from app.consultas import IndicePrefixo, SerieSaldos, chave_mes, mes_ano_da_chave
+
+# Fevereiro e abril de 2024 sem saldo (meses sem registro)
+SALDOS = [('01/2024', 30), ('11/2023', 10), ('05/2024', -7), ('12/2023', -20), ('03/2024', 5)]
+
+
+@pytest.fixture
+def serie():
+    return SerieSaldos(SALDOS)
+
+
+def test_chave_mes_ida_e_volta():
+    assert chave_mes('01/2024') == 2024 * 12
+    assert chave_mes('12/2023') + 1 == chave_mes('01/2024')
+    assert mes_ano_da_chave(chave_mes('07/2015')) == '07/2015'
+
+
+def test_indice_combina_chaves_repetidas():
+    indice = IndicePrefixo([(5, 1), (1, 2), (1, 3)])
+    assert (indice.chaves, indice.valores, len(indice)) == ([1, 5], [5, 1], 2)
+    assert [indice.acumulado_ate(c) for c in (0, 1, 4, 9)] == [0, 5, 5, 6]
+    assert indice.soma_intervalo(2, 5) == 1
+    assert indice.soma_intervalo(5, 2) == 0
+
+
+def test_indice_vazio():
+    indice = IndicePrefixo()
+    assert indice.total() == 0 and indice.acumulados() == []
+    assert indice.soma_intervalo(0, 100) == 0
+
+
+def test_ordem_e_acumulados(serie):
+    assert serie.meses() == ['11/2023', '12/2023', '01/2024', '03/2024', '05/2024']
+    assert serie.saldos() == [10, -20, 30, 5, -7]
+    assert serie.acumulados() == [10, -10, 20, 25, 18]
+    assert serie.total() == 18
+    assert serie.ultimo_mes() == '05/2024'
+
+
+def test_soma_periodo(serie):
+    assert serie.soma_periodo(12, 2023, 3, 2024) == 15
+    assert serie.soma_periodo(2, 2024, 2, 2024) == 0
+    assert serie.soma_periodo(1, 2000, 12, 2030) == serie.total()
+    assert serie.soma_periodo(3, 2024, 1, 2024) == 0
+
+
+def test_acumulado_no_ano(serie):
+    # Padrão: do início do ano até o último mês da série
+    assert serie.acumulado_no_ano() == 28
+    assert serie.acumulado_no_ano(2023) == -10
+    assert serie.acumulado_no_ano(2024, 2) == 30
+    assert serie.acumulado_no_ano(2022) == 0
+
+
+def test_janelas_moveis_atravessam_meses_sem_registro(serie):
+    assert serie.janela_movel(3) == -2
+    assert serie.janela_movel(3, ate='02/2024') == 10
+    assert serie.janela_movel(0) == 0
+    assert serie.janelas_moveis(2) == [10, -10, 10, 5, -7]
+
+
+def test_trimestres(serie):
+    assert serie.trimestres() == [
+        {'ano': 2023, 'trimestre': 4, 'saldo': -10},
+        {'ano': 2024, 'trimestre': 1, 'saldo': 35},
+        {'ano': 2024, 'trimestre': 2, 'saldo': -7},
+    ]
+    assert serie.trimestre(2024, 1) == 35
+    assert serie.trimestre(2024, 3) == 0
+
+
+def test_serie_vazia():
+    serie = SerieSaldos()
+    assert serie.meses() == [] and serie.acumulados() == []
+    assert serie.total() == 0 and serie.ultimo_mes() is None
+    assert serie.acumulado_no_ano() == 0
+    assert serie.janela_movel(12) == 0
+    assert serie.trimestres() == []
+
+
+def test_de_detalhes():
+    detalhes = [{'mes_ano': m, 'saldo': s, 'saldo_formatado': ''} for m, s in SALDOS]
+    assert SerieSaldos.de_detalhes(detalhes).acumulados() == SerieSaldos(SALDOS).acumulados()
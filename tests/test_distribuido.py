@@ -0,0 +1,136 @@
+"""Fila distribuída: leases, devolução de unidades e meses indisponíveis"""
+
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from app import limitador
+from app.banco_horas import MesIndisponivel
+from app.carga import IntranetSimulada
+from app.distribuido import (
+    CONCLUIDA, EM_EXECUCAO, FALHOU, MAX_TENTATIVAS, PENDENTE, FilaDistribuida, executar_worker, processar_unidade
+)
+
+FUNCIONARIO = {'matricula': '123', 'usuario': 'fulano', 'senha_env': 'SENHA_FULANO'}
+
+
+@pytest.fixture
+def fila(tmp_path):
+    return FilaDistribuida(str(tmp_path / 'fila.sqlite'))
+
+
+def _unidade(fila, id_unidade):
+    with sqlite3.connect(fila.caminho) as conexao:
+        return conexao.execute(
+            "SELECT estado, worker, lease_ate, tentativas, erro FROM unidades WHERE id = ?", (id_unidade,)
+        ).fetchone()
+
+
+def test_enfileirar_divide_e_nao_duplica(fila):
+    assert fila.enfileirar('https://a.exemplo.com', [FUNCIONARIO], 1, 2023, 6, 2024, meses_por_unidade=12) == 2
+    assert fila.enfileirar('https://a.exemplo.com', [FUNCIONARIO], 1, 2023, 6, 2024, meses_por_unidade=12) == 0
+
+
+def test_mesma_matricula_em_duas_intranets(fila):
+    fila.enfileirar('https://a.exemplo.com', [FUNCIONARIO], 1, 2024, 1, 2024)
+    fila.enfileirar('https://b.exemplo.com', [FUNCIONARIO], 1, 2024, 1, 2024)
+
+    for saldo, worker in ((10, 'w1'), (20, 'w2')):
+        unidade = fila.reservar(worker)
+        fila.gravar_mes(unidade, worker, '01/2024', saldo)
+        fila.concluir(unidade)
+
+    assert fila.progresso()['meses_gravados'] == 2
+    assert sorted(fila.resultados()['saldo']) == [10, 20]
+
+
+def test_lease_vencido_volta_para_outro_worker(fila):
+    fila.enfileirar('https://a.exemplo.com', [FUNCIONARIO], 1, 2024, 3, 2024)
+    abandonada = fila.reservar('w1', lease=-1)
+    assert fila.reservar('w2', lease=-1)['id'] == abandonada['id']
+
+    # O worker antigo não renova mais o lease de uma unidade que perdeu
+    fila.gravar_mes(abandonada, 'w1', '01/2024', 5, lease=600)
+    estado, worker, lease_ate, tentativas, _ = _unidade(fila, abandonada['id'])
+    assert (estado, worker, tentativas) == (EM_EXECUCAO, 'w2', 2)
+    assert fila.meses_concluidos(abandonada) == {'01/2024'}
+
+
+def test_lease_vencido_sem_tentativas_restantes_falha(fila):
+    fila.enfileirar('https://a.exemplo.com', [FUNCIONARIO], 1, 2024, 1, 2024)
+    for i in range(MAX_TENTATIVAS):
+        assert fila.reservar(f'w{i}', lease=-1) is not None
+
+    assert fila.reservar('w-final') is None
+    estado, _, _, tentativas, erro = _unidade(fila, 1)
+    assert (estado, tentativas, erro) == (FALHOU, MAX_TENTATIVAS, 'lease expirado')
+
+
+def test_falhar_devolve_ate_max_tentativas(fila):
+    fila.enfileirar('https://a.exemplo.com', [FUNCIONARIO], 1, 2024, 1, 2024)
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        unidade = fila.reservar('w1')
+        fila.falhar(unidade, 'erro de teste')
+        esperado = FALHOU if tentativa == MAX_TENTATIVAS else PENDENTE
+        assert _unidade(fila, unidade['id'])[0] == esperado
+    assert fila.reservar('w1') is None
+
+
+def _passar_tempo_do_disjuntor(url, segundos):
+    limitador.limitador_para_host(urlparse(url).netloc).disjuntor._aberto_em -= segundos
+
+
+@pytest.fixture(autouse=True)
+def limitadores_isolados(monkeypatch):
+    """Disjuntores novos por teste, sem o ritmo do balde de tokens"""
+    monkeypatch.setattr(limitador, '_limitadores', {})
+    monkeypatch.setattr(limitador, '_criar_balde', lambda host: limitador.BaldeTokens(1000, 1000, 1000))
+
+
+def test_mes_indisponivel_falha_a_unidade_sem_gravar(fila, monkeypatch, sem_espera):
+    monkeypatch.setenv('SENHA_FULANO', 'x')
+    with IntranetSimulada(exigir_sessao=True, meses_com_falha={'03/2024'}) as intranet:
+        fila.enfileirar(intranet.url, [FUNCIONARIO], 1, 2024, 4, 2024)
+        unidade = fila.reservar('w1')
+        with pytest.raises(MesIndisponivel):
+            processar_unidade(fila, unidade, 'w1')
+        fila.falhar(unidade, 'mês indisponível')
+        assert fila.meses_concluidos(unidade) == {'01/2024', '02/2024'}
+
+        # Intranet de volta e disjuntor liberado: a nova tentativa busca só o que falta
+        intranet.meses_com_falha.clear()
+        _passar_tempo_do_disjuntor(intranet.url, 60)
+        unidade = fila.reservar('w2')
+        assert processar_unidade(fila, unidade, 'w2') == 2
+        fila.concluir(unidade)
+
+    assert _unidade(fila, unidade['id'])[0] == CONCLUIDA
+    assert list(fila.resultados()['mes_ano']) == ['01/2024', '02/2024', '03/2024', '04/2024']
+
+
+def test_disjuntor_aberto_devolve_unidades_sem_gastar_tentativas(fila, monkeypatch):
+    monkeypatch.setenv('SENHA_FULANO', 'x')
+    with IntranetSimulada(exigir_sessao=True) as intranet:
+        funcionarios = [dict(FUNCIONARIO, matricula=str(i)) for i in range(5)]
+        fila.enfileirar(intranet.url, funcionarios, 1, 2024, 2, 2024)
+
+        # Um pico de erros abre o disjuntor; a intranet já está saudável
+        disjuntor = limitador.limitador_para_host(urlparse(intranet.url).netloc).disjuntor
+        for _ in range(disjuntor.minimo_amostras):
+            disjuntor.registrar_falha()
+
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            _passar_tempo_do_disjuntor(intranet.url, segundos)
+        monkeypatch.setattr(time, 'sleep', dormir)
+
+        executar_worker(fila, 'w1', log=lambda *a: None)
+
+    assert esperas and esperas[0] > 1
+    for unidade_id in range(1, 6):
+        estado, _, _, tentativas, _ = _unidade(fila, unidade_id)
+        assert (estado, tentativas) == (CONCLUIDA, 1)
@@ -0,0 +1,97 @@
+"""Lote da equipe: falhas por motivo e gravação sem nenhum saldo"""
+
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+import pytest
+
+from app import cli, limitador
+from app.banco_horas import BancoHorasAdvanced
+from app.carga import IntranetSimulada
+from app.equipe import (
+    ARQUIVO_SALDOS, FALHA_INTRANET_INSTAVEL, FALHA_LOGIN, FALHA_MES_INDISPONIVEL, carregar_painel, executar_lote,
+    gravar_resultados_equipe
+)
+
+
+@pytest.fixture(autouse=True)
+def limitadores_isolados(monkeypatch):
+    """Disjuntores novos por teste, sem o ritmo do balde de tokens"""
+    monkeypatch.setattr(limitador, '_limitadores', {})
+    monkeypatch.setattr(limitador, '_criar_balde', lambda host: limitador.BaldeTokens(1000, 1000, 1000))
+
+
+@pytest.fixture
+def senha_recusada(monkeypatch):
+    """A intranet simulada aceita qualquer senha: 'errada' passa a ser recusada"""
+    fazer_login = BancoHorasAdvanced.fazer_login
+    monkeypatch.setattr(BancoHorasAdvanced, 'fazer_login',
+                        lambda self, usuario, senha: senha != 'errada' and fazer_login(self, usuario, senha))
+
+
+def _funcionario(matricula, senha):
+    return {'matricula': matricula, 'nome': matricula, 'departamento': 'TI', 'usuario': matricula, 'senha': senha}
+
+
+def test_lote_sem_saldos_grava_painel_vazio(tmp_path):
+    saldos = pd.DataFrame({'funcionario': [], 'nome': [], 'departamento': [], 'mes_ano': [], 'saldo': []})
+    gravar_resultados_equipe(saldos, str(tmp_path))
+
+    assert pd.read_parquet(tmp_path / ARQUIVO_SALDOS).empty
+    painel = carregar_painel(str(tmp_path))
+    assert painel['funcionarios'].empty and painel['distribuicao'].empty
+
+
+def test_falhas_separadas_por_motivo(senha_recusada, sem_espera):
+    with IntranetSimulada(meses_com_falha={'04/2024'}) as intranet:
+        saldos, falhas = executar_lote(
+            intranet.url, [_funcionario('1', 'errada'), _funcionario('2', 'x')], 1, 2024, 4, 2024
+        )
+    assert falhas == {'1': FALHA_LOGIN, '2': FALHA_MES_INDISPONIVEL}
+    assert saldos.empty
+
+
+def test_cli_lote_normaliza_url(tmp_path, capsys):
+    csv = tmp_path / 'funcionarios.csv'
+    csv.write_text('matricula,usuario\n1,fulano\n', encoding='utf-8')
+    args = ['lote', '--funcionarios', str(csv), '--inicio', '01/2024', '--fim', '01/2024',
+            '--saida', str(tmp_path / 'saida')]
+
+    assert cli.main(args + ['--url', 'localhost:8501']) == 1
+    assert 'URLs locais' in capsys.readouterr().err
+
+
+def _abrir_disjuntor(url):
+    disjuntor = limitador.limitador_para_host(urlparse(url).netloc).disjuntor
+    for _ in range(disjuntor.minimo_amostras):
+        disjuntor.registrar_falha()
+    return disjuntor
+
+
+def test_disjuntor_aberto_aguarda_e_continua(monkeypatch):
+    with IntranetSimulada() as intranet:
+        disjuntor = _abrir_disjuntor(intranet.url)
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            disjuntor._aberto_em -= segundos
+        monkeypatch.setattr(time, 'sleep', dormir)
+
+        saldos, falhas = executar_lote(intranet.url, [_funcionario('1', 'x'), _funcionario('2', 'x')], 1, 2024, 2, 2024)
+
+    assert [s for s in esperas if s > 1] == esperas[:1] and falhas == {}
+    assert sorted(saldos['funcionario'].unique()) == ['1', '2']
+
+
+def test_disjuntor_que_nao_fecha_grava_o_parcial(tmp_path, monkeypatch):
+    monkeypatch.setattr(time, 'sleep', lambda segundos: None)
+    with IntranetSimulada() as intranet:
+        saldos, _ = executar_lote(intranet.url, [_funcionario('1', 'x')], 1, 2024, 2, 2024)
+        _abrir_disjuntor(intranet.url)
+        parcial, falhas = executar_lote(intranet.url, [_funcionario('2', 'x'), _funcionario('3', 'x')], 1, 2024, 2, 2024)
+
+    assert falhas == {'2': FALHA_INTRANET_INSTAVEL, '3': FALHA_INTRANET_INSTAVEL}
+    gravar_resultados_equipe(pd.concat([saldos, parcial]), str(tmp_path))
+    assert len(pd.read_parquet(tmp_path / ARQUIVO_SALDOS)) == 2
@@ -0,0 +1,80 @@
+"""Relatório da equipe regerado por fragmentos"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from app.equipe import gravar_resultados_equipe
+from app.exportacao import EXTENSAO_FRAGMENTO, gerar_relatorio_diretorio, gerar_relatorio_equipe
+
+
+def _saldos(linhas):
+    return pd.DataFrame(linhas, columns=['funcionario', 'nome', 'departamento', 'mes_ano', 'saldo'])
+
+
+EQUIPE = [
+    ('1', 'Ana', 'TI', '01/2024', 30), ('1', 'Ana', 'TI', '02/2024', -10),
+    ('2', 'Bruno', 'RH', '01/2024', -45),
+    ('3', 'Carla', 'TI', '01/2024', 0),
+]
+
+
+@pytest.fixture
+def caminhos(tmp_path):
+    return str(tmp_path / 'relatorio.txt'), str(tmp_path / 'fragmentos')
+
+
+def _sem_cabecalho(caminho):
+    # O cabeçalho tem o instante da geração
+    with open(caminho, encoding='utf-8') as f:
+        return f.read().split('Gerado em', 1)[1].split('\n', 1)[1]
+
+
+def _fragmentos(diretorio):
+    return sorted(n for n in os.listdir(diretorio) if n.endswith(EXTENSAO_FRAGMENTO))
+
+
+def test_segunda_execucao_reaproveita_tudo(caminhos):
+    destino, fragmentos = caminhos
+    assert gerar_relatorio_equipe(_saldos(EQUIPE), destino, fragmentos) == \
+        {'funcionarios': 3, 'regerados': 3, 'reaproveitados': 0}
+    primeiro = _sem_cabecalho(destino)
+
+    assert gerar_relatorio_equipe(_saldos(EQUIPE), destino, fragmentos) == \
+        {'funcionarios': 3, 'regerados': 0, 'reaproveitados': 3}
+    assert _sem_cabecalho(destino) == primeiro
+
+
+def test_so_o_funcionario_alterado_e_regerado(caminhos):
+    destino, fragmentos = caminhos
+    gerar_relatorio_equipe(_saldos(EQUIPE), destino, fragmentos)
+
+    alterada = [linha if linha[:2] != ('2', 'Bruno') else linha[:4] + (15,) for linha in EQUIPE]
+    assert gerar_relatorio_equipe(_saldos(alterada), destino, fragmentos) == \
+        {'funcionarios': 3, 'regerados': 1, 'reaproveitados': 2}
+    assert len(_fragmentos(fragmentos)) == 3
+    texto = open(destino, encoding='utf-8').read()
+    assert '01/2024: +15min (CRÉDITO)' in texto and '-45min' not in texto
+
+
+def test_funcionario_desligado_sai_do_relatorio_e_dos_fragmentos(caminhos):
+    destino, fragmentos = caminhos
+    gerar_relatorio_equipe(_saldos(EQUIPE), destino, fragmentos)
+
+    sem_bruno = [linha for linha in EQUIPE if linha[0] != '2']
+    assert gerar_relatorio_equipe(_saldos(sem_bruno), destino, fragmentos) == \
+        {'funcionarios': 2, 'regerados': 0, 'reaproveitados': 2}
+    assert len(_fragmentos(fragmentos)) == 2
+    assert 'Bruno' not in open(destino, encoding='utf-8').read()
+
+
+def test_relatorio_a_partir_do_diretorio_do_lote(tmp_path):
+    gravar_resultados_equipe(_saldos(EQUIPE), str(tmp_path))
+    assert gerar_relatorio_diretorio(str(tmp_path))['funcionarios'] == 3
+
+    # Sem a coluna mes_chave (DataFrame em memória) o resultado é o mesmo
+    destino = str(tmp_path / 'memoria.txt')
+    gerar_relatorio_equipe(_saldos(EQUIPE), destino, str(tmp_path / 'fragmentos'))
+    esperado = _sem_cabecalho(tmp_path / 'relatorio_equipe.txt')
+    assert _sem_cabecalho(destino) == esperado
@@ -0,0 +1,75 @@
+"""Balde de tokens adaptativo e disjuntor por intranet"""
+
+import pytest
+
+from app.limitador import BaldeTokens, BaldeTokensArquivo, CircuitoAberto, Disjuntor, limitador_para_host
+
+
+def test_balde_libera_rajada_e_depois_espera():
+    balde = BaldeTokens(taxa=2, capacidade=2)
+    assert balde.tentar_adquirir() == 0
+    assert balde.tentar_adquirir() == 0
+    assert 0 < balde.tentar_adquirir() <= 0.5
+
+
+def test_taxa_aumenta_aditivamente_e_cai_pela_metade():
+    balde = BaldeTokens(taxa=4, taxa_minima=1, taxa_maxima=4.5, incremento=0.25)
+    balde.registrar_sucesso()
+    balde.registrar_sucesso()
+    balde.registrar_sucesso()
+    assert balde.taxa == 4.5
+
+    balde.registrar_falha()
+    assert balde.taxa == 2.25
+    balde.registrar_falha()
+    balde.registrar_falha()
+    assert balde.taxa == 1
+
+
+def test_balde_em_arquivo_compartilha_estado(tmp_path):
+    caminho = str(tmp_path / 'host.json')
+    primeiro = BaldeTokensArquivo(caminho, taxa=1, capacidade=1)
+    segundo = BaldeTokensArquivo(caminho, taxa=1, capacidade=1)
+    assert primeiro.tentar_adquirir() == 0
+    assert segundo.tentar_adquirir() > 0
+
+    segundo.registrar_falha()
+    assert primeiro.taxa == 0.5
+
+
+def test_disjuntor_abre_com_taxa_de_erros():
+    disjuntor = Disjuntor('intranet', limiar_erros=0.5, janela=10, minimo_amostras=4, tempo_aberto=60)
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    # Menos amostras que o mínimo: ainda fechado
+    disjuntor.permitir()
+
+    disjuntor.registrar_sucesso()
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == Disjuntor.ABERTO
+    with pytest.raises(CircuitoAberto):
+        disjuntor.permitir()
+
+
+def test_disjuntor_semi_aberto_deixa_passar_um_teste():
+    disjuntor = Disjuntor('intranet', minimo_amostras=1, tempo_aberto=0)
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == Disjuntor.ABERTO
+
+    disjuntor.permitir()
+    assert disjuntor.estado == Disjuntor.SEMI_ABERTO
+    with pytest.raises(CircuitoAberto):
+        disjuntor.permitir()
+
+    # Falha no teste reabre; sucesso fecha
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == Disjuntor.ABERTO
+    disjuntor.permitir()
+    disjuntor.registrar_sucesso()
+    assert disjuntor.estado == Disjuntor.FECHADO
+    disjuntor.permitir()
+
+
+def test_limitador_compartilhado_por_host():
+    assert limitador_para_host('Intranet.Exemplo.com') is limitador_para_host('intranet.exemplo.com')
+    assert limitador_para_host('intranet.exemplo.com') is not limitador_para_host('outra.exemplo.com')
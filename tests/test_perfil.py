@@ -0,0 +1,60 @@
+"""Perfil por ambiente (BANCO_HORAS_PERFIL) em todos os pontos de entrada"""
+
+import json
+
+import pytest
+
+from app import perfil
+from app.banco_horas import BancoHorasAdvanced
+from app.carga import IntranetSimulada
+from app.distribuido import FilaDistribuida, processar_unidade
+
+
+@pytest.fixture
+def perfil_ambiente(tmp_path, monkeypatch):
+    monkeypatch.setattr(perfil, 'MOTOR_PADRAO', 'cprofile')
+    monkeypatch.setattr(perfil, 'DIRETORIO_PADRAO', str(tmp_path / 'perfis'))
+    return tmp_path / 'perfis'
+
+
+def _meses_perfilados(diretorio):
+    return [json.loads(p.read_text(encoding='utf-8'))['paginas'] for p in sorted(diretorio.glob('*.meses.json'))]
+
+
+def test_valor_invalido_avisa_e_desliga(monkeypatch):
+    monkeypatch.setenv('BANCO_HORAS_PERFIL', '1')
+    with pytest.warns(RuntimeWarning, match='BANCO_HORAS_PERFIL'):
+        assert perfil._motor_do_ambiente() == ''
+
+    monkeypatch.setenv('BANCO_HORAS_PERFIL', ' PyInstrument ')
+    assert perfil._motor_do_ambiente() == 'pyinstrument'
+
+
+def test_iteracao_e_perfilada(perfil_ambiente, sem_espera):
+    # Caminho usado pela API e pela CLI
+    with IntranetSimulada() as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=None)
+        assert calc.fazer_login('fulano', 'x')
+        assert len(list(calc.iterar_banco_horas(1, 2024, 3, 2024))) == 3
+    assert _meses_perfilados(perfil_ambiente) == [3]
+    assert calc.perfil is None
+
+
+def test_worker_distribuido_e_perfilado(perfil_ambiente, tmp_path, monkeypatch, sem_espera):
+    monkeypatch.setenv('SENHA_FULANO', 'x')
+    fila = FilaDistribuida(str(tmp_path / 'fila.sqlite'))
+    with IntranetSimulada() as intranet:
+        fila.enfileirar(intranet.url, [{'matricula': '1', 'usuario': 'fulano', 'senha_env': 'SENHA_FULANO'}],
+                        1, 2024, 2, 2024)
+        assert processar_unidade(fila, fila.reservar('w1'), 'w1') == 2
+    assert _meses_perfilados(perfil_ambiente) == [2]
+
+
+def test_captura_explicita_nao_e_duplicada(perfil_ambiente, tmp_path, sem_espera):
+    with IntranetSimulada() as intranet:
+        calc = BancoHorasAdvanced(intranet.url, armazenamento=None)
+        assert calc.fazer_login('fulano', 'x')
+        with perfil.capturar(calc, diretorio=str(tmp_path / 'explicito')):
+            calc.calcular_banco_horas(1, 2024, 1, 2024)
+    assert not perfil_ambiente.exists()
+    assert _meses_perfilados(tmp_path / 'explicito') == [1]
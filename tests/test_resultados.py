@@ -0,0 +1,81 @@
+"""Armazém de resultados: serialização compacta e despejo LRU/TTL"""
+
+import time
+
+import pytest
+
+from app.resultados import ArmazemResultados, desserializar_resultado, serializar_resultado
+
+
+def _formatar(minutos):
+    return f"{minutos}min"
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Relógio monotônico controlado pelo teste"""
+    agora = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: agora[0])
+    return agora
+
+
+def test_serializacao_ida_e_volta():
+    detalhes = [
+        {'mes_ano': '11/2023', 'saldo': 125, 'saldo_formatado': '+02:05'},
+        {'mes_ano': '12/2023', 'saldo': -2 ** 31, 'saldo_formatado': ''},
+        {'mes_ano': '01/2024', 'saldo': 0, 'saldo_formatado': '00:00'},
+    ]
+    dados = serializar_resultado(-2 ** 31 + 125, detalhes, '11/2023 a 01/2024 — período')
+
+    resultado = desserializar_resultado(dados, _formatar)
+    assert resultado['total_minutos'] == -2 ** 31 + 125
+    assert resultado['periodo'] == '11/2023 a 01/2024 — período'
+    assert [(d['mes_ano'], d['saldo'], d['saldo_formatado']) for d in resultado['detalhes']] == [
+        ('11/2023', 125, '125min'), ('12/2023', -2 ** 31, f'{-2 ** 31}min'), ('01/2024', 0, '0min')
+    ]
+
+
+def test_serializacao_sem_meses():
+    resultado = desserializar_resultado(serializar_resultado(0, [], ''), _formatar)
+    assert resultado == {'total_minutos': 0, 'detalhes': [], 'periodo': ''}
+
+
+def test_item_expira_apos_ttl_sem_acesso(relogio):
+    armazem = ArmazemResultados(limite_bytes=1024, ttl=60)
+    identificador = armazem.guardar(b'abc')
+
+    relogio[0] += 50
+    assert armazem.obter(identificador) == b'abc'
+    # O acesso renova o prazo
+    relogio[0] += 50
+    assert armazem.obter(identificador) == b'abc'
+
+    relogio[0] += 61
+    assert armazem.obter(identificador) is None
+    estatisticas = armazem.estatisticas()
+    assert (estatisticas['itens'], estatisticas['bytes'], estatisticas['despejos']) == (0, 0, 1)
+
+
+def test_despejo_lru_pelo_limite_de_memoria(relogio):
+    armazem = ArmazemResultados(limite_bytes=30, ttl=3600)
+    a = armazem.guardar(b'a' * 10)
+    b = armazem.guardar(b'b' * 10)
+    c = armazem.guardar(b'c' * 10)
+
+    # 'a' foi usado recentemente: o menos usado agora é 'b'
+    assert armazem.obter(a) is not None
+    d = armazem.guardar(b'd' * 10)
+
+    assert armazem.obter(b) is None
+    assert [armazem.obter(i) is not None for i in (a, c, d)] == [True, True, True]
+    assert armazem.estatisticas()['bytes'] == 30
+
+
+def test_descartar_e_identificador_vazio():
+    armazem = ArmazemResultados()
+    identificador = armazem.guardar(b'xyz')
+    armazem.descartar(identificador)
+    armazem.descartar(identificador)
+    assert armazem.obter(identificador) is None
+    assert armazem.obter(None) is None
+    assert armazem.estatisticas()['bytes'] == 0
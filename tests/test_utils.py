@@ -0,0 +1,33 @@
+"""Validação da URL da intranet"""
+
+import pytest
+
+from app import utils
+from app.utils import normalize_intranet_url
+
+
+@pytest.mark.parametrize('url', [
+    'localhost', 'localhost:8501', 'LOCALHOST.', 'http://127.0.0.1:9000', 'http://[::1]:8000',
+    'http://intranet.empresa.com@127.0.0.1',
+])
+def test_propria_maquina_e_recusada(url):
+    assert normalize_intranet_url(url) == ("", "⚠️ URLs locais não são permitidas por segurança")
+
+
+@pytest.mark.parametrize('url, esperado', [
+    ('intranet.empresa.com', 'https://intranet.empresa.com'),
+    (' http://Intranet.Empresa.com:8080/Horas/FolhaPonto?x=1 ', 'http://intranet.empresa.com:8080'),
+    ('https://usuario@intranet.empresa.com', 'https://intranet.empresa.com'),
+    ('8.8.8.8', 'https://8.8.8.8'),
+    # Intranets em IP privado são o caso comum
+    ('http://10.0.0.5:8080/ponto', 'http://10.0.0.5:8080'),
+    ('192.168.1.10', 'https://192.168.1.10'),
+])
+def test_urls_validas_sao_normalizadas(url, esperado):
+    assert normalize_intranet_url(url) == (esperado, None)
+
+
+def test_opt_in_para_urls_locais(monkeypatch):
+    monkeypatch.setattr(utils, 'PERMITIR_URL_LOCAL', True)
+    assert normalize_intranet_url('http://127.0.0.1:9000') == ('http://127.0.0.1:9000', None)
+    assert normalize_intranet_url('http://[::1]:9000') == ('http://[::1]:9000', None)